@@ -39,12 +39,15 @@
     reference: https://support.kaspersky.com/kics-for-networks/3.0/206199
 
 
-    Three modules will be provided in this module: 
+    Four modules will be provided in this module: 
     - ladderLogic: An interface class hold the ladder logic calculation algorithm run in the 
         PLC side to set the measured src value based on PLC physical input and update the measured 
         dest value based on PLC output. ps: to change the measured src value, link the change value 
         to the measured value.
 
+    - dslLadderLogic: A ladderLogic whose control is written in the ladderDsl text program 
+        (such as "OUT[0] := REG[0] > 50.5"), compiled once to a python scan function.
+
     - iec104Client: IEC-60870-5-104 client class run in the SCADA (HMI) side to read and set data 
         from the PLC/RTU side.
 
@@ -56,6 +59,8 @@ import time
 import c104 # pip install c104
 from collections import OrderedDict
 
+import ladderDsl
+
 # define the network constants
 DEF_HOST_IP = '0.0.0.0'
 DEF_60870_5_104_PORT = 2404
@@ -123,6 +128,44 @@ class ladderLogic(object):
         # This function need to be overwritten. 
         return None 
 
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class dslLadderLogic(ladderLogic):
+    """ Ladder logic written in the ladderDsl text program. The src point values are
+        mapped to the DSL REG[n] (value) and IN[n] (bool), the dest points are mapped 
+        to OUT[n]. Example:
+            ladder = dslLadderLogic(server, "OUT[0] := REG[0] > 50.5", stationAddr=47,
+                                    srcPointAddrList=[11], destPointAddrList=[12])
+    """
+    def __init__(self, parent, program, ladderName='DslLadderDiagram', stationAddr=None,
+                 srcPointAddrList=None, destPointAddrList=None):
+        """ Args:
+                parent (iec104Server): parent need to be a iec104 server obj
+                program (str/ladderProgram): DSL program text or a compiled ladderProgram.
+                ladderName (str, optional): ladder name. Defaults to 'DslLadderDiagram'.
+                stationAddr (int, optional): station address. Defaults to None.
+                srcPointAddrList (list, optional): src point io address list. Defaults to None.
+                destPointAddrList (list, optional): dest point io address list. Defaults to None.
+        """
+        if isinstance(program, str): program = ladderDsl.compileLadder(program, name=str(ladderName))
+        self.program = program
+        self._addrInfo = (stationAddr, list(srcPointAddrList or []), list(destPointAddrList or []))
+        super().__init__(parent, ladderName=ladderName)
+
+    def initLadderInfo(self):
+        self.stationAddr, self.srcPointAddrList, self.destPointAddrList = self._addrInfo
+
+    def runLadderLogic(self):
+        """ Read the src point values from the parent server, run one scan of the compiled
+            program and update the dest point values, return the OUT values list.
+        """
+        if self.program is None or self.parent is None: return None
+        srcVals = [self.parent.getPointVal(self.stationAddr, addr) for addr in self.srcPointAddrList]
+        outList = list(self.program.scan(srcVals, srcVals))
+        for addr, val in zip(self.destPointAddrList, outList):
+            self.parent.setPointVal(self.stationAddr, addr, val)
+        return outList
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class iec104Client(object):
@@ -70,25 +70,19 @@ class trainPowerPlcSet(plcSimulator.plcSimuInterface):
                         updateInt=updateInt)
 
     def _initInputState(self):
-        self.regsAddrs = (0, 10)
         self.regSRWfetchKey = gv.gRealWorldKey
-        self.regs2RWmap = OrderedDict()
-        self.regs2RWmap['weline'] = (0, 4)
-        self.regs2RWmap['nsline'] = (4, 7)
-        self.regs2RWmap['ccline'] = (7, 10)
-        self.regsStateRW = OrderedDict()
-        self.regsStateRW['weline'] = [0]*4
-        self.regsStateRW['nsline'] = [0]*3
-        self.regsStateRW['ccline'] = [0]*3
+        self.regsTagCfg = OrderedDict()
+        self.regsTagCfg['weline'] = {'address': 0, 'length': 4, 'type': 'uint16'}
+        self.regsTagCfg['nsline'] = {'address': 4, 'length': 3, 'type': 'uint16'}
+        self.regsTagCfg['ccline'] = {'address': 7, 'length': 3, 'type': 'uint16'}
 
     def _initCoilState(self):
-        self.coilsAddrs = (0, 11)
         self.coilsRWSetKey = gv.gRealWorldKey
-        self.coils2RWMap = OrderedDict()
-        self.coils2RWMap['weline'] = (0, 4)
-        self.coils2RWMap['nsline'] = (4, 7)
-        self.coils2RWMap['ccline'] = (7, 10)
-        self.coils2RWMap['config'] = (10, 11)
+        self.coilsTagCfg = OrderedDict()
+        self.coilsTagCfg['weline'] = {'address': 0, 'length': 4, 'type': 'bool'}
+        self.coilsTagCfg['nsline'] = {'address': 4, 'length': 3, 'type': 'bool'}
+        self.coilsTagCfg['ccline'] = {'address': 7, 'length': 3, 'type': 'bool'}
+        self.coilsTagCfg['config'] = {'address': 10, 'length': 1, 'type': 'bool'}
         self.coilStateRW = OrderedDict()
         self.coilStateRW['weline']  = [False]*4
         self.coilStateRW['nsline']  = [False]*3 
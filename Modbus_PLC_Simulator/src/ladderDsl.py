@@ -0,0 +1,483 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        ladderDsl.py
+#
+# Purpose:     This lib module will provide a small textual ladder/structured-text
+#              DSL compiler, the ladder program is parsed once and compiled to a
+#              python scan function, so the PLC/RTU ladder logic can be written as
+#              text rungs instead of hand coding the runLadderLogic() function.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/06/24
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    The ladder program is a list of statements (one per line or separated by ';',
+    comments start with '#' or '//'):
+
+        CONST LIMIT = 100                       # constant, folded at compile time.
+        VAR speed = REG[0]                      # alias of an operand.
+        VAR run = OUT[0]
+        run := (speed > LIMIT AND IN[0]) OR run # rung: target := expression.
+        IF IN[1] THEN OUT[1] := NOT IN[2]       # conditional rung.
+        OUT[2] := TON(T1, IN[3], T#500ms)       # on delay timer.
+        OUT[3] := TOF(T2, IN[4], T#2s)          # off delay timer.
+        OUT[4] := CTU(C1, IN[5], 3, IN[6])      # up counter (name, count, preset, reset).
+
+    Operands: REG[n] register input, IN[n] contact (bool) input, OUT[n] output coil,
+    M[n] internal memory. The OUT and M values are kept between the scans, so the
+    seal-in rungs work.
+    Operators: OR, XOR, AND, NOT, = <> < <= > >=, + - * / MOD, TRUE, FALSE, numbers
+    and time literals T#<n>ms / T#<n>s. The timer preset is in ms if it is a number (or a
+    constant expression without time literal, such as CONST D = 1000/2).
+
+    compileLadder() parses the program to an expression tree, then:
+    1. Folds the constant sub expressions (CONST names, arithmetic, AND/OR with a
+        constant operand, constant compare).
+    2. Removes the dead rungs: IF FALSE rungs and the rungs whose target is always
+        overwritten by a later rung before it is read (if the rung has no timer or
+        counter).
+    3. Generates the python source of one scan function (the timer and counter calls
+        of a rung are hoisted before the rung's assignment, so they are evaluated every
+        time the rung runs even if AND/OR doesn't need the value; like the Structured
+        Text IF, the calls in the expression of an IF rung only run when the condition
+        is true) and compile it with compile(), the result ladderProgram.scan() runs
+        the whole program in one python call.
+
+    The protocol ladder hooks use it by the adapter classes: modbusTcpCom.dslLadderLogic,
+    snap7Comm.dslRtuLadderLogic, iec104Comm.dslLadderLogic and opcuaComm.dslLadderLogic.
+
+    Usage:
+        program = ladderDsl.compileLadder("OUT[0] := REG[0] > 10 AND IN[0]", name='test')
+        if program: outList = program.scan([12], [True])
+"""
+
+import re
+import time
+
+SPACE_REG = 'REG'   # register inputs.
+SPACE_IN = 'IN'     # contact inputs.
+SPACE_OUT = 'OUT'   # output coils.
+SPACE_MEM = 'M'     # internal memory.
+SPACES = (SPACE_REG, SPACE_IN, SPACE_OUT, SPACE_MEM)
+WRITE_SPACES = (SPACE_OUT, SPACE_MEM)
+
+FUN_BLOCKS = ('TON', 'TOF', 'CTU')
+KEYWORDS = ('CONST', 'VAR', 'IF', 'THEN', 'AND', 'OR', 'XOR', 'NOT', 'MOD',
+            'TRUE', 'FALSE') + SPACES + FUN_BLOCKS
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<time>T\#\d+(?:\.\d+)?(?:ms|s))|
+    (?P<num>\d+(?:\.\d+)?)|
+    (?P<name>[A-Za-z_]\w*)|
+    (?P<op>:=|<>|<=|>=|[=<>+\-*/()\[\],])|
+    (?P<space>[ \t]+)|
+    (?P<bad>.)
+""", re.VERBOSE | re.IGNORECASE)
+
+# expression operators: dsl operator -> python operator.
+BIN_OPS = {
+    'OR': 'or', 'AND': 'and', '=': '==', '<>': '!=', '<': '<', '<=': '<=', '>': '>',
+    '>=': '>=', '+': '+', '-': '-', '*': '*', '/': '/', 'MOD': '%'
+}
+CONST_FUNS = {
+    'OR': lambda a, b: bool(a) or bool(b),
+    'AND': lambda a, b: bool(a) and bool(b),
+    'XOR': lambda a, b: bool(a) != bool(b),
+    '=': lambda a, b: a == b, '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b, '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b, '>=': lambda a, b: a >= b,
+    '+': lambda a, b: a + b, '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b, '/': lambda a, b: a / b, 'MOD': lambda a, b: a % b,
+}
+# operator precedence levels from low to high.
+PRECEDENCE = (('OR',), ('XOR',), ('AND',), ('=', '<>', '<', '<=', '>', '>='),
+              ('+', '-'), ('*', '/', 'MOD'))
+
+#-----------------------------------------------------------------------------
+# Define the timer and counter function blocks, the state is a 2 elements list.
+def _ton(state, inVal, presetT, now):
+    """ On delay timer: Q is True after IN is True for presetT sec. state: [startT, Q]"""
+    if inVal:
+        if state[0] is None: state[0] = now
+        state[1] = now - state[0] >= presetT
+    else:
+        state[0], state[1] = None, False
+    return state[1]
+
+def _tof(state, inVal, presetT, now):
+    """ Off delay timer: Q is False after IN is False for presetT sec. state: [startT, Q]"""
+    if inVal:
+        state[0], state[1] = None, True
+    elif state[1]:
+        if state[0] is None: state[0] = now
+        if now - state[0] >= presetT: state[1] = False
+    return state[1]
+
+def _ctu(state, countIn, preset, reset):
+    """ Up counter: count the IN rising edges, Q = CV >= preset. state: [CV, last IN]"""
+    if reset:
+        state[0] = 0
+    elif countIn and not state[1]:
+        state[0] += 1
+    state[1] = bool(countIn)
+    return state[0] >= preset
+
+class _dslError(Exception):
+    """ Internal compile error with the line number."""
+    def __init__(self, msg, lineNum=None):
+        super().__init__(msg)
+        self.lineNum = lineNum
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class ladderProgram(object):
+    """ A compiled ladder program, call scan() every PLC scan cycle."""
+
+    def __init__(self, name, scanFun, source, sizes, outIdxList, blockNames, rungInfo):
+        self.name = name
+        self.source = source            # generated python source (for debug).
+        self.regNum, self.inNum, self.outNum, self.memNum = sizes
+        self.outIdxList = outIdxList    # the OUT indexes written by the program.
+        self.blockNames = blockNames    # timer/counter names.
+        self.rungInfo = rungInfo        # {'total': n, 'removed': m}
+        self._scanFun = scanFun
+        self.outs = [False] * self.outNum
+        self.mem = [False] * self.memNum
+        self.resetState()
+
+    def resetState(self):
+        """ Reset the outputs, memory, timers and counters state."""
+        self.outs[:] = [False] * self.outNum
+        self.mem[:] = [False] * self.memNum
+        self._blockStates = [[None, False] if name[1] != 'CTU' else [0, False]
+                             for name in self.blockNames]
+
+    def scan(self, regs=(), ins=(), now=None):
+        """ Run one scan of the program.
+            Args:
+                regs (list): register inputs, length >= regNum.
+                ins (list): contact inputs, length >= inNum.
+                now (float, optional): monotonic time in sec. Defaults to time.monotonic().
+            Returns:
+                list: the OUT list (the program's output memory, don't modify it).
+        """
+        self._scanFun(regs, ins, self.outs, self.mem,
+                      time.monotonic() if now is None else now, self._blockStates)
+        return self.outs
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class _ladderCompiler(object):
+    """ Parse and compile the DSL source to the ladderProgram."""
+
+    def __init__(self, source, name):
+        self.source = source
+        self.name = name
+        self.consts = {}
+        self.alias = {}
+        self.blocks = []        # [(name, type)] timers/counters in define sequence.
+        self.maxIdx = dict.fromkeys(SPACES, -1)
+        self.rungs = []         # [{'cond': expr, 'target': ref, 'expr': expr, 'line': n}]
+        self.tokens = []
+        self.pos = 0
+        self.lineNum = 0
+
+    #-----------------------------------------------------------------------------
+    # Tokenizer and parser.
+    def _tokenize(self, text):
+        tokens = []
+        for match in TOKEN_PATTERN.finditer(text):
+            kind, val = match.lastgroup, match.group()
+            if kind == 'space': continue
+            if kind == 'bad': raise _dslError("invalid character '%s'" % val, self.lineNum)
+            if kind == 'name' and val.upper() in KEYWORDS: kind, val = 'kw', val.upper()
+            if kind == 'time':
+                numStr = val[2:].lower()
+                val = float(numStr[:-2]) / 1000 if numStr.endswith('ms') else float(numStr[:-1])
+            elif kind == 'num':
+                val = float(val) if '.' in val else int(val)
+            tokens.append((kind, val))
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _accept(self, val):
+        if self._peek()[1] == val:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, val):
+        if not self._accept(val):
+            raise _dslError("expect '%s' but get '%s'" % (val, str(self._peek()[1])), self.lineNum)
+
+    def _parseStatement(self):
+        kind, val = self._peek()
+        if kind == 'kw' and val == 'CONST':
+            self._next()
+            name = self._parseName()
+            self._expect('=')
+            expr = self._fold(self._parseExpr())
+            if not self._isConst(expr): raise _dslError("CONST %s is not a constant" % name, self.lineNum)
+            self.consts[name] = expr    # keep the time literal node kind.
+        elif kind == 'kw' and val == 'VAR':
+            self._next()
+            name = self._parseName()
+            self._expect('=')
+            expr = self._parsePrimary()
+            if expr[0] != 'ref': raise _dslError("VAR %s needs an operand" % name, self.lineNum)
+            self.alias[name] = expr
+        else:
+            cond = None
+            if self._accept('IF'):
+                cond = self._parseExpr()
+                self._expect('THEN')
+            target = self._parsePrimary()
+            if target[0] != 'ref' or target[1] not in WRITE_SPACES:
+                raise _dslError("rung target needs to be OUT[n] or M[n]", self.lineNum)
+            self._expect(':=')
+            expr = self._parseExpr()
+            self.rungs.append({'cond': cond, 'target': target, 'expr': expr, 'line': self.lineNum})
+        if self.pos < len(self.tokens):
+            raise _dslError("unexpected '%s'" % str(self._peek()[1]), self.lineNum)
+
+    def _parseName(self):
+        kind, val = self._next()
+        if kind != 'name': raise _dslError("expect a name but get '%s'" % str(val), self.lineNum)
+        if val in self.consts or val in self.alias:
+            raise _dslError("name %s is defined twice" % val, self.lineNum)
+        return val
+
+    def _parseExpr(self, level=0):
+        if level == len(PRECEDENCE): return self._parseUnary()
+        left = self._parseExpr(level + 1)
+        while self._peek()[1] in PRECEDENCE[level]:
+            op = self._next()[1]
+            left = ('bin', op, left, self._parseExpr(level + 1))
+        return left
+
+    def _parseUnary(self):
+        if self._accept('NOT'): return ('not', self._parseUnary())
+        if self._accept('-'): return ('bin', '-', ('const', 0), self._parseUnary())
+        return self._parsePrimary()
+
+    def _parsePrimary(self):
+        kind, val = self._next()
+        if kind == 'num': return ('const', val)
+        if kind == 'time': return ('time', val)     # time literal in sec.
+        if kind == 'kw' and val in ('TRUE', 'FALSE'): return ('const', val == 'TRUE')
+        if val == '(':
+            expr = self._parseExpr()
+            self._expect(')')
+            return expr
+        if kind == 'kw' and val in SPACES:
+            self._expect('[')
+            idxKind, idx = self._next()
+            if idxKind != 'num' or not isinstance(idx, int):
+                raise _dslError("%s index needs to be an integer" % val, self.lineNum)
+            self._expect(']')
+            self.maxIdx[val] = max(self.maxIdx[val], idx)
+            return ('ref', val, idx)
+        if kind == 'kw' and val in FUN_BLOCKS: return self._parseFunBlock(val)
+        if kind == 'name':
+            if val in self.consts: return self.consts[val]
+            if val in self.alias: return self.alias[val]
+            raise _dslError("name %s is not defined" % val, self.lineNum)
+        raise _dslError("unexpected '%s'" % str(val), self.lineNum)
+
+    def _parseFunBlock(self, funName):
+        self._expect('(')
+        kind, blockName = self._next()
+        if kind != 'name': raise _dslError("%s needs a name" % funName, self.lineNum)
+        if any(name == blockName for name, _ in self.blocks):
+            raise _dslError("%s %s is used twice" % (funName, blockName), self.lineNum)
+        args = []
+        while self._accept(','): args.append(self._fold(self._parseExpr()))
+        self._expect(')')
+        argNum = (2, 3) if funName == 'CTU' else (2, 2)
+        if not argNum[0] <= len(args) <= argNum[1]:
+            raise _dslError("%s %s arguments number invalid" % (funName, blockName), self.lineNum)
+        if funName != 'CTU':
+            preset = args[1]
+            if not self._isConst(preset): raise _dslError("timer preset needs to be a constant", self.lineNum)
+            # a number preset is in ms, a time literal is already in sec.
+            args[1] = ('const', preset[1] if preset[0] == 'time' else preset[1] / 1000)
+        elif len(args) == 2:
+            args.append(('const', False))
+        self.blocks.append((blockName, funName))
+        return ('call', funName, len(self.blocks) - 1, args)
+
+    #-----------------------------------------------------------------------------
+    # Optimizer.
+    def _isConst(self, expr):
+        return expr[0] in ('const', 'time')
+
+    def _fold(self, expr):
+        """ Fold the constant sub expressions, the arithmetic result of a time literal 
+            is still a time literal (such as T#1s * 2).
+        """
+        kind = expr[0]
+        if kind == 'not':
+            sub = self._fold(expr[1])
+            return ('const', not sub[1]) if self._isConst(sub) else ('not', sub)
+        if kind == 'call':
+            return ('call', expr[1], expr[2], [self._fold(arg) for arg in expr[3]])
+        if kind != 'bin': return expr
+        op, left, right = expr[1], self._fold(expr[2]), self._fold(expr[3])
+        if self._isConst(left) and self._isConst(right):
+            isTime = op in ('+', '-', '*', '/', 'MOD') and 'time' in (left[0], right[0])
+            try:
+                return ('time' if isTime else 'const', CONST_FUNS[op](left[1], right[1]))
+            except ZeroDivisionError:
+                raise _dslError("division by zero", self.lineNum)
+        if op in ('AND', 'OR'):
+            for const, other in ((left, right), (right, left)):
+                if not self._isConst(const): continue
+                if bool(const[1]) == (op == 'AND'): return other
+                # the result is the constant, but keep the operand which calls a timer
+                # or counter, the calls are evaluated every time the rung runs.
+                if not self._hasBlock(other): return ('const', op == 'OR')
+        return ('bin', op, left, right)
+
+    def _readRefs(self, expr, refs):
+        """ Collect the operands read by the expression."""
+        kind = expr[0]
+        if kind == 'ref':
+            refs.add(expr[1:])
+        elif kind == 'not':
+            self._readRefs(expr[1], refs)
+        elif kind == 'bin':
+            self._readRefs(expr[2], refs)
+            self._readRefs(expr[3], refs)
+        elif kind == 'call':
+            for arg in expr[3]: self._readRefs(arg, refs)
+        return refs
+
+    def _hasBlock(self, expr):
+        if expr[0] == 'call': return True
+        if expr[0] == 'not': return self._hasBlock(expr[1])
+        if expr[0] == 'bin': return self._hasBlock(expr[2]) or self._hasBlock(expr[3])
+        return False
+
+    def _optimize(self):
+        """ Fold the rungs and remove the dead rungs, return the live rungs list."""
+        rungs = []
+        for rung in self.rungs:
+            self.lineNum = rung['line']
+            rung['expr'] = self._fold(rung['expr'])
+            if rung['cond'] is not None:
+                rung['cond'] = self._fold(rung['cond'])
+                if self._isConst(rung['cond']):
+                    if not rung['cond'][1]: continue    # IF FALSE: dead rung.
+                    rung['cond'] = None
+            rungs.append(rung)
+        # backward scan: a rung is dead if its target is overwritten before any read.
+        liveRungs, overwritten = [], set()
+        for rung in reversed(rungs):
+            target = rung['target'][1:]
+            blocks = self._hasBlock(rung['expr']) or \
+                (rung['cond'] is not None and self._hasBlock(rung['cond']))
+            if target in overwritten and rung['cond'] is None and not blocks: continue
+            if rung['cond'] is None: overwritten.add(target)
+            reads = self._readRefs(rung['expr'], set())
+            if rung['cond'] is not None: self._readRefs(rung['cond'], reads)
+            overwritten -= reads
+            liveRungs.append(rung)
+        liveRungs.reverse()
+        return liveRungs
+
+    #-----------------------------------------------------------------------------
+    # Code generator.
+    def _genExpr(self, expr, hoisted):
+        kind = expr[0]
+        if self._isConst(expr): return repr(expr[1])
+        if kind == 'ref': return '%s[%d]' % ('M' if expr[1] == SPACE_MEM else expr[1], expr[2])
+        if kind == 'not': return '(not %s)' % self._genExpr(expr[1], hoisted)
+        if kind == 'call':
+            args = [self._genExpr(arg, hoisted) for arg in expr[3]]
+            if expr[1] == 'CTU':
+                call = '_ctu(_st[%d], %s, %s, %s)' % (expr[2], args[0], args[1], args[2])
+            else:
+                call = '_%s(_st[%d], %s, %s, _now)' % (expr[1].lower(), expr[2], args[0], args[1])
+            hoisted.append('_b%d = %s' % (expr[2], call))
+            return '_b%d' % expr[2]
+        left, right = self._genExpr(expr[2], hoisted), self._genExpr(expr[3], hoisted)
+        if expr[1] == 'XOR': return '(bool(%s) != bool(%s))' % (left, right)
+        return '(%s %s %s)' % (left, BIN_OPS[expr[1]], right)
+
+    def _genSource(self, rungs):
+        lines = ['def _scan(REG, IN, OUT, M, _now, _st):']
+        for rung in rungs:
+            hoisted = []
+            target = self._genExpr(rung['target'], hoisted)
+            if rung['cond'] is None:
+                value = self._genExpr(rung['expr'], hoisted)
+                lines += ['    ' + item for item in hoisted]
+                lines.append('    %s = %s' % (target, value))
+            else:
+                cond = self._genExpr(rung['cond'], hoisted)
+                lines += ['    ' + item for item in hoisted]
+                lines.append('    if %s:' % cond)
+                hoisted = []
+                value = self._genExpr(rung['expr'], hoisted)
+                lines += ['        ' + item for item in hoisted]
+                lines.append('        %s = %s' % (target, value))
+        if len(lines) == 1: lines.append('    pass')
+        return '\n'.join(lines) + '\n'
+
+    #-----------------------------------------------------------------------------
+    def compile(self):
+        for lineNum, line in enumerate(self.source.splitlines(), start=1):
+            self.lineNum = lineNum
+            line = re.split(r'#(?!\d)|//', line, maxsplit=1)[0]
+            for statement in line.split(';'):
+                self.tokens, self.pos = self._tokenize(statement), 0
+                if self.tokens: self._parseStatement()
+        rungs = self._optimize()
+        source = self._genSource(rungs)
+        nameSpace = {'_ton': _ton, '_tof': _tof, '_ctu': _ctu}
+        exec(compile(source, '<ladder:%s>' % self.name, 'exec'), nameSpace)
+        sizes = tuple(self.maxIdx[space] + 1 for space in SPACES)
+        outIdxList = sorted({rung['target'][2] for rung in rungs if rung['target'][1] == SPACE_OUT})
+        rungInfo = {'total': len(self.rungs), 'removed': len(self.rungs) - len(rungs)}
+        return ladderProgram(self.name, nameSpace['_scan'], source, sizes, outIdxList,
+                             self.blocks, rungInfo)
+
+#-----------------------------------------------------------------------------
+def compileLadder(source, name='ladder'):
+    """ Compile the ladder DSL source string to a ladderProgram.
+        Args:
+            source (str): ladder DSL program text.
+            name (str, optional): program name. Defaults to 'ladder'.
+        Returns:
+            ladderProgram: the compiled program, None if the source has error.
+    """
+    compiler = _ladderCompiler(source, name)
+    try:
+        return compiler.compile()
+    except _dslError as err:
+        print("Error: compileLadder() %s line %s: %s" % (name, str(err.lineNum), str(err)))
+    except Exception as err:
+        print("Error: compileLadder() %s: %s" % (name, str(err)))
+    return None
+
+def loadLadderFile(filePath, name=None):
+    """ Load and compile the ladder DSL program file, return None if failed."""
+    try:
+        with open(filePath, 'r') as fh:
+            source = fh.read()
+    except Exception as err:
+        print("Error: loadLadderFile() can not read the file %s: %s" % (filePath, str(err)))
+        return None
+    return compileLadder(source, name=name or filePath)
@@ -20,7 +20,7 @@
     to read the data from a real PLC or simulate the PLC ModBus data handling process (handle 
     modbusTCP request from other program which same as PLC).
     
-    Four modules will be provided in this module: 
+    Seven modules will be provided in this module: 
 
     - ladderLogic: An interface class hold the ladder logic calculation algorithm, it will take the 
         holding register's state, source coils state then generate the destination coils states.
@@ -35,29 +35,80 @@
             will auto passed in the runLadderLogic() function.
         7. runLadderLogic() will return the calculated coils list result, plcDataHandler will set 
             the destination coils with the result.
+        8. plcDataHandler keeps an address range index of all the ladders' holding registers and 
+            source coils, a register or coil write only triggers the ladders whose input range 
+            overlaps with the written range.
+
+    - vectorLadderLogic: An opt-in ladderLogic (needs numpy) which receives the holding 
+        registers and source coils as numpy arrays (the registers are a zero copy view of 
+        the compactDataBank memory), so thousands of similar rungs can be expressed as one 
+        array expression (comparisons, masks, AND/OR networks) and evaluated in one pass.
+        Creating it without numpy raises ImportError.
+
+    - dslLadderLogic: A ladderLogic whose rungs are written in the ladderDsl text program 
+        (such as "OUT[0] := REG[0] > 10 AND IN[0]"), the program is compiled once to a python
+        scan function with the constants folded and the dead rungs removed.
+
+    - compactDataBank: A pyModbusTcp.DataBank module stores the coils/discrete inputs in bit 
+        packed bytearray (Modbus LSB first order) and the registers in array('H') kept in the 
+        big-endian wire byte order, a 65536 coils + 65536 holding registers image only takes 
+        about 136KB. Besides the standard list get/set API, it provides the raw bytes read 
+        functions which slice the memory directly to the response PDU data field.
 
     - plcDataHandler: A pyModbusTcp.dataHandler module to keep one allow read white list and one 
         allow write white list to filter the client's coils or registers read and write request.
+        The white lists accept IPv4/IPv6 host and CIDR network and are compiled to ipAllowList.
         As most of the PLC are using the input => register (memory) parameter config, they are 
         not allowed to change the input directly, we only provide the coils and holding register 
         write functions.
     
     - modbusTcpClient: ModBus-TCP client module to read/write holding register and coils data 
-        from/to the target PLC. 
+        from/to the target PLC. Bulk APIs are provided to reduce the round trips: FC15/FC16 
+        multiple writes (auto split by the PDU limit), FC23 read/write multiple registers and 
+        readMany() which plans the minimum contiguous reads of a scattered address list.
 
     - modbusTcpServer: ModBus-TCP server module will be used by PLC module to handle the ModBus 
         data read/set request. If the input data handler is None, the server will create and keep 
-        one empty data bank inside.
+        one empty data bank inside. Two server engines can be selected: the pyModbusTCP thread 
+        per client engine (default) or the asyncModbusServer engine which serves all the clients
+        in one asyncio event loop and supports MBAP request pipelining.
 """
-import re
+import sys
 import time
+import struct
+import heapq
+import asyncio
+import ipaddress
+from array import array
 from collections import OrderedDict
 
+try:
+    import numpy as np  # optional, only needed by the vectorLadderLogic.
+except ImportError:
+    np = None
+
+import ladderDsl
+
 from pyModbusTCP.client import ModbusClient
 from pyModbusTCP.server import ModbusServer, DataHandler, DataBank
-from pyModbusTCP.constants import EXP_ILLEGAL_FUNCTION
+from pyModbusTCP.constants import EXP_NONE, EXP_ILLEGAL_FUNCTION, EXP_DATA_VALUE, EXP_DATA_ADDRESS
+
+ENGINE_THREAD = 'thread'    # pyModbusTCP server engine, one thread per client.
+ENGINE_ASYNCIO = 'asyncio'  # asyncio server engine, all clients in one event loop thread.
 
-IPV4_PATTERN = r'^(\d{1,3}\.){3}\d{1,3}$'
+RANGE_BLOCK_SZ = 64     # address block size of the ladder range index.
+ACL_CACHE_SZ = 4096     # max number of cached client connection access decisions.
+MBAP_HEADER = struct.Struct('>HHHB') # transaction id, protocol id, length, unit id.
+WRITE_BUF_HIGH = 64*1024    # asyncio engine socket send buffer size to wait for drain.
+
+# Modbus PDU quantity limits of the multiple read/write functions.
+MAX_READ_REGS = 125     # FC03/FC04 read holding/input registers.
+MAX_READ_COILS = 2000   # FC01/FC02 read coils/discrete inputs.
+MAX_WRITE_REGS = 123    # FC16 write multiple registers.
+MAX_WRITE_COILS = 1968  # FC15 write multiple coils.
+MAX_WR_WRITE_REGS = 121 # FC23 read/write multiple registers (write part).
+
+REGS_SWAP = sys.byteorder == 'little' # compactDataBank keeps registers in big-endian (wire) order.
 
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
@@ -73,6 +124,9 @@ class ladderLogic(object):
         self.holdingRegsInfo = {'address': None, 'offset': None}
         self.srcCoilsInfo = {'address': None, 'offset': None}
         self.destCoilsInfo = {'address': None, 'offset': None}
+        # True if the output depends on the time (such as a timer), the ladder is executed
+        # every scan even if its input registers/coils are not changed.
+        self.timeDependent = False
         self.initLadderInfo()
 
     def initLadderInfo(self):
@@ -96,6 +150,9 @@ class ladderLogic(object):
     def getDestCoilsInfo(self):
         return self.destCoilsInfo
 
+    def isTimeDependent(self):
+        return self.timeDependent
+
 #-----------------------------------------------------------------------------
     def runLadderLogic(self, regsList, coilList=None):
         """ Pass in the registers state list, source coils state list and 
@@ -105,6 +162,396 @@ class ladderLogic(object):
         """
         return []
 
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class vectorLadderLogic(ladderLogic):
+    """ Vectorized ladder logic, the plcDataHandler will call runVectorLogic() with the 
+        numpy arrays instead of runLadderLogic() with the lists. Example rung network
+        for every train: coil[i] = (speed[i] > 10) & enable[i]
+            def runVectorLogic(self, regsArr, coilArr=None):
+                return (regsArr > 10) & coilArr
+    """
+    vectorMode = True
+
+    def __init__(self, parent, ladderName=None) -> None:
+        # the runVectorLogic() rungs use the numpy array operators, they can not run 
+        # with the lists, so the ladder can not be created without numpy.
+        if np is None: raise ImportError("vectorLadderLogic needs the numpy lib: pip install numpy")
+        super().__init__(parent, ladderName=ladderName)
+
+    def runLadderLogic(self, regsList, coilList=None):
+        """ List based call compatible function, convert the lists to arrays."""
+        coilArr = None if coilList is None else np.asarray(coilList, dtype=bool)
+        result = self.runVectorLogic(np.asarray(regsList, dtype=np.uint16), coilArr)
+        return None if result is None else np.asarray(result, dtype=bool).tolist()
+
+    def runVectorLogic(self, regsArr, coilArr=None):
+        """ Pass in the registers state uint16 array (read only) and the source coils 
+            state bool array, return the destination coils bool array.
+            - Please over write this function.
+        """
+        return None
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class dslLadderLogic(ladderLogic):
+    """ Ladder logic written in the ladderDsl text program, the program is compiled once
+        to a python scan function. The DSL operands are mapped to the ladder's ranges:
+        REG[n] => holding register (regsAddr + n), IN[n] => source coil (srcCoilsAddr + n)
+        and OUT[n] => destination coil (destCoilsAddr + n). Example:
+            ladder = dslLadderLogic(None, "OUT[0] := REG[0] > 10 AND IN[0]", 
+                                    regsAddr=0, srcCoilsAddr=0, destCoilsAddr=2)
+    """
+    def __init__(self, parent, program, ladderName=None, regsAddr=0, srcCoilsAddr=0,
+                 destCoilsAddr=0) -> None:
+        """ Args:
+                parent (ref): parent object.
+                program (str/ladderProgram): DSL program text or a compiled ladderProgram.
+                ladderName (str, optional): ladder name. Defaults to None.
+                regsAddr (int, optional): holding registers start address. Defaults to 0.
+                srcCoilsAddr (int, optional): source coils start address. Defaults to 0.
+                destCoilsAddr (int, optional): destination coils start address. Defaults to 0.
+        """
+        if isinstance(program, str): program = ladderDsl.compileLadder(program, name=str(ladderName))
+        self.program = program
+        self.addrInfo = (regsAddr, srcCoilsAddr, destCoilsAddr)
+        super().__init__(parent, ladderName=ladderName)
+
+    def initLadderInfo(self):
+        if self.program is None: return # compile failed, the ladder will not be executed.
+        self.timeDependent = bool(self.program.blockNames)   # TON/TOF/CTU blocks.
+        regsAddr, srcCoilsAddr, destCoilsAddr = self.addrInfo
+        self.holdingRegsInfo = {'address': regsAddr, 'offset': self.program.regNum}
+        if self.program.inNum:
+            self.srcCoilsInfo = {'address': srcCoilsAddr, 'offset': self.program.inNum}
+        self.destCoilsInfo = {'address': destCoilsAddr, 'offset': self.program.outNum}
+
+    def runLadderLogic(self, regsList, coilList=None):
+        """ Run one scan of the compiled program and return the destination coils list."""
+        if self.program is None: return None
+        return [bool(val) for val in self.program.scan(regsList, coilList or ())]
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class ladderRangeIndex(object):
+    """ Interval index to find the ladder logics whose input address range (holding 
+        registers or source coils) overlaps with a written address range. The address 
+        space is split into fixed size blocks, each range is registered in all the blocks 
+        it covers, so a query only visits the blocks touched by the written range 
+        instead of checking every ladder.
+    """
+    def __init__(self, blockSize=RANGE_BLOCK_SZ) -> None:
+        self.blockSize = blockSize
+        self._blocks = {}   # block idx -> list of (start, end, ladderKey)
+        self._ranges = {}   # ladderKey -> (start, end)
+
+    def addRange(self, ladderKey, address, offset):
+        """ Add the ladder's input range [address, address+offset) in the index."""
+        self.removeRange(ladderKey)
+        if address is None or offset is None or offset <= 0: return False
+        start, end = int(address), int(address) + int(offset)
+        self._ranges[ladderKey] = (start, end)
+        for blockIdx in range(start // self.blockSize, (end - 1) // self.blockSize + 1):
+            self._blocks.setdefault(blockIdx, []).append((start, end, ladderKey))
+        return True
+
+    def removeRange(self, ladderKey):
+        """ Remove the ladder's input range from the index."""
+        if ladderKey not in self._ranges: return
+        start, end = self._ranges.pop(ladderKey)
+        for blockIdx in range(start // self.blockSize, (end - 1) // self.blockSize + 1):
+            block = [item for item in self._blocks[blockIdx] if item[2] != ladderKey]
+            if block:
+                self._blocks[blockIdx] = block
+            else:
+                self._blocks.pop(blockIdx)
+
+    def queryRange(self, address, offset):
+        """ Return the set of ladder keys whose range overlaps [address, address+offset)."""
+        result = set()
+        if offset <= 0 or not self._blocks: return result
+        start, end = address, address + offset
+        for blockIdx in range(start // self.blockSize, (end - 1) // self.blockSize + 1):
+            for rangeStart, rangeEnd, ladderKey in self._blocks.get(blockIdx, ()):
+                if rangeStart < end and start < rangeEnd: result.add(ladderKey)
+        return result
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class ipAllowList(object):
+    """ Compiled IP address allow list (ACL) used by the plcDataHandler to check the 
+        client's read/write permission. The input list items can be IPv4/IPv6 host
+        address or CIDR network string (such as '192.168.10.0/24', 'fd00::/64'):
+        - the host addresses are saved in a hash set for O(1) look up.
+        - the networks are saved in a prefix table {ipVersion: {prefixLen: set(networkInt)}},
+            a look up only checks the prefix lengths used by the list.
+        The access decisions are cached per client connection (ip, port). The object is 
+        read only after init, to change the list create a new object and replace the old 
+        one, so the cache is dropped with the old object.
+    """
+    def __init__(self, ipList=None) -> None:
+        """ Init example: acl = ipAllowList(['127.0.0.1', '10.0.0.0/8', 'fd00::/64'])
+            Args:
+                ipList (list(str), optional): allow ip/network list. Defaults to None allow 
+                    all the ip addresses.
+        """
+        self.allowAll = ipList is None
+        self._hosts = set()
+        self._prefixes = {4: {}, 6: {}}
+        self._cache = {}
+        for item in ipList or []:
+            self._addItem(str(item).strip())
+
+    def _addItem(self, item):
+        try:
+            network = ipaddress.ip_network(item, strict=False)
+        except ValueError:
+            # keep the not ip format string (such as 'localhost') for exact match.
+            self._hosts.add(item)
+            return
+        if network.num_addresses == 1:
+            self._hosts.add(item)
+            self._hosts.add(str(network.network_address))
+        else:
+            prefixTable = self._prefixes[network.version]
+            prefixTable.setdefault(network.prefixlen, set()).add(int(network.network_address))
+
+    def _match(self, ipStr):
+        if ipStr in self._hosts: return True
+        try:
+            ipAddr = ipaddress.ip_address(ipStr)
+        except ValueError:
+            return False
+        # map the IPv6 server's IPv4-mapped address (::ffff:a.b.c.d) to IPv4.
+        if ipAddr.version == 6 and ipAddr.ipv4_mapped: ipAddr = ipAddr.ipv4_mapped
+        if str(ipAddr) in self._hosts: return True
+        prefixTable = self._prefixes[ipAddr.version]
+        if not prefixTable: return False
+        ipInt, maxLen = int(ipAddr), ipAddr.max_prefixlen
+        for prefixLen, networkSet in prefixTable.items():
+            if (ipInt >> (maxLen - prefixLen)) << (maxLen - prefixLen) in networkSet: return True
+        return False
+
+    def isAllowed(self, ipStr, port=None):
+        """ Check whether the ip address is allowed, the result is cached under the 
+            connection (ipStr, port).
+        """
+        if self.allowAll: return True
+        connKey = (ipStr, port)
+        result = self._cache.get(connKey)
+        if result is None:
+            result = self._match(ipStr)
+            if len(self._cache) >= ACL_CACHE_SZ: self._cache.clear()
+            self._cache[connKey] = result
+        return result
+
+    @staticmethod
+    def checkIpItem(item):
+        """ Check whether the input is a valid ip address or CIDR network string."""
+        try:
+            ipaddress.ip_network(str(item).strip(), strict=False)
+            return True
+        except ValueError:
+            return False
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class compactDataBank(DataBank):
+    """ Memory compact Modbus data bank, the bits space are stored in bytearray (bit 
+        packed, LSB first same as the Modbus PDU) and the words space are stored in 
+        array('H') in big-endian byte order, so a read request can be served by slicing 
+        the memory to the response PDU without creating any per-element python objects.
+        It is plugged in by plcDataHandler(data_bank=compactDataBank()).
+    """
+    def __init__(self, coils_size=0x10000, coils_default_value=False,
+                 d_inputs_size=0x10000, d_inputs_default_value=False,
+                 h_regs_size=0x10000, h_regs_default_value=0,
+                 i_regs_size=0x10000, i_regs_default_value=0):
+        # init the parent in virtual mode so it doesn't allocate the python lists.
+        super().__init__(virtual_mode=True)
+        self.coils_size = int(coils_size)
+        self.coils_default_value = bool(coils_default_value)
+        self.d_inputs_size = int(d_inputs_size)
+        self.d_inputs_default_value = bool(d_inputs_default_value)
+        self.h_regs_size = int(h_regs_size)
+        self.h_regs_default_value = int(h_regs_default_value) & 0xFFFF
+        self.i_regs_size = int(i_regs_size)
+        self.i_regs_default_value = int(i_regs_default_value) & 0xFFFF
+        self.virtual_mode = False
+        self._coils = self._initBits(self.coils_size, self.coils_default_value)
+        self._d_inputs = self._initBits(self.d_inputs_size, self.d_inputs_default_value)
+        self._h_regs = self._initWords(self.h_regs_size, self.h_regs_default_value)
+        self._i_regs = self._initWords(self.i_regs_size, self.i_regs_default_value)
+        # only report the value changes if the sub class overrides the on change hooks.
+        self._coilsHook = type(self).on_coils_change is not DataBank.on_coils_change
+        self._hRegsHook = type(self).on_holding_registers_change is not DataBank.on_holding_registers_change
+
+    #-----------------------------------------------------------------------------
+    def _initBits(self, size, value):
+        buf = bytearray(b'\xff' if value else b'\x00') * ((size + 7) // 8)
+        if value and size % 8: buf[-1] = (1 << (size % 8)) - 1
+        return buf
+
+    def _initWords(self, size, value):
+        if REGS_SWAP: value = ((value & 0xFF) << 8) | (value >> 8)
+        return array('H', [value]) * size
+
+    def _getBitsVal(self, buf, size, address, number):
+        """ Return the bits [address: address+number] as an int (bit0 = address)."""
+        if address < 0 or number < 0 or address + number > size: return None
+        start, shift = divmod(address, 8)
+        val = int.from_bytes(buf[start:(address + number + 7) // 8], 'little') >> shift
+        return val & ((1 << number) - 1)
+
+    def _getBitsBytes(self, buf, size, address, number):
+        """ Return the bits [address: address+number] in the Modbus PDU data bytes."""
+        if address % 8 == 0 and number % 8 == 0:
+            if address < 0 or address + number > size: return None
+            return bytes(memoryview(buf)[address // 8:(address + number) // 8])
+        val = self._getBitsVal(buf, size, address, number)
+        return None if val is None else val.to_bytes((number + 7) // 8, 'little')
+
+    def _setBitsVal(self, buf, size, address, bitList):
+        """ Write the bits list to the bits space, return the (old, new) int of the range."""
+        number = len(bitList)
+        oldVal = self._getBitsVal(buf, size, address, number)
+        if oldVal is None: return None
+        newVal = int(''.join('1' if bit else '0' for bit in reversed(bitList)) or '0', 2)
+        start, shift = divmod(address, 8)
+        end = (address + number + 7) // 8
+        mask = ((1 << number) - 1) << shift
+        cur = int.from_bytes(buf[start:end], 'little')
+        buf[start:end] = ((cur & ~mask) | (newVal << shift)).to_bytes(end - start, 'little')
+        return (oldVal, newVal)
+
+    def _getWords(self, regs, address, number):
+        if address < 0 or number < 0 or address + number > len(regs): return None
+        data = regs[address:address + number]
+        if REGS_SWAP: data.byteswap()
+        return data.tolist()
+
+    def _getWordsBytes(self, regs, address, number):
+        if address < 0 or number < 0 or address + number > len(regs): return None
+        return bytes(memoryview(regs)[address:address + number].cast('B'))
+
+    def _setWords(self, regs, address, wordList):
+        """ Write the words list to the words space, return the old words array."""
+        data = array('H', [int(w) & 0xFFFF for w in wordList])
+        if address < 0 or address + len(data) > len(regs): return None
+        if REGS_SWAP: data.byteswap()
+        oldData = regs[address:address + len(data)]
+        regs[address:address + len(data)] = data
+        return oldData
+
+    #-----------------------------------------------------------------------------
+    # pyModbusTCP DataBank list API.
+    def get_coils(self, address, number=1, srv_info=None):
+        with self._coils_lock:
+            val = self._getBitsVal(self._coils, self.coils_size, address, number)
+        return None if val is None else _unpackBits(val.to_bytes((number + 7) // 8, 'little'), number)
+
+    def set_coils(self, address, bit_list, srv_info=None):
+        with self._coils_lock:
+            result = self._setBitsVal(self._coils, self.coils_size, address, bit_list)
+        if result is None: return None
+        if srv_info and self._coilsHook:
+            changed = result[0] ^ result[1]
+            while changed:
+                offset = (changed & -changed).bit_length() - 1
+                self.on_coils_change(address + offset, bool((result[0] >> offset) & 1),
+                                     bool((result[1] >> offset) & 1), srv_info)
+                changed &= changed - 1
+        return True
+
+    def get_discrete_inputs(self, address, number=1, srv_info=None):
+        with self._d_inputs_lock:
+            val = self._getBitsVal(self._d_inputs, self.d_inputs_size, address, number)
+        return None if val is None else _unpackBits(val.to_bytes((number + 7) // 8, 'little'), number)
+
+    def set_discrete_inputs(self, address, bit_list):
+        with self._d_inputs_lock:
+            result = self._setBitsVal(self._d_inputs, self.d_inputs_size, address, bit_list)
+        return None if result is None else True
+
+    def get_holding_registers(self, address, number=1, srv_info=None):
+        with self._h_regs_lock:
+            return self._getWords(self._h_regs, address, number)
+
+    def set_holding_registers(self, address, word_list, srv_info=None):
+        with self._h_regs_lock:
+            oldData = self._setWords(self._h_regs, address, word_list)
+        if oldData is None: return None
+        if srv_info and self._hRegsHook:
+            if REGS_SWAP: oldData.byteswap()
+            for offset, oldVal in enumerate(oldData):
+                newVal = int(word_list[offset]) & 0xFFFF
+                if oldVal != newVal:
+                    self.on_holding_registers_change(address + offset, oldVal, newVal, srv_info=srv_info)
+        return True
+
+    def get_input_registers(self, address, number=1, srv_info=None):
+        with self._i_regs_lock:
+            return self._getWords(self._i_regs, address, number)
+
+    def set_input_registers(self, address, word_list):
+        with self._i_regs_lock:
+            return None if self._setWords(self._i_regs, address, word_list) is None else True
+
+    #-----------------------------------------------------------------------------
+    # numpy array API (used by the vectorLadderLogic).
+    def get_holding_registers_array(self, address, number=1):
+        """ Return a read only numpy big-endian uint16 view (no copy) of the holding 
+            registers [address: address+number], None if out of range.
+        """
+        if address < 0 or number < 0 or address + number > self.h_regs_size: return None
+        view = np.frombuffer(self._h_regs, dtype='>u2')[address:address + number]
+        view.flags.writeable = False
+        return view
+
+    def get_coils_array(self, address, number=1):
+        """ Return the coils [address: address+number] as a numpy bool array."""
+        with self._coils_lock:
+            data = self._getBitsBytes(self._coils, self.coils_size, address, number)
+        if data is None: return None
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=number,
+                             bitorder='little').view(bool)
+
+    def set_coils_array(self, address, bitArr, srv_info=None):
+        """ Write the numpy bool array to the coils, the byte aligned range is packed 
+            and copied to the memory directly.
+        """
+        number = len(bitArr)
+        if address % 8 or self._coilsHook and srv_info:
+            return self.set_coils(address, np.asarray(bitArr, dtype=bool).tolist(), srv_info)
+        if address < 0 or address + number > self.coils_size: return None
+        packed = np.packbits(np.asarray(bitArr, dtype=bool), bitorder='little').tobytes()
+        start, fullNum = address // 8, number // 8
+        with self._coils_lock:
+            self._coils[start:start + fullNum] = packed[:fullNum]
+            if number % 8:
+                mask = (1 << (number % 8)) - 1
+                self._coils[start + fullNum] = (self._coils[start + fullNum] & ~mask) | packed[fullNum]
+        return True
+
+    #-----------------------------------------------------------------------------
+    # Raw bytes API: return the Modbus PDU data field (coils LSB first packed bytes or 
+    # big-endian registers bytes) or None if the address is out of range.
+    def get_coils_bytes(self, address, number=1):
+        with self._coils_lock:
+            return self._getBitsBytes(self._coils, self.coils_size, address, number)
+
+    def get_discrete_inputs_bytes(self, address, number=1):
+        with self._d_inputs_lock:
+            return self._getBitsBytes(self._d_inputs, self.d_inputs_size, address, number)
+
+    def get_holding_registers_bytes(self, address, number=1):
+        with self._h_regs_lock:
+            return self._getWordsBytes(self._h_regs, address, number)
+
+    def get_input_registers_bytes(self, address, number=1):
+        with self._i_regs_lock:
+            return self._getWordsBytes(self._i_regs, address, number)
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class plcDataHandler(DataHandler):
@@ -117,29 +564,36 @@ class plcDataHandler(DataHandler):
     def __init__(self, data_bank=None, allowRipList=None, allowWipList=None):
         """ Obj init example: plcDataHandler(allowRipList=['127.0.0.1', '192.168.10.112'], allowWipList=['192.168.10.113'])
         Args:
-            data_bank (<pyModbusTcp.DataBank>, optional): . Defaults to None.
-            allowRipList (list(str), optional): list of ip address string which are allowed to read 
-                the data from PLC. Defaults to None allow any ip to read. 
-            allowWipList (list(str), optional): list of ip address string which are allowed to write
-                the data to PLC. Defaults to None allow any ip to write.
+            data_bank (<pyModbusTcp.DataBank>, optional): data bank obj such as <compactDataBank>.
+                Defaults to None (create a pyModbusTcp.DataBank).
+            allowRipList (list(str), optional): list of ip address or CIDR network string which 
+                are allowed to read the data from PLC. Defaults to None allow any ip to read. 
+            allowWipList (list(str), optional): list of ip address or CIDR network string which 
+                are allowed to write the data to PLC. Defaults to None allow any ip to write.
         """
         self.data_bank = DataBank() if data_bank is None else data_bank
         super().__init__(self.data_bank)
         self.serverInfo = None
         self.allowRipList = allowRipList
         self.allowWipList = allowWipList
+        self._readAcl = ipAllowList(allowRipList)
+        self._writeAcl = ipAllowList(allowWipList)
         self.autoUpdate = False # auto update if the holding register state changed. 
         self.ladderDict = OrderedDict()
+        # address range index of the ladder logics' input registers and source coils.
+        self.regsLadderIdx = ladderRangeIndex()
+        self.coilsLadderIdx = ladderRangeIndex()
+        self._ladderSeq = {} # ladder key -> add in sequence number.
+        self._timedKeys = [] # keys of the time dependent ladders executed every scan.
+        self.coilsSeq = 0   # increased by every coils write (SCADA or ladder output).
 
-    def _checkAllowRead(self, ipaddress):
+    def _checkAllowRead(self, ipaddress, port=None):
         """ Check whether the input IP address is allowed to read the info."""
-        if (self.allowRipList is None) or (ipaddress in self.allowRipList): return True
-        return False 
+        return self._readAcl.isAllowed(ipaddress, port)
 
-    def _checkAllowWrite(self, ipaddress):
+    def _checkAllowWrite(self, ipaddress, port=None):
         """ Check whether the input IP address is allowed to write the info."""
-        if (self.allowWipList is None) or (ipaddress in self.allowWipList): return True
-        return False
+        return self._writeAcl.isAllowed(ipaddress, port)
     
 #-----------------------------------------------------------------------------
     def initServerInfo(self, serverInfo):
@@ -153,27 +607,27 @@ class plcDataHandler(DataHandler):
     def addAllowReadIp(self, ipaddress):
         """ Add a IP address to the allow read list.
             Args:
-                ipaddress (str): ip address string
+                ipaddress (str): IPv4/IPv6 address or CIDR network string.
         """
         if not isinstance(ipaddress, str): ipaddress = str(ipaddress)
-        if ipaddress and re.match(IPV4_PATTERN, ipaddress):
-            if not ipaddress in self.allowRipList:
-                self.allowRipList.append(ipaddress)
-            return True
+        if ipaddress and ipAllowList.checkIpItem(ipaddress):
+            ipList = list(self.allowRipList) if self.allowRipList else []
+            if not ipaddress in ipList: ipList.append(ipaddress)
+            return self.setAllowReadIpaddresses(ipList)
         print("Error addAllowReadIp() : Invalid IP address %s" %ipaddress)
         return False
 
     def addAllowWriteIp(self, ipaddress):
         """ Add a IP address to the allow write list.
             Args:
-                ipaddress (str): ip address string
+                ipaddress (str): IPv4/IPv6 address or CIDR network string.
         """
         if not isinstance(ipaddress, str): ipaddress = str(ipaddress)
-        if ipaddress and re.match(IPV4_PATTERN, ipaddress):
-            if not ipaddress in self.allowWipList:
-                self.allowWipList.append(ipaddress)
-            return True
-        print("Error addAllowReadIp() : Invalid IP address %s" %ipaddress)
+        if ipaddress and ipAllowList.checkIpItem(ipaddress):
+            ipList = list(self.allowWipList) if self.allowWipList else []
+            if not ipaddress in ipList: ipList.append(ipaddress)
+            return self.setAllowWriteIpaddresses(ipList)
+        print("Error addAllowWriteIp() : Invalid IP address %s" %ipaddress)
         return False
         
     def addLadderLogic(self, ladderKey, logicObj):
@@ -184,7 +638,14 @@ class plcDataHandler(DataHandler):
                 ladderKey (str): ladder logic name
                 logicObj (ladderLogic): _description_
         """
+        if ladderKey not in self.ladderDict: self._ladderSeq[ladderKey] = len(self._ladderSeq)
         self.ladderDict[ladderKey] = logicObj
+        self._timedKeys = [key for key, ladder in self.ladderDict.items() 
+                           if getattr(ladder, 'timeDependent', False)]
+        holdRegsInfo = logicObj.getHoldingRegsInfo()
+        self.regsLadderIdx.addRange(ladderKey, holdRegsInfo['address'], holdRegsInfo['offset'])
+        srcCoilInfo = logicObj.getSrcCoilsInfo()
+        self.coilsLadderIdx.addRange(ladderKey, srcCoilInfo['address'], srcCoilInfo['offset'])
 
 #-----------------------------------------------------------------------------
 # Init all the iterator read() functions.(Internal callback by <modbusTcpServer>)
@@ -196,7 +657,7 @@ class plcDataHandler(DataHandler):
     def read_coils(self, address, addrOffset, srv_info):
         """ Read the output coils state"""
         try:
-            if self._checkAllowRead(srv_info.client.address):
+            if self._checkAllowRead(srv_info.client.address, srv_info.client.port):
                 return super().read_coils(address, addrOffset, srv_info)
         except Exception as err:
             print("read_coils() Error: %s" %str(err))
@@ -205,7 +666,7 @@ class plcDataHandler(DataHandler):
     def read_d_inputs(self, address, addrOffset, srv_info):
         """ Read the discrete input idx[I0.x]"""
         try:
-            if self._checkAllowRead(srv_info.client.address):
+            if self._checkAllowRead(srv_info.client.address, srv_info.client.port):
                 return super().read_d_inputs(address, addrOffset, srv_info)
         except Exception as err:
             print("read_d_inputs() Error: %s" %str(err))
@@ -214,7 +675,7 @@ class plcDataHandler(DataHandler):
     def read_h_regs(self, address, addrOffset, srv_info):
         """ Read the holding registers [idx]. """
         try:
-            if self._checkAllowRead(srv_info.client.address):
+            if self._checkAllowRead(srv_info.client.address, srv_info.client.port):
                 return super().read_h_regs(address, addrOffset, srv_info)
         except Exception as err:
             print("read_h_regs() Error: %s" %str(err))
@@ -223,12 +684,49 @@ class plcDataHandler(DataHandler):
     def read_i_regs(self, address, addrOffset, srv_info):
         """ Read the input registers"""
         try:
-            if self._checkAllowRead(srv_info.client.address):
+            if self._checkAllowRead(srv_info.client.address, srv_info.client.port):
                 return super().read_i_regs(address, addrOffset, srv_info)
         except Exception as err:
             print("read_i_regs() Error: %s" %str(err))
         return DataHandler.Return(exp_code=EXP_ILLEGAL_FUNCTION)
 
+#-----------------------------------------------------------------------------
+# Init all the raw read() functions, return the Modbus response PDU data field bytes 
+# in the DataHandler.Return.data. (Internal callback by <asyncModbusServer>)
+# If the data bank is a <compactDataBank> the bytes are sliced from the memory 
+# directly, else they are packed from the data bank's list.
+
+    def _readRaw(self, rawFun, listFun, isBits, address, addrOffset, srv_info):
+        try:
+            if self._checkAllowRead(srv_info.client.address, srv_info.client.port):
+                if rawFun is None:
+                    ret = listFun(address, addrOffset, srv_info)
+                    if not ret.ok: return ret
+                    data = _packBits(ret.data) if isBits else struct.pack('>%dH' % len(ret.data), *ret.data)
+                else:
+                    data = rawFun(address, addrOffset)
+                    if data is None: return DataHandler.Return(exp_code=EXP_DATA_ADDRESS)
+                return DataHandler.Return(exp_code=EXP_NONE, data=data)
+        except Exception as err:
+            print("_readRaw() Error: %s" %str(err))
+        return DataHandler.Return(exp_code=EXP_ILLEGAL_FUNCTION)
+
+    def read_coils_raw(self, address, addrOffset, srv_info):
+        return self._readRaw(getattr(self.data_bank, 'get_coils_bytes', None),
+                             super().read_coils, True, address, addrOffset, srv_info)
+
+    def read_d_inputs_raw(self, address, addrOffset, srv_info):
+        return self._readRaw(getattr(self.data_bank, 'get_discrete_inputs_bytes', None),
+                             super().read_d_inputs, True, address, addrOffset, srv_info)
+
+    def read_h_regs_raw(self, address, addrOffset, srv_info):
+        return self._readRaw(getattr(self.data_bank, 'get_holding_registers_bytes', None),
+                             super().read_h_regs, False, address, addrOffset, srv_info)
+
+    def read_i_regs_raw(self, address, addrOffset, srv_info):
+        return self._readRaw(getattr(self.data_bank, 'get_input_registers_bytes', None),
+                             super().read_i_regs, False, address, addrOffset, srv_info)
+
 #-----------------------------------------------------------------------------
 # Init all the iterator write() functions.(Internal callback by <modbusTcpServer>)
 # All the input args will follow below below formate:
@@ -240,8 +738,11 @@ class plcDataHandler(DataHandler):
     def write_coils(self, address, bits_l, srv_info):
         """ Write the PLC out coils."""
         try:
-            if self._checkAllowWrite(srv_info.client.address):
-                return super().write_coils(address, bits_l, srv_info)
+            if self._checkAllowWrite(srv_info.client.address, srv_info.client.port):
+                result = super().write_coils(address, bits_l, srv_info)
+                self.coilsSeq += 1
+                if self.autoUpdate: self.updateState(coilsRange=(address, len(bits_l)))
+                return result
         except Exception as err:
             print("write_coils() Error: %s" %str(err))
         return DataHandler.Return(exp_code=EXP_ILLEGAL_FUNCTION)
@@ -249,9 +750,9 @@ class plcDataHandler(DataHandler):
     def write_h_regs(self, address, words_l, srv_info):
         """ write the holding registers."""
         try:
-            if self._checkAllowWrite(srv_info.client.address):
+            if self._checkAllowWrite(srv_info.client.address, srv_info.client.port):
                 result = super().write_h_regs(address, words_l, srv_info)
-                if self.autoUpdate: self.updateState()
+                if self.autoUpdate: self.updateState(regsRange=(address, len(words_l)))
                 return result
         except Exception as err:
             print("write_h_regs() Error: %s" %str(err))
@@ -271,6 +772,22 @@ class plcDataHandler(DataHandler):
             return self.data_bank.get_holding_registers(address, number=offset, srv_info=self.serverInfo)
         return None 
 
+    def getHoldingRegArray(self, address, offset):
+        """ Return the holding registers as a numpy array (zero copy view if the data 
+            bank is a compactDataBank).
+        """
+        if hasattr(self.data_bank, 'get_holding_registers_array'):
+            return self.data_bank.get_holding_registers_array(address, offset)
+        regs = self.getHoldingRegState(address, offset)
+        return None if regs is None else np.asarray(regs, dtype=np.uint16)
+
+    def getCoilArray(self, address, offset):
+        """ Return the coils state as a numpy bool array."""
+        if hasattr(self.data_bank, 'get_coils_array'):
+            return self.data_bank.get_coils_array(address, offset)
+        coils = self.getCoilState(address, offset)
+        return None if coils is None else np.asarray(coils, dtype=bool)
+
     def getCoilState(self, address, offset):
         if self.data_bank and self.serverInfo:
             return self.data_bank.get_coils(address, number=offset, srv_info=self.serverInfo)
@@ -283,21 +800,40 @@ class plcDataHandler(DataHandler):
         self.autoUpdate = updateFlag
 
     def setAllowReadIpaddresses(self, ipList):
+        """ Replace the allow read list, the ACL is compiled first then swapped in 
+            so the running read checks always see a complete list. None allow all.
+        """
         if isinstance(ipList, list) or isinstance(ipList, tuple) or ipList is None:
-            self.allowRipList = list(ipList)
+            ipList = None if ipList is None else list(ipList)
+            readAcl = ipAllowList(ipList)
+            self.allowRipList, self._readAcl = ipList, readAcl
             return True
         print("Error setAllowReadIpaddresses(): the input IP list is not valid.")
         return False
 
     def setAllowWriteIpaddresses(self, ipList):
+        """ Replace the allow write list, the ACL is compiled first then swapped in 
+            so the running write checks always see a complete list. None allow all.
+        """
         if isinstance(ipList, list) or isinstance(ipList, tuple) or ipList is None:
-            self.allowWipList = list(ipList)
+            ipList = None if ipList is None else list(ipList)
+            writeAcl = ipAllowList(ipList)
+            self.allowWipList, self._writeAcl = ipList, writeAcl
             return True
         print("Error setAllowWriteIpaddresses(): the input IP list is not valid.")
         return False
 
+    def getCoilsSeq(self):
+        """ Return the coils write counter, the coils are not changed if it is the same."""
+        return self.coilsSeq
+
     def updateOutPutCoils(self, address, bitList):
         if self.serverInfo:
+            self.coilsSeq += 1
+            if np is not None and isinstance(bitList, np.ndarray):
+                if hasattr(self.data_bank, 'set_coils_array'):
+                    return self.data_bank.set_coils_array(address, bitList, self.serverInfo)
+                bitList = bitList.tolist()
             return super().write_coils(address, bitList, self.serverInfo)
         print("Error updateOutPutCoils() Error: Parent modBus server not config, call initServerInfo() first.")
         return False
@@ -305,31 +841,108 @@ class plcDataHandler(DataHandler):
     def updateHoldingRegs(self, address, bitList):
         if self.serverInfo:
             result = super().write_h_regs(address, bitList, self.serverInfo)
-            if self.autoUpdate: self.updateState()
+            if self.autoUpdate: self.updateState(regsRange=(address, len(bitList)))
             return result
         print("Error updateHoldingRegs() : Parent modBus server not config, call initServerInfo() first.")
         return False
 
-    def updateState(self):
-        """ Update the PLC state base on the input ladder logic one by one."""
-        for key, item in self.ladderDict.items():
-            print("updateState(): update ladder logic: %s" %str(key))
-            # get the ladder logic related registers state.
-            holdRegsInfo = item.getHoldingRegsInfo()
-            if holdRegsInfo['address'] is None or holdRegsInfo['offset'] is None: continue
-            regState = self.getHoldingRegState(holdRegsInfo['address'], holdRegsInfo['offset'])
-            # get the ladder logic related coils state. 
-            srcCoilState = None
-            srcCoilInfo = item.getSrcCoilsInfo()
-            if srcCoilInfo['address'] is None or srcCoilInfo['offset'] is None:
-                pass
-            else:
-                srcCoilState = self.getCoilState(srcCoilInfo['address'], srcCoilInfo['offset'])
-            # calculate the output coils state and update the coils.
+    def updateHoldingRegsRuns(self, runList):
+        """ Update several changed holding registers runs, the ladder logic affected by 
+            any of the runs will only be executed once after all the runs are written. The
+            time dependent ladders are executed even if the runList is empty.
+            Args:
+                runList (list): [(address, regsValueList), ...]
+        """
+        if self.serverInfo:
+            result = True
+            for address, valList in runList:
+                if not super().write_h_regs(address, valList, self.serverInfo).ok: result = False
+            if self.autoUpdate: 
+                self.updateState(regsRange=[(address, len(valList)) for address, valList in runList], timed=True)
+            return result
+        print("Error updateHoldingRegsRuns() : Parent modBus server not config, call initServerInfo() first.")
+        return False
+
+    def _getAffectedLadders(self, regsRange, coilsRange):
+        """ Return the ladder logic (key, obj) list whose input registers or source coils 
+            overlap with the changed (address, offset) range, in the add in sequence. The 
+            regsRange can also be a list of (address, offset) ranges.
+        """
+        keys = set()
+        if regsRange:
+            for rangeItem in (regsRange if isinstance(regsRange, list) else [regsRange]):
+                keys |= self.regsLadderIdx.queryRange(*rangeItem)
+        if coilsRange: keys |= self.coilsLadderIdx.queryRange(*coilsRange)
+        return [(key, self.ladderDict[key]) for key in sorted(keys, key=self._ladderSeq.get)]
+
+    def updateState(self, regsRange=None, coilsRange=None, timed=False):
+        """ Update the PLC state base on the input ladder logic one by one. 
+            Args:
+                regsRange (tuple(int, int), optional): changed holding registers (address, offset)
+                    or a list of the changed (address, offset) ranges.
+                coilsRange (tuple(int, int), optional): changed coils (address, offset).
+                timed (bool, optional): also execute the time dependent ladders. Defaults to False.
+                If both ranges are None and not timed, all the ladder logic will be executed, 
+                else only the ladder logic whose input overlaps the changed ranges (and the 
+                time dependent ladders if timed) will be executed, and a ladder whose source 
+                coils are the dest coils written by an executed ladder is also executed 
+                (chained ladders) in the add in sequence.
+        """
+        if regsRange is None and coilsRange is None and not timed:
+            for key, item in self.ladderDict.items(): self._runLadder(key, item)
+            return
+        queued = set(key for key, _ in self._getAffectedLadders(regsRange, coilsRange))
+        if timed: queued.update(self._timedKeys)
+        pending = [(self._ladderSeq[key], key) for key in queued]
+        heapq.heapify(pending)
+        while pending:
+            _, key = heapq.heappop(pending)
+            destRange = self._runLadder(key, self.ladderDict[key])
+            if destRange is None: continue
+            for nextKey in self.coilsLadderIdx.queryRange(*destRange):
+                if nextKey in queued: continue
+                queued.add(nextKey)
+                heapq.heappush(pending, (self._ladderSeq[nextKey], nextKey))
+
+    def updateTimedLadders(self):
+        """ Execute the time dependent ladders (and their chained ladders) when the inputs
+            are not changed, so the timers keep running. Return True if any executed.
+        """
+        if not self._timedKeys: return False
+        self.updateState(timed=True)
+        return True
+
+    def hasTimedLadders(self):
+        return len(self._timedKeys) > 0
+
+    def _runLadder(self, key, item):
+        """ Execute one ladder logic and write its dest coils, return the written dest 
+            coils (address, offset) range, None if nothing written.
+        """
+        print("updateState(): update ladder logic: %s" %str(key))
+        # get the ladder logic related registers state.
+        holdRegsInfo = item.getHoldingRegsInfo()
+        if holdRegsInfo['address'] is None or holdRegsInfo['offset'] is None: return None
+        vectorMode = np is not None and getattr(item, 'vectorMode', False)
+        getRegFun = self.getHoldingRegArray if vectorMode else self.getHoldingRegState
+        regState = getRegFun(holdRegsInfo['address'], holdRegsInfo['offset'])
+        # get the ladder logic related coils state. 
+        srcCoilState = None
+        srcCoilInfo = item.getSrcCoilsInfo()
+        if srcCoilInfo['address'] is None or srcCoilInfo['offset'] is None:
+            pass
+        else:
+            getCoilFun = self.getCoilArray if vectorMode else self.getCoilState
+            srcCoilState = getCoilFun(srcCoilInfo['address'], srcCoilInfo['offset'])
+        # calculate the output coils state and update the coils.
+        if vectorMode:
+            destCoilState = item.runVectorLogic(regState, coilArr=srcCoilState)
+        else:
             destCoilState = item.runLadderLogic(regState, coilList=srcCoilState)
-            if destCoilState is None or len(destCoilState) == 0: continue
-            destCoidInfo = item.getDestCoilsInfo()
-            self.updateOutPutCoils(destCoidInfo['address'], destCoilState)
+        if destCoilState is None or len(destCoilState) == 0: return None
+        destCoidInfo = item.getDestCoilsInfo()
+        self.updateOutPutCoils(destCoidInfo['address'], destCoilState)
+        return (destCoidInfo['address'], len(destCoilState))
             
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
@@ -383,6 +996,32 @@ class modbusTcpClient(object):
             if data: return list(data)
         return None
 
+    def readMany(self, addrList, dataType='regs'):
+        """ Read a list of scattered addresses with the minimum number of contiguous reads 
+            (each read is limited by the PDU size: 125 registers or 2000 coils).
+            Args:
+                addrList (list): address list such as [0, 3, 150, 151].
+                dataType (str, optional): 'regs' for holding registers or 'coils'. 
+                    Defaults to 'regs'.
+            Returns:
+                dict: {address: value} if all the reads success, else None.
+        """
+        if dataType == 'coils':
+            readFun, maxCount = self.getCoilsBits, MAX_READ_COILS
+        elif dataType == 'regs':
+            readFun, maxCount = self.getHoldingRegs, MAX_READ_REGS
+        else:
+            print("Error: readMany() dataType must be 'regs' or 'coils'.")
+            return None
+        addrSet = set(addrList)
+        result = {}
+        for startAddr, count in planReadBlocks(addrSet, maxCount):
+            data = readFun(startAddr, count)
+            if data is None: return None
+            for i, val in enumerate(data):
+                if startAddr + i in addrSet: result[startAddr + i] = val
+        return result
+
 #-----------------------------------------------------------------------------
 # Define all the set() functions here:
 
@@ -398,16 +1037,273 @@ class modbusTcpClient(object):
             return data
         return None
 
+    def setMultiCoils(self, addressIdx, bitList):
+        """ Set the coils [addressIdx: addressIdx + len(bitList)] with FC15, the list 
+            will be split to several requests if it is longer than the PDU limit.
+            Returns: True if all the writes success, False if any failed, None if not connected.
+        """
+        if self.client.is_open:
+            for i in range(0, len(bitList), MAX_WRITE_COILS):
+                if not self.client.write_multiple_coils(addressIdx + i, 
+                                                        list(bitList[i:i+MAX_WRITE_COILS])):
+                    return False
+            return True
+        return None
+
+    def setMultiHoldingRegs(self, addressIdx, valList):
+        """ Set the holding registers [addressIdx: addressIdx + len(valList)] with FC16, 
+            the list will be split to several requests if it is longer than the PDU limit.
+            Returns: True if all the writes success, False if any failed, None if not connected.
+        """
+        if self.client.is_open:
+            for i in range(0, len(valList), MAX_WRITE_REGS):
+                if not self.client.write_multiple_registers(addressIdx + i, 
+                                                            list(valList[i:i+MAX_WRITE_REGS])):
+                    return False
+            return True
+        return None
+
+    def writeReadHoldingRegs(self, writeAddr, valList, readAddr, readNum):
+        """ Write the holding registers then read the holding registers in one FC23 round 
+            trip, (the server executes the write before the read).
+            Args:
+                writeAddr (int): write start address.
+                valList (list): register values to write (max 121).
+                readAddr (int): read start address.
+                readNum (int): number of registers to read (max 125).
+            Returns:
+                list: the read registers list if success, else None.
+        """
+        if len(valList) > MAX_WR_WRITE_REGS or readNum > MAX_READ_REGS:
+            print("Error: writeReadHoldingRegs() registers number over the PDU limit.")
+            return None
+        if self.client.is_open:
+            data = self.client.write_read_multiple_registers(writeAddr, list(valList), 
+                                                             readAddr, readNum)
+            if data: return list(data)
+        return None
+
     def close(self):
         self.client.close()
 
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+def planReadBlocks(addrList, maxCount):
+    """ Plan the contiguous read blocks to cover all the addresses in the list, every 
+        block size <= maxCount. Greedy from the lowest address (start a new block when 
+        the next address is out of the current block's reach) gives the minimum number 
+        of blocks.
+        Returns: list of (startAddress, count) tuples.
+    """
+    blocks = []
+    startAddr = lastAddr = None
+    for addr in sorted(set(addrList)):
+        if startAddr is not None and addr - startAddr < maxCount:
+            lastAddr = addr
+            continue
+        if startAddr is not None: blocks.append((startAddr, lastAddr - startAddr + 1))
+        startAddr = lastAddr = addr
+    if startAddr is not None: blocks.append((startAddr, lastAddr - startAddr + 1))
+    return blocks
+
+#-----------------------------------------------------------------------------
+def _packBits(bitList):
+    """ Pack the bool list to the Modbus LSB first bytes."""
+    byteCount = (len(bitList) + 7) // 8
+    if not bitList: return b''
+    bitStr = ''.join('1' if bit else '0' for bit in reversed(bitList))
+    return int(bitStr, 2).to_bytes(byteCount, 'little')
+
+def _unpackBits(data, bitCount):
+    """ Unpack the Modbus LSB first bytes to a bool list."""
+    val = int.from_bytes(data, 'little')
+    return [bool((val >> i) & 1) for i in range(bitCount)]
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class asyncModbusServer(object):
+    """ asyncio based Modbus-TCP server engine, all the client connections are served 
+        in one event loop thread instead of one thread per client. The requests are passed
+        to the same pyModbusTCP DataHandler interface (such as plcDataHandler) so the ACL 
+        and ladder logic callbacks are reused. Pipelining is supported: a client can send 
+        several requests (different MBAP transaction IDs) without waiting for the response, 
+        the requests are processed in sequence and every response carries its request's 
+        transaction ID.
+    """
+    # keep the same server info container as pyModbusTCP for the data handler.
+    ServerInfo = ModbusServer.ServerInfo
+
+    def __init__(self, host='localhost', port=502, data_hdl=None) -> None:
+        self.host = host
+        self.port = port
+        self.data_hdl = DataHandler(DataBank()) if data_hdl is None else data_hdl
+        self._loop = None
+        self._stopEvent = None
+        self._running = False
+        self._funcMap = {
+            1: self._readBits, 2: self._readBits,
+            3: self._readWords, 4: self._readWords,
+            5: self._writeSingleCoil, 6: self._writeSingleReg,
+            15: self._writeMultiCoils, 16: self._writeMultiRegs,
+            23: self._writeReadMultiRegs,
+        }
+        # use the data handler's raw read functions (response PDU data bytes) if provided.
+        self._rawReadMap = {
+            1: getattr(self.data_hdl, 'read_coils_raw', None),
+            2: getattr(self.data_hdl, 'read_d_inputs_raw', None),
+            3: getattr(self.data_hdl, 'read_h_regs_raw', None),
+            4: getattr(self.data_hdl, 'read_i_regs_raw', None),
+        }
+
+    @property
+    def is_run(self):
+        return self._running
+
+    #-----------------------------------------------------------------------------
+    def _buildExcept(self, funcCode, expCode):
+        return struct.pack('BB', funcCode | 0x80, expCode)
+
+    def _readBits(self, pdu, srvInfo):
+        """ Functions Read Coils (0x01) or Read Discrete Inputs (0x02)."""
+        funcCode = pdu[0]
+        address, count = struct.unpack_from('>HH', pdu, 1)
+        if not 0x0001 <= count <= 0x07D0: return self._buildExcept(funcCode, EXP_DATA_VALUE)
+        rawRead = self._rawReadMap[funcCode]
+        if rawRead:
+            ret = rawRead(address, count, srvInfo)
+            if not ret.ok: return self._buildExcept(funcCode, ret.exp_code)
+            return struct.pack('BB', funcCode, len(ret.data)) + ret.data
+        if funcCode == 1:
+            ret = self.data_hdl.read_coils(address, count, srvInfo)
+        else:
+            ret = self.data_hdl.read_d_inputs(address, count, srvInfo)
+        if not ret.ok: return self._buildExcept(funcCode, ret.exp_code)
+        data = _packBits(ret.data)
+        return struct.pack('BB', funcCode, len(data)) + data
+
+    def _readWords(self, pdu, srvInfo):
+        """ Functions Read Holding Registers (0x03) or Read Input Registers (0x04)."""
+        funcCode = pdu[0]
+        address, count = struct.unpack_from('>HH', pdu, 1)
+        if not 0x0001 <= count <= 0x007D: return self._buildExcept(funcCode, EXP_DATA_VALUE)
+        rawRead = self._rawReadMap[funcCode]
+        if rawRead:
+            ret = rawRead(address, count, srvInfo)
+            if not ret.ok: return self._buildExcept(funcCode, ret.exp_code)
+            return struct.pack('BB', funcCode, count * 2) + ret.data
+        if funcCode == 3:
+            ret = self.data_hdl.read_h_regs(address, count, srvInfo)
+        else:
+            ret = self.data_hdl.read_i_regs(address, count, srvInfo)
+        if not ret.ok: return self._buildExcept(funcCode, ret.exp_code)
+        return struct.pack('>BB%dH' % len(ret.data), funcCode, count * 2, *ret.data)
+
+    def _writeSingleCoil(self, pdu, srvInfo):
+        """ Function Write Single Coil (0x05)."""
+        address, value = struct.unpack_from('>HH', pdu, 1)
+        if value not in (0xFF00, 0x0000): return self._buildExcept(pdu[0], EXP_DATA_VALUE)
+        ret = self.data_hdl.write_coils(address, [value == 0xFF00], srvInfo)
+        return bytes(pdu[:5]) if ret.ok else self._buildExcept(pdu[0], ret.exp_code)
+
+    def _writeSingleReg(self, pdu, srvInfo):
+        """ Function Write Single Register (0x06)."""
+        address, value = struct.unpack_from('>HH', pdu, 1)
+        ret = self.data_hdl.write_h_regs(address, [value], srvInfo)
+        return bytes(pdu[:5]) if ret.ok else self._buildExcept(pdu[0], ret.exp_code)
+
+    def _writeMultiCoils(self, pdu, srvInfo):
+        """ Function Write Multiple Coils (0x0F)."""
+        address, count, byteCount = struct.unpack_from('>HHB', pdu, 1)
+        if not (0x0001 <= count <= 0x07B0 and byteCount >= (count + 7) // 8 
+                and len(pdu) - 6 >= byteCount):
+            return self._buildExcept(pdu[0], EXP_DATA_VALUE)
+        ret = self.data_hdl.write_coils(address, _unpackBits(pdu[6:6+byteCount], count), srvInfo)
+        return bytes(pdu[:5]) if ret.ok else self._buildExcept(pdu[0], ret.exp_code)
+
+    def _writeMultiRegs(self, pdu, srvInfo):
+        """ Function Write Multiple Registers (0x10)."""
+        address, count, byteCount = struct.unpack_from('>HHB', pdu, 1)
+        if not (0x0001 <= count <= 0x007B and byteCount == count * 2 and len(pdu) - 6 >= byteCount):
+            return self._buildExcept(pdu[0], EXP_DATA_VALUE)
+        regsList = list(struct.unpack_from('>%dH' % count, pdu, 6))
+        ret = self.data_hdl.write_h_regs(address, regsList, srvInfo)
+        return bytes(pdu[:5]) if ret.ok else self._buildExcept(pdu[0], ret.exp_code)
+
+    def _writeReadMultiRegs(self, pdu, srvInfo):
+        """ Function Write Read Multiple Registers (0x17)."""
+        funcCode = pdu[0]
+        rAddress, rCount, wAddress, wCount, byteCount = struct.unpack_from('>HHHHB', pdu, 1)
+        if not (0x0001 <= wCount <= 0x007B and byteCount == wCount * 2 
+                and len(pdu) - 10 >= byteCount and 0x0001 <= rCount <= 0x007B):
+            return self._buildExcept(funcCode, EXP_DATA_VALUE)
+        regsList = list(struct.unpack_from('>%dH' % wCount, pdu, 10))
+        ret = self.data_hdl.write_h_regs(wAddress, regsList, srvInfo)
+        if ret.ok: ret = self.data_hdl.read_h_regs(rAddress, rCount, srvInfo)
+        if not ret.ok: return self._buildExcept(funcCode, ret.exp_code)
+        return struct.pack('>BB%dH' % len(ret.data), funcCode, rCount * 2, *ret.data)
+
+    def _processPdu(self, pdu, srvInfo):
+        """ Process one request PDU and return the response PDU."""
+        func = self._funcMap.get(pdu[0])
+        if func is None: return self._buildExcept(pdu[0], EXP_ILLEGAL_FUNCTION)
+        try:
+            return func(pdu, srvInfo)
+        except struct.error:
+            return self._buildExcept(pdu[0], EXP_DATA_VALUE)
+
+    #-----------------------------------------------------------------------------
+    async def _handleClient(self, reader, writer):
+        """ Serve one client connection: read the MBAP frames in a loop, every 
+            response is written without waiting for the previous one to be sent.
+        """
+        srvInfo = ModbusServer.ServerInfo()
+        peer = writer.get_extra_info('peername') or ('', 0)
+        srvInfo.client.address, srvInfo.client.port = peer[0], peer[1]
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER.size)
+                transId, protoId, length, unitId = MBAP_HEADER.unpack(header)
+                if protoId != 0 or not 2 <= length <= 254: break
+                pdu = await reader.readexactly(length - 1)
+                respPdu = self._processPdu(pdu, srvInfo)
+                writer.write(MBAP_HEADER.pack(transId, 0, len(respPdu) + 1, unitId) + respPdu)
+                if writer.transport.get_write_buffer_size() > WRITE_BUF_HIGH:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # client closed the connection or the server is stopped.
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopEvent = asyncio.Event()
+        server = await asyncio.start_server(self._handleClient, self.host, self.port, 
+                                            reuse_address=True, backlog=1024)
+        self._running = True
+        try:
+            await self._stopEvent.wait()
+        finally:
+            self._running = False
+            server.close()
+            await server.wait_closed()
+
+    #-----------------------------------------------------------------------------
+    def start(self):
+        """ Run the server event loop (blocking) until stop() is called."""
+        asyncio.run(self._serve())
+
+    def stop(self):
+        if self._loop and self._stopEvent:
+            self._loop.call_soon_threadsafe(self._stopEvent.set)
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class modbusTcpServer(object):
     """ ModBus-TCP server, used by PLC module to handle the ModBus data read/set 
         request.
     """
-    def __init__(self, hostIp='0.0.0.0', hostPort=502, dataHandler=None) -> None:
+    def __init__(self, hostIp='0.0.0.0', hostPort=502, dataHandler=None, engine=ENGINE_THREAD) -> None:
         """Init example:
             dataMgr = modbusTcpCom.plcDataHandler(allowRipList=ALLOW_R_L, allowWipList=ALLOW_W_L)
             server = modbusTcpCom.modbusTcpServer(hostIp=hostIp, hostPort=hostPort, dataHandler=dataMgr)
@@ -416,12 +1312,18 @@ class modbusTcpServer(object):
             hostPort (int, optional): ModBus port. Defaults to 502.
             dataHandler (<plcDataHandler>, optional): The handler object to auto process 
                 register and coils change. Defaults to None.
+            engine (str, optional): server engine ENGINE_THREAD (pyModbusTCP one thread per 
+                client) or ENGINE_ASYNCIO (asyncModbusServer). Defaults to ENGINE_THREAD.
         """
         self.hostIp = hostIp
         self.hostPort = hostPort
+        self.engine = engine
         self.server = None
         if dataHandler is None:
             print("PLC logic data handler is not define, use a empty data bank")
+        if engine == ENGINE_ASYNCIO:
+            self.server = asyncModbusServer(host=hostIp, port=hostPort, data_hdl=dataHandler)
+        elif dataHandler is None:
             self.server = ModbusServer(host=hostIp, port=hostPort, data_bank=DataBank())
         else:
             self.server = ModbusServer(host=hostIp, port=hostPort, data_hdl=dataHandler)
@@ -438,7 +1340,7 @@ class modbusTcpServer(object):
 #-----------------------------------------------------------------------------
     def startServer(self):
         """ Run the server start loop."""
-        print("Start to run the ModBus TCP server: (%s, %s)" %(self.hostIp, str(self.hostPort)))
+        print("Start to run the ModBus TCP server: (%s, %s), engine: %s" %(self.hostIp, str(self.hostPort), self.engine))
         self.server.start()
 
     def stopServer(self):
@@ -0,0 +1,208 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        modbusTcpComBench.py
+#
+# Purpose:     Benchmark program used to compare the performance of the lib
+#              module <modbusTcpCom.py> server engines (pyModbusTCP thread per
+#              client engine and asyncio engine) under different client numbers.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/06/18
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+    The Modbus-TCP server runs in a sub process (so the load generator doesn't
+    share the GIL with the server), the load generator opens N client connections
+    in one asyncio event loop (all connected and warmed up before the timer starts),
+    every client keeps sending read holding registers (FC03) requests (with <depth>
+    requests in flight per connection) during the test duration. The program
+    reports the request per second and the p50/p99 latency of each engine under
+    each client number.
+
+    The ladder mode compares the list based ladderLogic with the numpy vectorLadderLogic
+    on a compactDataBank with <n> (default 10k) rungs: one rung per train/breaker
+    coil[i] = (reg[i] > threshold AND enable coil[i]) OR override coil[i].
+
+    Usage: 
+        python modbusTcpComBench.py [-c 10 100 1000] [-t 5] [-d 1]
+        python modbusTcpComBench.py -m ladder [-n 10000] [-r 200]
+"""
+
+import io
+import time
+import random
+import struct
+import contextlib
+import asyncio
+import argparse
+import multiprocessing
+
+import modbusTcpCom
+
+LADDER_TH = 100 # ladder benchmark rung compare threshold.
+
+BENCH_HOST = '127.0.0.1'
+BENCH_PORT = 5020
+CONN_TO = 60    # client connection time out (sec).
+
+#-----------------------------------------------------------------------------
+def runServer(engine, port):
+    """ Sub process function to run the Modbus server with the engine."""
+    dataMgr = modbusTcpCom.plcDataHandler()
+    server = modbusTcpCom.modbusTcpServer(hostIp=BENCH_HOST, hostPort=port,
+                                          dataHandler=dataMgr, engine=engine)
+    dataMgr.initServerInfo(server.getServerInfo())
+    dataMgr.updateHoldingRegs(0, list(range(10)))
+    server.startServer()
+
+#-----------------------------------------------------------------------------
+async def openClient(port, errorCount):
+    """ Open one client connection and send one warm up request (make sure the
+        server accepted the connection), return (reader, writer) or None if failed.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(BENCH_HOST, port), CONN_TO)
+        writer.write(struct.pack('>HHHBBHH', 0, 0, 6, 1, 3, 0, 10))
+        header = await asyncio.wait_for(reader.readexactly(7), CONN_TO)
+        await reader.readexactly(struct.unpack('>HHHB', header)[2] - 1)
+        return (reader, writer)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        errorCount[0] += 1
+        return None
+
+async def clientLoop(conn, endT, depth, latencyList, errorCount):
+    """ One client connection keeps sending FC03 requests until the end time."""
+    reader, writer = conn
+    sendT = {}
+    transId = 0
+    try:
+        # fill the pipeline.
+        for _ in range(depth):
+            transId = (transId + 1) & 0xFFFF
+            sendT[transId] = time.perf_counter()
+            writer.write(struct.pack('>HHHBBHH', transId, 0, 6, 1, 3, 0, 10))
+        while True:
+            header = await reader.readexactly(7)
+            respId, _, length, _ = struct.unpack('>HHHB', header)
+            await reader.readexactly(length - 1)
+            latencyList.append(time.perf_counter() - sendT.pop(respId))
+            if time.perf_counter() >= endT:
+                if not sendT: break
+                continue
+            transId = (transId + 1) & 0xFFFF
+            sendT[transId] = time.perf_counter()
+            writer.write(struct.pack('>HHHBBHH', transId, 0, 6, 1, 3, 0, 10))
+    except (asyncio.IncompleteReadError, ConnectionError, KeyError):
+        errorCount[0] += 1
+    finally:
+        writer.close()
+
+async def runLoad(port, clientNum, duration, depth):
+    """ Connect all the clients first, then run the timed load test."""
+    latencyList, errorCount = [], [0]
+    connList = await asyncio.gather(*[openClient(port, errorCount) for _ in range(clientNum)])
+    startT = time.perf_counter()
+    endT = startT + duration
+    await asyncio.gather(*[clientLoop(conn, endT, depth, latencyList, errorCount)
+                           for conn in connList if conn])
+    return latencyList, time.perf_counter() - startT, errorCount[0]
+
+#-----------------------------------------------------------------------------
+def benchEngine(engine, clientNum, duration, depth, port):
+    """ Start the server with the engine and run the load test, return the result dict."""
+    proc = multiprocessing.Process(target=runServer, args=(engine, port), daemon=True)
+    proc.start()
+    time.sleep(1)   # wait the server ready.
+    try:
+        latencyList, usedT, errors = asyncio.run(runLoad(port, clientNum, duration, depth))
+    finally:
+        proc.terminate()
+        proc.join(5)
+        if proc.is_alive(): proc.kill()
+    latencyList.sort()
+    count = len(latencyList)
+    percentile = lambda p: latencyList[min(count-1, int(count*p))]*1000 if count else 0.0
+    return {'engine': engine, 'clients': clientNum, 'requests': count,
+            'rps': count/usedT, 'p50': percentile(0.5), 'p99': percentile(0.99),
+            'errors': errors}
+
+#-----------------------------------------------------------------------------
+class listBenchLadder(modbusTcpCom.ladderLogic):
+    """ List based ladder: coil[i] = (reg[i] > th and enable[i]) or override[i]."""
+    def __init__(self, parent, rungNum) -> None:
+        self.rungNum = rungNum
+        super().__init__(parent, ladderName='listBench')
+
+    def initLadderInfo(self):
+        self.holdingRegsInfo = {'address': 0, 'offset': self.rungNum}
+        self.srcCoilsInfo = {'address': 0, 'offset': self.rungNum * 2}
+        self.destCoilsInfo = {'address': self.rungNum * 2, 'offset': self.rungNum}
+
+    def runLadderLogic(self, regsList, coilList=None):
+        enable, override = coilList[:self.rungNum], coilList[self.rungNum:]
+        return [(reg > LADDER_TH and en) or ov for reg, en, ov in zip(regsList, enable, override)]
+
+class vectorBenchLadder(modbusTcpCom.vectorLadderLogic):
+    """ numpy vectorized version of the listBenchLadder."""
+    def __init__(self, parent, rungNum) -> None:
+        self.rungNum = rungNum
+        super().__init__(parent, ladderName='vectorBench')
+
+    def initLadderInfo(self):
+        listBenchLadder.initLadderInfo(self)
+
+    def runVectorLogic(self, regsArr, coilArr=None):
+        return ((regsArr > LADDER_TH) & coilArr[:self.rungNum]) | coilArr[self.rungNum:]
+
+def benchLadder(rungNum, rounds):
+    """ Run the list/vector ladder <rounds> times on the same data bank state, return the 
+        result dict list.
+    """
+    results, outputs = [], []
+    for ladder in (listBenchLadder(None, rungNum), vectorBenchLadder(None, rungNum)):
+        dataMgr = modbusTcpCom.plcDataHandler(data_bank=modbusTcpCom.compactDataBank())
+        dataMgr.initServerInfo(modbusTcpCom.ModbusServer.ServerInfo())
+        dataMgr.addLadderLogic(ladder.getLadderName(), ladder)
+        random.seed(1)
+        dataMgr.updateHoldingRegs(0, [random.randrange(2 * LADDER_TH) for _ in range(rungNum)])
+        dataMgr.updateOutPutCoils(0, [random.random() < 0.5 for _ in range(rungNum)])
+        dataMgr.updateOutPutCoils(rungNum, [random.random() < 0.1 for _ in range(rungNum)])
+        with contextlib.redirect_stdout(io.StringIO()):    # mute the updateState() log.
+            startT = time.perf_counter()
+            for _ in range(rounds): dataMgr.updateState()
+            usedT = time.perf_counter() - startT
+        outputs.append(dataMgr.getCoilState(rungNum * 2, rungNum))
+        results.append({'ladder': ladder.getLadderName(), 'rungs': rungNum,
+                        'scanMs': usedT / rounds * 1000})
+    if outputs[0] != outputs[1]: print("Error: the list and vector ladder results are different.")
+    return results
+
+#-----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Modbus-TCP server engine benchmark')
+    parser.add_argument('-c', '--clients', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('-t', '--time', type=float, default=5.0, help='test duration (sec)')
+    parser.add_argument('-d', '--depth', type=int, default=1, help='pipelined requests per client')
+    parser.add_argument('-p', '--port', type=int, default=BENCH_PORT)
+    parser.add_argument('-m', '--mode', choices=['server', 'ladder'], default='server')
+    parser.add_argument('-n', '--rungs', type=int, default=10000, help='ladder mode rungs (coils) number')
+    parser.add_argument('-r', '--rounds', type=int, default=200, help='ladder mode scan rounds')
+    args = parser.parse_args()
+    if args.mode == 'ladder':
+        print("%-12s %8s %12s" %('ladder', 'rungs', 'scan(ms)'))
+        for rst in benchLadder(args.rungs, args.rounds):
+            print("%-12s %8d %12.3f" %(rst['ladder'], rst['rungs'], rst['scanMs']))
+        return
+    print("%-8s %8s %10s %10s %10s %10s %7s" %('engine', 'clients', 'requests', 'req/s', 'p50(ms)', 'p99(ms)', 'errors'))
+    for clientNum in args.clients:
+        for engine in (modbusTcpCom.ENGINE_THREAD, modbusTcpCom.ENGINE_ASYNCIO):
+            rst = benchEngine(engine, clientNum, args.time, args.depth, args.port)
+            print("%-8s %8d %10d %10.0f %10.2f %10.2f %7d" %(rst['engine'], rst['clients'],
+                rst['requests'], rst['rps'], rst['p50'], rst['p99'], rst['errors']))
+
+#-----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
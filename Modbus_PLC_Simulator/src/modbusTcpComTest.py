@@ -12,7 +12,10 @@
 #-----------------------------------------------------------------------------
 
 import time
+import socket
+import struct
 import threading
+import ladderDsl
 import modbusTcpCom
 
 class testModbusClientThread(threading.Thread):
@@ -43,12 +46,28 @@ class testModbusClientThread(threading.Thread):
         setHoldingRegsTest(): Performs a unit test for setHoldingRegs() method of the
         ModbusTcpClient object. Refer to the method description for more details.
 
+        setMultiHoldingRegsTest(): Performs a unit test for setMultiHoldingRegs() and readMany()
+        methods of the ModbusTcpClient object. Refer to the method description for more details.
+
+        setMultiCoilsTest(): Performs a unit test for setMultiCoils() and readMany() methods 
+        of the ModbusTcpClient object. Refer to the method description for more details.
+
+        writeReadHoldingRegsTest(): Performs a unit test for writeReadHoldingRegs() method of 
+        the ModbusTcpClient object. Refer to the method description for more details.
+
+        aclDeniedTest(): Performs a unit test for the server engine's ACL check of the client
+        requests. Refer to the method description for more details.
+
+        pipelinedRequestsTest(): Performs a unit test for the pipelined requests (several MBAP 
+        transaction IDs in flight). Refer to the method description for more details.
+
         autoUpdateCoilTest(): Performs an integration test for updateState() method of the
         plcDataHandler object. Refer to the method description for more details.
     """
-    def __init__(self, parent, threadID, name):
+    def __init__(self, parent, threadID, name, hostPort=502):
         super().__init__(parent)
         self.client = None
+        self.hostPort = hostPort
 
     def run(self):
         """
@@ -62,8 +81,8 @@ class testModbusClientThread(threading.Thread):
             client = testModbusClientThread(None, 1, "Client Thread")
             client.start()
         """
-        networkConfig = {'hostIP':'127.0.0.1', 'hostPort': 502}
-        client = modbusTcpCom.modbusTcpClient(networkConfig['hostIP'])
+        networkConfig = {'hostIP':'127.0.0.1', 'hostPort': self.hostPort}
+        client = modbusTcpCom.modbusTcpClient(networkConfig['hostIP'], tgtPort=networkConfig['hostPort'])
         if client:
             self.client = client
         else:
@@ -201,6 +220,156 @@ class testModbusClientThread(threading.Thread):
         print(f"[x] Test {testID}: setHoldingRegs() passed")
         time.sleep(0.5)
 
+#---------------------------------------------------------------------------
+# Define unit tests methods for the following ModbusTCPCom client bulk functions:
+#   - setMultiHoldingRegs() + readMany()
+#   - setMultiCoils() + readMany()
+#   - writeReadHoldingRegs()
+
+    def setMultiHoldingRegsTest(self, setInput, readAddrList, expectedOutput, testID):
+        """
+        Performs a unit test for setMultiHoldingRegs() and readMany() methods of the 
+        ModbusTcpClient object. It sets a list of holding registers (split to several 
+        FC16 requests if over the PDU limit), reads the scattered addresses back, compares 
+        the actual output with the expected output, and raises an assertion error if they 
+        do not match.
+        Args:
+            setInput (int, list): The first argument representing addressIdx and value list.
+            readAddrList (list): The second argument representing the addresses to read.
+            expectedOutput (dict): The third argument representing the expected output.
+            testID (int): The fourth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> setMultiHoldingRegsTest((100, list(range(200))), [100, 299], {100: 0, 299: 199}, 1)
+                [x] Test 1: setMultiHoldingRegs() + readMany() passed
+        """
+        self.client.setMultiHoldingRegs(setInput[0], setInput[1])
+        actualOutput = self.client.readMany(readAddrList, dataType='regs')
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: setMultiHoldingRegs() + readMany() failed"
+        print(f"[x] Test {testID}: setMultiHoldingRegs() + readMany() passed")
+        time.sleep(0.5)
+
+    def setMultiCoilsTest(self, setInput, readAddrList, expectedOutput, testID):
+        """
+        Performs a unit test for setMultiCoils() and readMany() methods of the ModbusTcpClient 
+        object. It sets a list of coils, reads the scattered addresses back, compares the 
+        actual output with the expected output, and raises an assertion error if they do 
+        not match.
+        Args:
+            setInput (int, list): The first argument representing addressIdx and bit value list.
+            readAddrList (list): The second argument representing the addresses to read.
+            expectedOutput (dict): The third argument representing the expected output.
+            testID (int): The fourth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> setMultiCoilsTest((100, [1, 0, 1]), [100, 101, 102], {100: True, 101: False, 102: True}, 1)
+                [x] Test 1: setMultiCoils() + readMany() passed
+        """
+        self.client.setMultiCoils(setInput[0], setInput[1])
+        actualOutput = self.client.readMany(readAddrList, dataType='coils')
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: setMultiCoils() + readMany() failed"
+        print(f"[x] Test {testID}: setMultiCoils() + readMany() passed")
+        time.sleep(0.5)
+
+    def writeReadHoldingRegsTest(self, writeInput, readInput, expectedOutput, testID):
+        """
+        Performs a unit test for writeReadHoldingRegs() (FC23) method of the ModbusTcpClient 
+        object. It writes the holding registers and reads the registers back in one request, 
+        compares the actual output with the expected output, and raises an assertion error 
+        if they do not match.
+        Args:
+            writeInput (int, list): The first argument representing write addressIdx and value list.
+            readInput (int, int): The second argument representing read addressIdx and offset.
+            expectedOutput (list): The third argument representing the expected output.
+            testID (int): The fourth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> writeReadHoldingRegsTest((400, [7, 8]), (399, 4), [0, 7, 8, 0], 1)
+                [x] Test 1: writeReadHoldingRegs() passed
+        """
+        actualOutput = self.client.writeReadHoldingRegs(writeInput[0], writeInput[1], 
+                                                        readInput[0], readInput[1])
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: writeReadHoldingRegs() failed"
+        print(f"[x] Test {testID}: writeReadHoldingRegs() passed")
+        time.sleep(0.5)
+
+#---------------------------------------------------------------------------
+# Define unit tests methods for the server engine request handling:
+#   - the ACL check of the client requests
+#   - pipelined requests
+
+    def aclDeniedTest(self, dataMgr, readInput, writeInput, testID):
+        """
+        Performs a unit test for the server engine's ACL check of the client requests. It
+        removes the client IP from the allow read/write lists, checks the read request is 
+        rejected and the write request doesn't change the holding register, then restores 
+        the allow lists.
+        Args:
+            dataMgr (testPLCDataHandler): The first argument representing the server's data handler.
+            readInput (int, int): The second argument representing addressIdx and offset.
+            writeInput (int, int): The third argument representing addressIdx and register value.
+            testID (int): The fourth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If the denied request is not rejected.
+        Examples:
+            >>> aclDeniedTest(dataMgr, (0, 4), (3, 9), 8)
+                [x] Test 8: ACL denied requests passed
+        """
+        readList = dataMgr.getAllowReadIpaddresses()
+        writeList = dataMgr.getAllowWriteIpaddresses()
+        regsBefore = self.client.getHoldingRegs(writeInput[0], 1)
+        dataMgr.setAllowReadIpaddresses(['192.168.0.10'])
+        dataMgr.setAllowWriteIpaddresses(['192.168.0.10'])
+        readOutput = self.client.getHoldingRegs(readInput[0], readInput[1])
+        self.client.setHoldingRegs(writeInput[0], writeInput[1])
+        dataMgr.setAllowReadIpaddresses(readList)
+        dataMgr.setAllowWriteIpaddresses(writeList)
+        assert readOutput is None, f"[ ] Test {testID}: ACL denied read request failed"
+        actualOutput = self.client.getHoldingRegs(writeInput[0], 1)
+        assert actualOutput == regsBefore, f"[ ] Test {testID}: ACL denied write request failed"
+        print(f"[x] Test {testID}: ACL denied requests passed")
+
+    def pipelinedRequestsTest(self, requests, expectedOutput, testID):
+        """
+        Performs a unit test for the pipelined requests. It sends all the request PDUs (with 
+        the transaction IDs 1..N) in one TCP write without waiting for the responses, then 
+        checks every response carries its request's transaction ID and the expected PDU.
+        Args:
+            requests (list): The first argument representing the request PDU bytes list.
+            expectedOutput (list): The second argument representing the expected response PDU list.
+            testID (int): The third argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> pipelinedRequestsTest([b'\x06\x01\xf4\x00\x07', b'\x05\x01\xf5\x12\x34'], 
+                                      [b'\x06\x01\xf4\x00\x07', b'\x85\x03'], 9)
+                [x] Test 9: pipelined requests passed
+        """
+        frames = b''.join(struct.pack('>HHHB', transId, 0, len(pdu) + 1, 1) + pdu 
+                          for transId, pdu in enumerate(requests, 1))
+        actualOutput = []
+        with socket.create_connection(('127.0.0.1', self.hostPort), timeout=5) as sock:
+            sock.sendall(frames)
+            sockFile = sock.makefile('rb')
+            for _ in requests:
+                transId, _, length, _ = struct.unpack('>HHHB', sockFile.read(7))
+                actualOutput.append((transId, sockFile.read(length - 1)))
+        assert actualOutput == list(enumerate(expectedOutput, 1)), f"[ ] Test {testID}: pipelined requests failed"
+        print(f"[x] Test {testID}: pipelined requests passed")
+
 #---------------------------------------------------------------------------
 # Define integration test methods for the following ModbusTCPCom plcDataHandler function:
 #   - updateState()
@@ -262,10 +431,12 @@ class testModbusServerThread(threading.Thread):
         closeServer(): Terminates the ModBus TCP client connection.
     """
 
-    def __init__(self, parent, threadID, name, testDataManager):
+    def __init__(self, parent, threadID, name, testDataManager, hostPort=502, engine=modbusTcpCom.ENGINE_THREAD):
         super().__init__(parent)
         self.server = None
         self.dataMgr = testDataManager
+        self.hostPort = hostPort
+        self.engine = engine
 
     def run(self):
         """
@@ -279,11 +450,12 @@ class testModbusServerThread(threading.Thread):
             server = testModbusServerThread(None, 2, "Server Thread")
             server.start()
         """        
-        networkConfig = {'hostIP':'localhost', 'hostPort': 502}
+        networkConfig = {'hostIP':'localhost', 'hostPort': self.hostPort}
         server = modbusTcpCom.modbusTcpServer(
             hostIp=networkConfig['hostIP'], \
             hostPort=networkConfig['hostPort'], \
-            dataHandler=self.dataMgr
+            dataHandler=self.dataMgr, \
+            engine=self.engine
         )
         if server:
             self.server = server
@@ -346,6 +518,24 @@ class testPLCDataHandler(modbusTcpCom.plcDataHandler):
 
         updateHoldingRegsTest(): Performs a unit test for updateHoldingRegs() method of the
         modbusTcpCom.plcDatahandler parent class. Refer to the method description for more details.
+
+        dirtyRangeUpdateTest(): Performs a unit test for the dirty range ladder dispatch of the 
+        updateState() method. Refer to the method description for more details.
+
+        compactDataBankTest(): Performs a unit test for the modbusTcpCom.compactDataBank list 
+        and raw bytes read functions. Refer to the method description for more details.
+
+        updateHoldingRegsRunsTest(): Performs a unit test for updateHoldingRegsRuns() method of 
+        the modbusTcpCom.plcDatahandler parent class. Refer to the method description for more details.
+
+        dslLadderLogicTest(): Performs a unit test for the modbusTcpCom.dslLadderLogic compiled 
+        ladder DSL program. Refer to the method description for more details.
+
+        chainedLadderTest(): Performs a unit test for the dirty range dispatch of the chained 
+        ladder logics in updateState(). Refer to the method description for more details.
+
+        dslTimerPresetTest(): Performs a unit test for the ladder DSL timer preset units (time
+        literal in sec, number in ms). Refer to the method description for more details.
     """    
     def __init__(self, allowReadList, allowWriteList, testLadderLogic):
         super().__init__(allowRipList=allowReadList, allowWipList=allowWriteList)
@@ -382,6 +572,12 @@ class testPLCDataHandler(modbusTcpCom.plcDataHandler):
 #   - setAllowWriteIpaddresses()
 #   - updateOutPutCoils()
 #   - updateHoldingRegs()
+#   - updateState() dirty range dispatch
+#   - compactDataBank get/set
+#   - updateHoldingRegsRuns()
+#   - dslLadderLogic
+#   - updateState() chained ladders dispatch
+#   - ladderDsl timer preset
 
     def checkAllowReadTest(self, ipaddress, expectedOutput, testID):
         """
@@ -546,7 +742,189 @@ class testPLCDataHandler(modbusTcpCom.plcDataHandler):
         actualOutput = client.getHoldingRegs(readInput[0], readInput[1])
         assert actualOutput == expectedOutput, f"[ ] Test {testID}: updateHoldingRegs() failed"
         print(f"[x] Test {testID}: updateHoldingRegs() passed")
+
+    def dirtyRangeUpdateTest(self, client, setInput, readInput, expectedOutput, testID):
+        """
+        Performs a unit test for the dirty range ladder dispatch of updateState(). It sets 
+        holding registers outside of the ladder logic's input range, retrieves the coils 
+        values, compares the actual output with the expected output (the ladder logic is not 
+        executed so the coils keep unchanged), and raises an assertion error if they do not match.
+        Args:
+            client (object): The first argument representing client stub.
+            setInput (int, list/tuple): The second argument representing addressIdx and bit value list.
+            readInput (int, int): The third argument representing coils addressIdx and offset.
+            expectedOutput (list): The fourth argument representing the expected output.
+            testID (int): The fifth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            Assumption: 
+                - Coil bits current state [1, 1, 1, 1]
+                - The ladder logic input holding registers range is [0, 4)
+            >>> dirtyRangeUpdateTest(client, (10, [1, 1]), (0, 4), [1, 1, 1, 1], 1)
+                [x] Test 1: updateState() dirty range passed
+            >>> dirtyRangeUpdateTest(client, (2, [1, 1]), (0, 4), [1, 1, 1, 1], 1)
+                AssertionError: [ ] Test 1: updateState() dirty range failed
+        """
+        self.updateHoldingRegs(setInput[0], setInput[1])
+        actualOutput = client.getCoilsBits(readInput[0], readInput[1])
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: updateState() dirty range failed"
+        print(f"[x] Test {testID}: updateState() dirty range passed")
+
+    def compactDataBankTest(self, setInput, readInput, expectedOutput, testID):
+        """
+        Performs a unit test for the compactDataBank object. It sets the coils and holding 
+        registers of a new compactDataBank, reads them back with the list and the raw bytes 
+        (Modbus PDU data field) functions, compares the actual output with the expected 
+        output, and raises an assertion error if they do not match.
+        Args:
+            setInput (int, list, list): The first argument representing addressIdx, coils 
+                bit list and holding registers value list.
+            readInput (int, int): The second argument representing addressIdx and offset.
+            expectedOutput (list, bytes, list, bytes): The third argument representing the 
+                expected coils list, coils bytes, registers list and registers bytes.
+            testID (int): The fourth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> compactDataBankTest((3, [1, 0, 1], [1, 258]), (2, 3), 
+                    ([False, True, False], b'\x02', [0, 1, 258], b'\x00\x00\x00\x01\x01\x02'), 1)
+                [x] Test 1: compactDataBank passed
+        """
+        dataBank = modbusTcpCom.compactDataBank()
+        dataBank.set_coils(setInput[0], setInput[1])
+        dataBank.set_holding_registers(setInput[0], setInput[2])
+        actualOutput = (dataBank.get_coils(readInput[0], readInput[1]),
+                        dataBank.get_coils_bytes(readInput[0], readInput[1]),
+                        dataBank.get_holding_registers(readInput[0], readInput[1]),
+                        dataBank.get_holding_registers_bytes(readInput[0], readInput[1]))
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: compactDataBank failed"
+        print(f"[x] Test {testID}: compactDataBank passed")
+
+    def updateHoldingRegsRunsTest(self, client, runList, readInput, expectedOutput, testID):
+        """
+        Performs a unit test for updateHoldingRegsRuns() method of the plcDataHandler object. 
+        It writes several changed holding registers runs, retrieves the coils values (updated 
+        by the ladder logic once after all the runs are written), compares the actual output 
+        with the expected output, and raises an assertion error if they do not match.
+        Args:
+            client (object): The first argument representing client stub.
+            runList (list): The second argument representing the [(addressIdx, value list), ...] runs.
+            readInput (int, int): The third argument representing coils addressIdx and offset.
+            expectedOutput (list): The fourth argument representing the expected output.
+            testID (int): The fifth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            Assumption: 
+                - Holding register current state [0, 0, 1, 1]
+                - Ladder Logic is to flip all the bits
+            >>> updateHoldingRegsRunsTest(client, [(0, [1]), (3, [1])], (0, 4), [0, 1, 0, 0], 1)
+                [x] Test 1: updateHoldingRegsRuns() passed
+        """
+        self.updateHoldingRegsRuns(runList)
+        actualOutput = client.getCoilsBits(readInput[0], readInput[1])
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: updateHoldingRegsRuns() failed"
+        print(f"[x] Test {testID}: updateHoldingRegsRuns() passed")
+
+    def dslLadderLogicTest(self, program, setInput, readInput, expectedOutput, testID):
+        """
+        Performs a unit test for the dslLadderLogic object. It compiles the ladder DSL program,
+        adds the ladder in a new plcDataHandler, sets the holding registers and source coils
+        then executes the ladder logic, reads the destination coils, compares the actual output 
+        with the expected output, and raises an assertion error if they do not match.
+        Args:
+            program (str): The first argument representing the ladder DSL program text.
+            setInput (list, list): The second argument representing the holding registers 
+                value list and source coils bit list (both start from address 0).
+            readInput (int, int): The third argument representing dest coils addressIdx and offset.
+            expectedOutput (list): The fourth argument representing the expected output.
+            testID (int): The fifth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> dslLadderLogicTest("OUT[0] := REG[0] > 10 AND IN[0]", ([12], [1]), (8, 1), [True], 1)
+                [x] Test 1: dslLadderLogic passed
+        """
+        dataMgr = modbusTcpCom.plcDataHandler(data_bank=modbusTcpCom.compactDataBank())
+        dataMgr.initServerInfo(modbusTcpCom.ModbusServer.ServerInfo())
+        ladder = modbusTcpCom.dslLadderLogic(None, program, ladderName='dslTest', destCoilsAddr=readInput[0])
+        dataMgr.addLadderLogic(ladder.getLadderName(), ladder)
+        dataMgr.updateOutPutCoils(0, setInput[1])
+        dataMgr.updateHoldingRegs(0, setInput[0])
+        dataMgr.updateState()
+        actualOutput = dataMgr.getCoilState(readInput[0], readInput[1])
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: dslLadderLogic failed"
+        print(f"[x] Test {testID}: dslLadderLogic passed")
+
+    def chainedLadderTest(self, programs, setInput, readInput, expectedOutput, testID):
+        """
+        Performs a unit test for the dirty range dispatch of the chained ladder logics. It adds 
+        the dslLadderLogic in a new auto update plcDataHandler, the downstream ladder's source 
+        coils are the upstream ladder's destination coils, sets the holding registers (only the 
+        upstream ladder's input range is changed), reads the coils, compares the actual output 
+        with the expected output, and raises an assertion error if they do not match.
+        Args:
+            programs (list): The first argument representing the (program, srcCoilsAddr, 
+                destCoilsAddr) list in the add in sequence, the registers start from address 0.
+            setInput (int, list): The second argument representing addressIdx and registers value list.
+            readInput (list): The third argument representing the (coils addressIdx, offset) list.
+            expectedOutput (list): The fourth argument representing the expected coils lists.
+            testID (int): The fifth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> chainedLadderTest([("OUT[0] := REG[0] > 0", 0, 10), ("OUT[0] := IN[0]", 10, 20)], 
+                    (0, [1]), [(10, 1), (20, 1)], [[True], [True]], 1)
+                [x] Test 1: updateState() chained ladders passed
+        """
+        dataMgr = modbusTcpCom.plcDataHandler(data_bank=modbusTcpCom.compactDataBank())
+        dataMgr.initServerInfo(modbusTcpCom.ModbusServer.ServerInfo())
+        for idx, (program, srcCoilsAddr, destCoilsAddr) in enumerate(programs):
+            ladder = modbusTcpCom.dslLadderLogic(None, program, ladderName='chain%d' %idx, 
+                                                 srcCoilsAddr=srcCoilsAddr, destCoilsAddr=destCoilsAddr)
+            dataMgr.addLadderLogic(ladder.getLadderName(), ladder)
+        dataMgr.setAutoUpdate(True)
+        dataMgr.updateHoldingRegs(setInput[0], setInput[1])
+        actualOutput = [dataMgr.getCoilState(address, offset) for address, offset in readInput]
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: updateState() chained ladders failed"
+        print(f"[x] Test {testID}: updateState() chained ladders passed")
     
+    def dslTimerPresetTest(self, program, scanList, expectedOutput, testID):
+        """
+        Performs a unit test for the ladder DSL timer preset. It compiles the program, runs 
+        the scans with the contact inputs at the given time, compares the OUT list of every
+        scan with the expected output, and raises an assertion error if they do not match.
+        Args:
+            program (str): The first argument representing the ladder DSL program text.
+            scanList (list): The second argument representing the (contact inputs list, time 
+                in sec) of every scan.
+            expectedOutput (list): The third argument representing the expected OUT lists.
+            testID (int): The fourth argument representing the ID tagged to this test run.
+        Returns:
+            None
+        Raises:
+            AssertionError: If actualOutput != expectedOutput
+        Examples:
+            >>> dslTimerPresetTest("OUT[0] := TON(T1, IN[0], 500)", [([1], 0), ([1], 0.6)],
+                                   [[False], [True]], 1)
+                [x] Test 1: ladderDsl timer preset passed
+        """
+        ladderProgram = ladderDsl.compileLadder(program, name='timerTest')
+        actualOutput = [list(ladderProgram.scan([], ins, now=now)) for ins, now in scanList]
+        assert actualOutput == expectedOutput, f"[ ] Test {testID}: ladderDsl timer preset failed"
+        print(f"[x] Test {testID}: ladderDsl timer preset passed")
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 
@@ -607,14 +985,14 @@ class stubLadderLogic(modbusTcpCom.ladderLogic):
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 
-def createTestObjects():
+def createTestObjects(engine=modbusTcpCom.ENGINE_THREAD, hostPort=502):
     print("======================================= Creating Test Objects ========================================")
     ALLOW_R_L = ['127.0.0.1', '192.168.0.10']
     ALLOW_W_L = ['127.0.0.1']
     ladderLogic = stubLadderLogic(None)
     dataMgr = testPLCDataHandler(ALLOW_R_L, ALLOW_W_L, ladderLogic)
-    server = testModbusServerThread(None, 1, "Server Thread", dataMgr)
-    client = testModbusClientThread(None, 2, "Client Thread")
+    server = testModbusServerThread(None, 1, "Server Thread", dataMgr, hostPort=hostPort, engine=engine)
+    client = testModbusClientThread(None, 2, "Client Thread", hostPort=hostPort)
     # Initialise and start both client and server
     server.start()
     client.start()
@@ -626,11 +1004,21 @@ def createTestObjects():
 
 def runTestCases(client, server, dataMgr):    
     print("========================== Running Test Cases for ModBus TCP Communications ==========================")
-    print("(Modbus Client Unit Test Cases)")
+    print("(Modbus Client Unit Test Cases, server engine: %s)" % server.engine)
     client.getCoilBitsTest((0, 4), [1, 1, 0, 0], 1)
     client.getHoldingRegsTest((0, 4), [0, 0, 1, 1], 2)
     client.setCoilBitsTest((1, 1), (0, 4), [1, 1, 0, 0], 3)
     client.setHoldingRegsTest((1, 1), (0, 4), [0, 1, 1, 1], 4)
+    client.setMultiHoldingRegsTest((100, list(range(200))), [100, 150, 299], {100: 0, 150: 50, 299: 199}, 5)
+    client.setMultiCoilsTest((100, [1, 0, 1]), [100, 101, 102, 2200], {100: True, 101: False, 102: True, 2200: False}, 6)
+    client.writeReadHoldingRegsTest((400, [7, 8]), (399, 4), [0, 7, 8, 0], 7)
+    client.aclDeniedTest(dataMgr, (0, 4), (500, 9), 8)
+    if server.engine == modbusTcpCom.ENGINE_ASYNCIO:
+        # write coil 500 ON, write coil 501 with an invalid value, write reg 500, read them back.
+        client.pipelinedRequestsTest([b'\x05\x01\xf4\xff\x00', b'\x05\x01\xf5\x12\x34', b'\x06\x01\xf4\x00\x07',
+                                      b'\x01\x01\xf4\x00\x02', b'\x03\x01\xf4\x00\x01'],
+                                     [b'\x05\x01\xf4\xff\x00', b'\x85\x03', b'\x06\x01\xf4\x00\x07',
+                                      b'\x01\x01\x01', b'\x03\x02\x00\x07'], 9)
     print("\n(PLC Data Handler Unit Test Cases)")
     dataMgr.checkAllowReadTest('127.0.0.1', True, 1)
     dataMgr.checkAllowReadTest('192.168.25.1', False, 2)
@@ -640,13 +1028,35 @@ def runTestCases(client, server, dataMgr):
     dataMgr.setAllowReadIPTest(('127.0.0.1', '192.168.0.10'), "192.168.25.1", False, 6)
     dataMgr.setAllowWriteIPTest(('127.0.0.1', '192.168.0.10'), "192.168.0.10", True, 7)
     dataMgr.setAllowWriteIPTest(('127.0.0.1', '192.168.0.10'), "192.168.25.1", False, 8)
-    dataMgr.updateOutputCoilsTest(client.getClient(), (0, [0, 0, 0, 0]), (0, 4), [0, 0, 0, 0], 9)
-    dataMgr.updateHoldingRegsTest(client.getClient(), (0, [0, 0, 1, 1]), (0, 4), [0, 0, 1, 1], 10)
+    dataMgr.setAllowReadIPTest(('127.0.0.1', '192.168.25.0/24'), "192.168.25.1", True, 9)
+    dataMgr.setAllowReadIPTest(('127.0.0.1', 'fd00::/64'), "fd00::12", True, 10)
+    dataMgr.setAllowReadIPTest(('127.0.0.1', '192.168.0.10'), "192.168.25.1", False, 11)
+    dataMgr.updateOutputCoilsTest(client.getClient(), (0, [0, 0, 0, 0]), (0, 4), [0, 0, 0, 0], 12)
+    dataMgr.updateHoldingRegsTest(client.getClient(), (0, [0, 0, 1, 1]), (0, 4), [0, 0, 1, 1], 13)
+    dataMgr.updateOutputCoilsTest(client.getClient(), (0, [1, 1, 1, 1]), (0, 4), [1, 1, 1, 1], 14)
+    dataMgr.dirtyRangeUpdateTest(client.getClient(), (10, [1, 1]), (0, 4), [1, 1, 1, 1], 15)
+    dataMgr.compactDataBankTest((3, [1, 0, 1], [1, 258]), (2, 3), 
+                                ([False, True, False], b'\x02', [0, 1, 258], b'\x00\x00\x00\x01\x01\x02'), 16)
+    dataMgr.updateHoldingRegsRunsTest(client.getClient(), [(0, [1]), (3, [1])], (0, 4), [0, 1, 0, 0], 17)
+    dataMgr.dslLadderLogicTest("CONST TH = 10; M[0] := IN[0] AND TRUE\nOUT[0] := REG[0] > TH AND M[0]\n"
+                               "IF FALSE THEN OUT[1] := TRUE\nOUT[1] := NOT IN[1] OR REG[1] = 2 * TH",
+                               ([12, 20], [1, 1]), (8, 2), [True, True], 18)
+    dataMgr.chainedLadderTest([("OUT[0] := REG[0] > 0", 0, 10), ("OUT[0] := IN[0]", 10, 20)],
+                              (0, [1]), [(10, 1), (20, 1)], [[True], [True]], 19)
+    dataMgr.chainedLadderTest([("OUT[0] := IN[0]", 10, 20), ("OUT[0] := REG[0] > 0", 0, 10)],
+                              (0, [1]), [(10, 1), (20, 1)], [[True], [True]], 20)
+    # the number and constant expression presets are in ms, the time literals in sec.
+    dataMgr.dslTimerPresetTest("CONST D = 1000/2; OUT[0] := TON(T1, IN[0], D)\nOUT[1] := TON(T2, IN[0], 1.5)\n"
+                               "OUT[2] := TON(T3, IN[0], T#0.5s)\nOUT[3] := TON(T4, IN[0], T#250ms * 2)",
+                               [([1], 0), ([1], 0.4), ([1], 0.6)], 
+                               [[False] * 4, [False, True, False, False], [True] * 4], 21)
     print("\n(Integration Test Cases)")   
     client.autoUpdateCoilTest((0, 1), (0, 4), [0, 1, 0, 0], 1) 
     client.closeClient()
     server.closeServer()
 
 if __name__ == '__main__':
-    client, server, dataMgr = createTestObjects()
-    runTestCases(client, server, dataMgr)
\ No newline at end of file
+    # run the test cases with both of the server engines.
+    for engine, hostPort in ((modbusTcpCom.ENGINE_THREAD, 502), (modbusTcpCom.ENGINE_ASYNCIO, 503)):
+        client, server, dataMgr = createTestObjects(engine=engine, hostPort=hostPort)
+        runTestCases(client, server, dataMgr)
\ No newline at end of file
@@ -0,0 +1,246 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        plcTagMap.py
+#
+# Purpose:     This lib module will provide a declarative tag map compiler for the
+#              PLC simulator to map the Real-world emulator's data (sensors/signals
+#              value list with a tag name) to the PLC holding registers or coils.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/06/20
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    The PLC register/coil layout is declared as a tag list, each tag has 5 parameters:
+        name (str): the Real-world emulator's data key such as 'weline'.
+        address (int): PLC holding register or coil start address.
+        length (int): number of values of the tag.
+        type (str): 'uint16', 'int16', 'uint32', 'int32', 'float32' for the holding
+            registers ('uint32/int32/float32' take 2 registers per value) or 'bool' for
+            the coils.
+        scale (float): raw register value = tag value * scale. Defaults to 1.
+
+    The tag map can be loaded from a dict, a list or a json file:
+        {'weline': {'address': 0, 'length': 4, 'type': 'uint16'}, ...}
+        [{'name': 'weline', 'address': 0, 'length': 4, 'type': 'uint16'}, ...]
+
+    The plcTagMap will validate the layout (address overlaps, type) when it is created
+    and compile it once to the precomputed slice objects of each tag and one struct
+    packer for the whole register block (the gaps are zero padded), so the per-cycle
+    mapping becomes:
+        - registers: one struct pack of all the tags' values into the register block.
+        - coils: the precomputed slice of each tag compared with the tag's state.
+
+    Usage:
+        tagMap = plcTagMap({'weline': {'address': 0, 'length': 4, 'type': 'uint16'}})
+        if tagMap.isValid(): regList = tagMap.packRegs({'weline': [1, 2, 3, 4]})
+"""
+
+import os
+import json
+import struct
+from collections import OrderedDict
+
+TAG_REGS = 'regs'   # holding registers tag map.
+TAG_COILS = 'coils' # coils tag map.
+
+# tag type : (struct format char, registers number per value)
+REG_TYPES = {
+    'uint16': ('H', 1),
+    'int16': ('h', 1),
+    'uint32': ('I', 2),
+    'int32': ('i', 2),
+    'float32': ('f', 2),
+}
+COIL_TYPE = 'bool'
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class plcTagMap(object):
+    """ Compile a tag map config to the precomputed slices and struct packers."""
+
+    def __init__(self, tagConfig, dataType=TAG_REGS) -> None:
+        """ Init example: tagMap = plcTagMap('regsTags.json', dataType=TAG_REGS)
+            Args:
+                tagConfig (dict/list/str): tag map dict, tag list or json file path.
+                dataType (str, optional): TAG_REGS or TAG_COILS. Defaults to TAG_REGS.
+        """
+        self.dataType = dataType
+        self.tags = OrderedDict()   # tag name -> tag info dict, sorted by address.
+        self.startAddr = 0
+        self.size = 0
+        self._slices = []           # [(tag name, slice obj in the block), ...]
+        self._convertFuns = []      # [(tag name, value convert function or None), ...]
+        self._blockPacker = None    # struct packer of the whole register block.
+        self._blockRegs = None      # struct packer of the block's uint16 registers.
+        self.valid = self._compile(self._loadConfig(tagConfig))
+
+    #-----------------------------------------------------------------------------
+    def _loadConfig(self, tagConfig):
+        """ Load the tag config from the dict, list or json file to a tag list."""
+        if isinstance(tagConfig, str):
+            if not os.path.exists(tagConfig):
+                print("Error: _loadConfig() tag map file not exist: %s" % tagConfig)
+                return None
+            try:
+                with open(tagConfig, 'r') as fh:
+                    tagConfig = json.load(fh)
+            except Exception as err:
+                print("Error: _loadConfig() can not load the tag map file: %s" % str(err))
+                return None
+        if isinstance(tagConfig, dict):
+            tagList = []
+            for name, tagInfo in tagConfig.items():
+                tag = dict(tagInfo)
+                tag['name'] = name
+                tagList.append(tag)
+            return tagList
+        if isinstance(tagConfig, (list, tuple)): return list(tagConfig)
+        print("Error: _loadConfig() tag config needs to be a dict, list or file path.")
+        return None
+
+    #-----------------------------------------------------------------------------
+    def _compile(self, tagList):
+        """ Validate the tag list and compile the slices and packers, return True if
+            the tag map is valid.
+        """
+        if not tagList: return False
+        defType = 'uint16' if self.dataType == TAG_REGS else COIL_TYPE
+        tags = []
+        for tag in tagList:
+            try:
+                name = str(tag['name'])
+                address, length = int(tag['address']), int(tag.get('length', 1))
+                tagType = tag.get('type', defType)
+                scale = float(tag.get('scale', 1))
+            except Exception as err:
+                print("Error: _compile() tag config invalid %s: %s" % (str(tag), str(err)))
+                return False
+            if name in self.tags or address < 0 or length < 1:
+                print("Error: _compile() tag %s duplicated or address/length invalid." % name)
+                return False
+            if self.dataType == TAG_REGS and tagType not in REG_TYPES \
+                or self.dataType == TAG_COILS and tagType != COIL_TYPE:
+                print("Error: _compile() tag %s type %s invalid for %s." % (name, tagType, self.dataType))
+                return False
+            regNum = length * REG_TYPES[tagType][1] if self.dataType == TAG_REGS else length
+            tagInfo = {'name': name, 'address': address, 'length': length, 'type': tagType,
+                       'scale': scale, 'size': regNum}
+            self.tags[name] = tagInfo
+            tags.append(tagInfo)
+        tags.sort(key=lambda t: t['address'])
+        # check the address overlap.
+        for prev, tag in zip(tags, tags[1:]):
+            if tag['address'] < prev['address'] + prev['size']:
+                print("Error: _compile() tag %s [%d, %d) overlaps with tag %s [%d, %d)." % (
+                    tag['name'], tag['address'], tag['address'] + tag['size'],
+                    prev['name'], prev['address'], prev['address'] + prev['size']))
+                return False
+        self.tags = OrderedDict((tag['name'], tag) for tag in tags)
+        self.startAddr = tags[0]['address']
+        self.size = tags[-1]['address'] + tags[-1]['size'] - self.startAddr
+        # compile the slices and packers.
+        fmt, pos = ['>'], self.startAddr
+        for tag in tags:
+            offset = tag['address'] - self.startAddr
+            self._slices.append((tag['name'], slice(offset, offset + tag['size'])))
+            if self.dataType == TAG_COILS: continue
+            if tag['address'] > pos: fmt.append('%dx' % ((tag['address'] - pos) * 2))
+            fmt.append('%d%s' % (tag['length'], REG_TYPES[tag['type']][0]))
+            pos = tag['address'] + tag['size']
+            self._convertFuns.append((tag['name'], self._getConvertFun(tag)))
+        if self.dataType == TAG_REGS:
+            self._blockPacker = struct.Struct(''.join(fmt))
+            self._blockRegs = struct.Struct('>%dH' % self.size)
+        return True
+
+    def _getConvertFun(self, tag):
+        """ Return the tag value to raw value convert function, None if not needed."""
+        scale, isFloat = tag['scale'], tag['type'] == 'float32'
+        if scale == 1: return None
+        if isFloat: return lambda vals: [val * scale for val in vals]
+        return lambda vals: [int(round(val * scale)) for val in vals]
+
+    #-----------------------------------------------------------------------------
+    def _packValues(self, stateDict, strict):
+        args = []
+        for name, convertFun in self._convertFuns:
+            tag = self.tags[name]
+            vals = stateDict[name] if name in stateDict else [0] * tag['length']
+            if convertFun: vals = convertFun(vals)
+            elif not strict and tag['type'] != 'float32':
+                mask = (1 << (16 * REG_TYPES[tag['type']][1])) - 1
+                vals = [int(val) & mask for val in vals]
+                if tag['type'] in ('int16', 'int32'):
+                    vals = [val - mask - 1 if val > mask >> 1 else val for val in vals]
+            args.extend(vals)
+        return self._blockPacker.pack(*args)
+
+    def packRegs(self, stateDict):
+        """ Pack the tags' value dict {name: [values]} to the holding registers list
+            of the block [startAddr, startAddr + size). Return None if failed.
+        """
+        if not self.valid or self.dataType != TAG_REGS: return None
+        try:
+            data = self._packValues(stateDict, True)
+        except struct.error:
+            # value is not the tag type (such as float for uint16), convert per value.
+            try:
+                data = self._packValues(stateDict, False)
+            except Exception as err:
+                print("Error: packRegs() can not pack the tags value: %s" % str(err))
+                return None
+        except Exception as err:
+            print("Error: packRegs() can not pack the tags value: %s" % str(err))
+            return None
+        return list(self._blockRegs.unpack(data))
+
+    def unpackRegs(self, regList):
+        """ Unpack the holding registers list of the block to the tags' value dict."""
+        if not self.valid or self.dataType != TAG_REGS: return None
+        vals = self._blockPacker.unpack(self._blockRegs.pack(*regList))
+        result, pos = OrderedDict(), 0
+        for name, _ in self._convertFuns:
+            tag = self.tags[name]
+            tagVals = list(vals[pos:pos + tag['length']])
+            if tag['scale'] != 1: tagVals = [val / tag['scale'] for val in tagVals]
+            result[name] = tagVals
+            pos += tag['length']
+        return result
+
+    #-----------------------------------------------------------------------------
+    def unpackCoils(self, coilList):
+        """ Slice the coils list of the block to the tags' value dict."""
+        if not self.valid: return None
+        return OrderedDict((name, coilList[tagSlice]) for name, tagSlice in self._slices)
+
+    def getChangedCoils(self, coilList, stateDict):
+        """ Compare the coils block list with the tags' value dict, return the changed 
+            tags' value dict (empty if no change).
+        """
+        if not self.valid or coilList is None: return {}
+        changed = OrderedDict()
+        for name, tagSlice in self._slices:
+            tagVals = coilList[tagSlice]
+            if tagVals != stateDict.get(name): changed[name] = tagVals
+        return changed
+
+    #-----------------------------------------------------------------------------
+    def initState(self):
+        """ Return the initial tags' value dict {name: [0]*length}."""
+        default = False if self.dataType == TAG_COILS else 0
+        return OrderedDict((name, [default] * tag['length']) for name, tag in self.tags.items())
+
+    def getAddrRange(self):
+        """ Return the (startAddr, size) of the compiled block."""
+        return (self.startAddr, self.size)
+
+    def getTagInfo(self, name):
+        return self.tags.get(name)
+
+    def isValid(self):
+        return self.valid
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        plcTagMapTest.py
+#
+# Purpose:     testcase program used to test the lib module <plcTagMap.py>: the tag
+#              map validation, the register block pack/unpack and the coils change
+#              compare.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/06/20
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+
+import plcTagMap
+
+#-----------------------------------------------------------------------------
+def invalidTagMapTest(tagConfig, dataType, testID):
+    """ Check the tag map config is rejected (isValid() is False).
+        Example:
+            >>> invalidTagMapTest({'a': {'address': 0, 'type': 'bool'}}, plcTagMap.TAG_REGS, 1)
+                [x] Test 1: invalid tag map rejected passed
+    """
+    tagMap = plcTagMap.plcTagMap(tagConfig, dataType=dataType)
+    assert not tagMap.isValid(), f"[ ] Test {testID}: invalid tag map is accepted"
+    print(f"[x] Test {testID}: invalid tag map rejected passed")
+
+def packRegsTest(tagConfig, stateDict, expectedOutput, testID):
+    """ Pack the tags' value dict to the register block and compare with the expected
+        (startAddr, size) and registers list.
+        Example:
+            >>> packRegsTest({'a': {'address': 0, 'length': 1, 'type': 'int16'}},
+                             {'a': [-1]}, ((0, 1), [0xFFFF]), 2)
+                [x] Test 2: packRegs() passed
+    """
+    tagMap = plcTagMap.plcTagMap(tagConfig)
+    actualOutput = (tagMap.getAddrRange(), tagMap.packRegs(stateDict))
+    assert actualOutput == expectedOutput, f"[ ] Test {testID}: packRegs() failed {actualOutput}"
+    print(f"[x] Test {testID}: packRegs() passed")
+
+def regsRoundTripTest(tagConfig, stateDict, testID):
+    """ Pack the tags' value dict to the registers and unpack it back, compare the result
+        with the input values (the float values are compared with the float32 precision).
+        Example:
+            >>> regsRoundTripTest({'a': {'address': 0, 'length': 1, 'scale': 10}}, {'a': [1.2]}, 3)
+                [x] Test 3: packRegs()/unpackRegs() round trip passed
+    """
+    tagMap = plcTagMap.plcTagMap(tagConfig)
+    actualOutput = tagMap.unpackRegs(tagMap.packRegs(stateDict))
+    for name, vals in stateDict.items():
+        assert all(abs(a - b) < 1e-6 for a, b in zip(actualOutput[name], vals)), \
+            f"[ ] Test {testID}: packRegs()/unpackRegs() round trip failed {actualOutput}"
+    print(f"[x] Test {testID}: packRegs()/unpackRegs() round trip passed")
+
+def changedCoilsTest(tagConfig, scanList, expectedOutput, testID):
+    """ Call getChangedCoils() with the (coils block list, tags' state dict) of every scan
+        and compare the returned changed tags' value dicts with the expected output.
+        Example:
+            >>> changedCoilsTest({'a': {'address': 0, 'length': 2}},
+                                 [([True, False], {'a': [False, False]})], [{'a': [True, False]}], 4)
+                [x] Test 4: getChangedCoils() passed
+    """
+    tagMap = plcTagMap.plcTagMap(tagConfig, dataType=plcTagMap.TAG_COILS)
+    actualOutput = [dict(tagMap.getChangedCoils(coilList, stateDict)) for coilList, stateDict in scanList]
+    assert actualOutput == expectedOutput, f"[ ] Test {testID}: getChangedCoils() failed {actualOutput}"
+    print(f"[x] Test {testID}: getChangedCoils() passed")
+
+#-----------------------------------------------------------------------------
+def runTestCases():
+    print("(Unit Test Cases)")
+    # 1-3. address overlap (the uint32 tag takes 2 registers per value) and the tag type.
+    invalidTagMapTest({'a': {'address': 0, 'length': 2, 'type': 'uint32'},
+                       'b': {'address': 3, 'length': 1}}, plcTagMap.TAG_REGS, 1)
+    invalidTagMapTest({'a': {'address': 0, 'length': 2, 'type': 'bool'}}, plcTagMap.TAG_REGS, 2)
+    invalidTagMapTest({'a': {'address': 0, 'length': 2, 'type': 'uint16'}}, plcTagMap.TAG_COILS, 3)
+    # 4. int16/int32 sign wrap of the out of range and float values.
+    packRegsTest({'a': {'address': 0, 'length': 3, 'type': 'int16'},
+                  'b': {'address': 3, 'length': 2, 'type': 'int32'}},
+                 {'a': [-1, 40000, 12.7], 'b': [-2, 2**31 + 5]},
+                 ((0, 7), [0xFFFF, 40000, 12, 0xFFFF, 0xFFFE, 0x8000, 0x0005]), 4)
+    # 5. float32 takes 2 registers per value, the address gap is zero padded.
+    packRegsTest({'f': {'address': 10, 'length': 2, 'type': 'float32'},
+                  'u': {'address': 15, 'length': 1, 'type': 'uint16'}},
+                 {'f': [1.5, -2.0], 'u': [7]},
+                 ((10, 6), [0x3FC0, 0x0000, 0xC000, 0x0000, 0, 7]), 5)
+    # 6. scale round trip through packRegs() and unpackRegs().
+    regsRoundTripTest({'a': {'address': 0, 'length': 2, 'type': 'uint16', 'scale': 10},
+                       'b': {'address': 2, 'length': 1, 'type': 'int32', 'scale': 100},
+                       'f': {'address': 4, 'length': 1, 'type': 'float32', 'scale': 2}},
+                      {'a': [12.3, 0.5], 'b': [-3.25], 'f': [1.25]}, 6)
+    # 7. the same coils block is compared with the passed in state dict every scan.
+    coilCfg = {'a': {'address': 0, 'length': 2}, 'b': {'address': 4, 'length': 1}}
+    changedCoilsTest(coilCfg, [([True, False, False, False, True], {'a': [False, False], 'b': [False]}),
+                               ([True, False, False, False, True], {'a': [True, False], 'b': [True]}),
+                               ([True, False, False, False, True], {'a': [False, False], 'b': [True]})],
+                     [{'a': [True, False], 'b': [True]}, {}, {'a': [True, False]}], 7)
+
+if __name__ == '__main__':
+    runTestCases()
@@ -0,0 +1,426 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        rwEmulator.py
+#
+# Purpose:     This lib module will provide a local Real-world emulator stand-in
+#              server which speaks the 'GET/POST;type;json' protocol of the PLC/RTU
+#              simulators' RealWorldConnector and models the configurable signals
+#              with simple dynamics, used as the reproducible target of the load and
+#              regression tests.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/06
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    The emulator holds N signals, every signal is a list of <num> values (one holding
+    registers group of a PLC/RTU) updated every tick by its model:
+        - 'const': the init value.
+        - 'ramp': rises <rate> per sec from <min> to <max> then wraps, the values of
+            one signal are phase shifted.
+        - 'noise': the init value + gaussian noise.
+        - 'lag': first-order lag (time constant <tau> sec) to the target: <max> if
+            the same index value of the <source> coils group posted by the PLC is true
+            (or the posted number), else <min>. Without source the target is <init>.
+    Every model can add the gaussian <noise>, the values are clipped to [min, max] and
+    rounded to int (valType 'int', the default), kept as float ('float') or set to
+    the value >= (min + max)/2 ('bool'). The random generator is seeded (<seed>) so
+    the signal sequence is reproducible.
+
+    Config example (dict or json file):
+        {"tickInt": 0.05, "seed": 1,
+         "signals": {"weline": {"num": 4, "model": "ramp", "min": 0, "max": 100, "rate": 20},
+                     "temp": {"num": 2, "model": "lag", "source": "heater", "min": 20,
+                              "max": 80, "tau": 2.0, "noise": 0.5}}}
+    A requested key which is not in the config is added as a 'ramp' signal (autoAdd).
+
+    Protocol (the request type of GET is not checked, all the types read the signals
+    state, the POST request sets the coils groups):
+        - GET;login;{"plcID": id, ...}: reply {"state": "ready"} and accepts the login
+            offers: "batch", "exchange", "subscribe", "reliable" (big messages use the 
+            udpCom reliable chunk transfer) and the "codec" binary codec.
+        - GET;<type>;{key: null, ...}: reply the keys' values, with "_sinceVersion": n
+            only the keys changed after the state version n and the "_version".
+        - POST;<type>;{key: [values], ...}: set the coils groups, reply {}.
+        - POST;exchange;{"post": [type, {coils}], "fetch": [type, {keys}]}.
+        - GET;batch;[[plcID, type, {keys}], ...]: reply the results in sequence.
+        - PUSH;<type>;{"_version": n, key: values, ...}: sent to the subscribers' port
+            every tick which changed the state.
+
+    Usage:
+        emulator = rwEmulator(config=None, port=3001)   # None: buildConfig() signals.
+        emulator.start()    # start the tick thread and the UDP server thread.
+        ...
+        emulator.stop()
+    Run as a program: python rwEmulator.py [-p 3001] [-c config.json] [-n 10]
+"""
+
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import threading
+
+import udpCom
+import rwBinCodec
+
+DEF_PORT = 3001
+DEF_TICK_INT = 0.05     # signals update interval (sec).
+DEF_SIGNAL_NUM = 10     # signals number of the default config.
+DEF_SIGNAL_LEN = 4      # values number of one signal.
+MODELS = ('const', 'ramp', 'noise', 'lag')
+VAL_TYPES = ('int', 'float', 'bool')
+VERSION_KEY = '_version'
+SINCE_KEY = '_sinceVersion'
+
+#-----------------------------------------------------------------------------
+def buildConfig(signalNum=DEF_SIGNAL_NUM, num=DEF_SIGNAL_LEN, tickInt=DEF_TICK_INT, seed=1):
+    """ Build a config with <signalNum> signals named 'signal<idx>' cycling through
+        the 'ramp', 'noise', 'lag' (source 'coil<idx>') and 'const' models.
+    """
+    signals = {}
+    for idx in range(signalNum):
+        model = ('ramp', 'noise', 'lag', 'const')[idx % 4]
+        cfg = {'num': num, 'model': model, 'min': 0, 'max': 100}
+        if model == 'ramp': cfg['rate'] = 10 + idx % 10
+        if model == 'noise': cfg.update({'init': 50, 'noise': 5})
+        if model == 'lag': cfg.update({'source': 'coil%d' % idx, 'tau': 1.0})
+        if model == 'const': cfg['init'] = idx
+        signals['signal%d' % idx] = cfg
+    return {'tickInt': tickInt, 'seed': seed, 'signals': signals}
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwSignal(object):
+    """ One modeled signal (a list of values), details refer to the < Program Design > part."""
+    def __init__(self, key, cfg, rand):
+        self.key = key
+        self.num = max(1, int(cfg.get('num', DEF_SIGNAL_LEN)))
+        self.model = cfg.get('model', 'ramp')
+        self.valType = cfg.get('valType', 'int')
+        self.valid = self.model in MODELS and self.valType in VAL_TYPES
+        if not self.valid: print("Error: rwSignal() %s model/valType invalid: %s" % (key, str(cfg)))
+        self.minVal = float(cfg.get('min', 0))
+        self.maxVal = float(cfg.get('max', 100))
+        self.init = float(cfg.get('init', self.minVal))
+        self.rate = float(cfg.get('rate', 10))
+        self.tau = max(1e-3, float(cfg.get('tau', 1.0)))
+        self.noise = float(cfg.get('noise', 0))
+        self.source = cfg.get('source')
+        self.rand = rand
+        self.raw = [self.init] * self.num   # model values before the noise/type.
+        self.values = self._output()
+
+    def _output(self):
+        values = []
+        for val in self.raw:
+            if self.noise: val += self.rand.gauss(0, self.noise)
+            val = min(self.maxVal, max(self.minVal, val))
+            if self.valType == 'int':
+                val = int(round(val))
+            elif self.valType == 'bool':
+                val = val >= (self.minVal + self.maxVal) / 2
+            values.append(val)
+        return values
+
+    def update(self, now, dt, coils):
+        """ Update the values by the model, return True if any value changed."""
+        if self.model == 'ramp':
+            span = self.maxVal - self.minVal or 1
+            self.raw = [self.minVal + (self.rate * now + idx * span / self.num) % span
+                        for idx in range(self.num)]
+        elif self.model == 'lag':
+            targets = coils.get(self.source) if self.source else None
+            alpha = 1 - math.exp(-dt / self.tau)
+            for idx in range(self.num):
+                target = self.init
+                if isinstance(targets, (list, tuple)) and targets:
+                    val = targets[idx] if idx < len(targets) else targets[0]
+                    target = (self.maxVal if val else self.minVal) if isinstance(val, bool) else float(val)
+                self.raw[idx] += (target - self.raw[idx]) * alpha
+        values = self._output()
+        changed = values != self.values
+        self.values = values
+        return changed
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwEmulator(object):
+    """ Real-world emulator stand-in, details refer to the < Program Design > part."""
+    def __init__(self, config=None, port=DEF_PORT, autoAdd=True):
+        """ Init example: emulator = rwEmulator(config='emuConfig.json', port=3001)
+            Args:
+                config (dict/str, optional): config dict or json file path. Defaults to
+                    None use buildConfig().
+                port (int, optional): UDP port. Defaults to 3001.
+                autoAdd (bool, optional): add the requested key not in the config as a
+                    'ramp' signal. Defaults to True.
+        """
+        if isinstance(config, str):
+            try:
+                with open(config, 'r') as fh:
+                    config = json.load(fh)
+            except Exception as err:
+                print("Error: rwEmulator() can not load the config file: %s" % str(err))
+                config = None
+        if not isinstance(config, dict): config = buildConfig()
+        self.port = port
+        self.autoAdd = autoAdd
+        self.tickInt = float(config.get('tickInt', DEF_TICK_INT))
+        self.rand = random.Random(config.get('seed', 1))
+        self.signals = {}   # key -> rwSignal
+        for key, cfg in config.get('signals', {}).items(): self._addSignal(key, cfg)
+        self.coils = {}     # coils group key -> values posted by the PLC/RTU.
+        self.version = 0    # state version, increased by the tick which changed the state.
+        self.keyVersions = {}   # key -> the version it was last changed.
+        self.clients = {}   # client address -> {'plcID': id, 'codec': rwBinCodec or None}
+        self.plcIDs = set() # logged in PLC/RTU IDs (the hub connectors share one address).
+        self.subscribers = {}   # client address -> {'type', 'keys', 'port'}
+        self.stats = {'login': 0, 'get': 0, 'post': 0, 'exchange': 0, 'batch': 0,
+                      'push': 0, 'invalid': 0}
+        self.lock = threading.Lock()
+        self.server = udpCom.udpServer(None, port)
+        self.server.verbose = False
+        self.pushSock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.terminate = False
+        self._threads = []
+
+    def _addSignal(self, key, cfg):
+        signal = rwSignal(key, cfg, self.rand)
+        if signal.valid: self.signals[key] = signal
+        return signal.valid
+
+    #-----------------------------------------------------------------------------
+    def start(self):
+        """ Start the signals tick thread and the UDP server thread."""
+        self._threads = [threading.Thread(target=self._tickLoop, daemon=True),
+                         threading.Thread(target=self._serve, daemon=True)]
+        for thread in self._threads: thread.start()
+
+    def _tickLoop(self):
+        startT = lastT = time.monotonic()
+        nextT = startT + self.tickInt
+        while not self.terminate:
+            time.sleep(max(0, nextT - time.monotonic()))
+            now = time.monotonic()
+            self.tick(now - startT, now - lastT)
+            lastT, nextT = now, nextT + self.tickInt
+
+    def tick(self, now, dt):
+        """ Update all the signals, increase the version and push the changes if any
+            signal changed.
+        """
+        with self.lock:
+            changed = [key for key, signal in self.signals.items() if signal.update(now, dt, self.coils)]
+            if not changed: return
+            self.version += 1
+            for key in changed: self.keyVersions[key] = self.version
+            pushList = []
+            for address, sub in self.subscribers.items():
+                delta = {key: self.signals[key].values for key in sub['keys']
+                         if key in self.signals and key in changed}
+                delta[VERSION_KEY] = self.version
+                pushList.append(((address[0], sub['port']), ';'.join(('PUSH', sub['type'], json.dumps(delta)))))
+        for peer, msg in pushList:
+            try:
+                self.pushSock.sendto(msg.encode('utf-8'), peer)
+                self.stats['push'] += 1
+            except OSError as err:
+                print("rwEmulator: push to %s failed: %s" % (str(peer), str(err)))
+
+    #-----------------------------------------------------------------------------
+    def _serve(self):
+        """ UDP server thread: the handler needs the client address (codec/subscription)
+            so the server receive/reply functions are called directly.
+        """
+        while not self.terminate:
+            try:
+                data, address = self.server.receiveMsg()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if data is None: continue
+            seq, data = udpCom.splitSeqPrefix(data)
+            self.server.replyMsg(self.handleMsg(data, address), address, seq)
+
+    def handleMsg(self, data, address):
+        """ Handle one request and return the reply bytes/str, None if invalid."""
+        client = self.clients.get(address)
+        codec = client['codec'] if client else None
+        if codec and codec.isBinMsg(data):
+            msg = codec.decodeMsg(data)
+            if msg is None:
+                self.stats['invalid'] += 1
+                return None
+            k, t, rqstData = msg
+        else:
+            try:
+                k, t, body = data.decode('utf-8').split(';', 2)
+                rqstData = json.loads(body)
+            except Exception:
+                self.stats['invalid'] += 1
+                return None
+        if t == 'login': return self._login(rqstData, address)
+        with self.lock:
+            result = self._handleRqst(k, t, rqstData)
+        if result is None:
+            self.stats['invalid'] += 1
+            return None
+        if codec:
+            reply = codec.encodeMsg('REP', t, result)
+            if reply is not None: return reply
+        return ';'.join(('REP', t, json.dumps(result)))
+
+    def _handleRqst(self, k, t, rqstData):
+        """ Return the result of the request (called with the state lock)."""
+        if t == 'batch' and k == 'GET' and isinstance(rqstData, list):
+            self.stats['batch'] += 1
+            results = []
+            for item in rqstData:
+                result = None
+                if isinstance(item, list) and len(item) == 3 and item[1] not in ('login', 'batch'):
+                    result = self._handleRqst('GET', item[1], item[2])
+                # a failed request is replied as null.
+                results.append(None if result is None else [item[0], item[1], result])
+            return results
+        if not isinstance(rqstData, dict): return None
+        if t == 'exchange' and k == 'POST':
+            self.stats['exchange'] += 1
+            try:
+                postType, coils = rqstData['post']
+                fetchType, keys = rqstData['fetch']
+            except Exception:
+                return None
+            post = self._handleRqst('POST', postType, coils)
+            fetch = self._handleRqst('GET', fetchType, keys)
+            return None if post is None or fetch is None else {'post': post, 'fetch': fetch}
+        if k == 'GET':
+            self.stats['get'] += 1
+            return self._fetch(rqstData)
+        if k == 'POST':
+            self.stats['post'] += 1
+            self.coils.update(rqstData)
+            return {}
+        return None
+
+    def _fetch(self, rqstData):
+        since = rqstData.get(SINCE_KEY)
+        result = {}
+        for key in rqstData:
+            if key == SINCE_KEY: continue
+            if key not in self.signals:
+                if not (self.autoAdd and self._addSignal(key, {'model': 'ramp'})): continue
+                self.keyVersions[key] = self.version
+            if since is None or since < 0 or self.keyVersions.get(key, 0) > since:
+                result[key] = self.signals[key].values
+        if since is not None: result[VERSION_KEY] = self.version
+        return result
+
+    def _login(self, rqstData, address):
+        """ Register the client and accept the login offers."""
+        if not isinstance(rqstData, dict): return None
+        self.stats['login'] += 1
+        reply = {'state': 'ready'}
+        client = {'plcID': rqstData.get('plcID'), 'codec': None}
+        for key in ('batch', 'exchange', 'reliable'):
+            if rqstData.get(key): reply[key] = True
+        # reply the big messages with the udpCom reliable chunk transfer if offered.
+        self.server.setReliable(bool(rqstData.get('reliable')), address)
+        with self.lock:
+            self.subscribers.pop(address, None)
+            sub = rqstData.get('subscribe')
+            if isinstance(sub, dict) and sub.get('port'):
+                keys = list(sub.get('keys', []))
+                for key in keys:
+                    if key not in self.signals and self.autoAdd: self._addSignal(key, {'model': 'ramp'})
+                self.subscribers[address] = {'type': str(sub.get('type')), 'keys': keys,
+                                             'port': int(sub['port'])}
+                reply['subscribed'] = True
+            if rqstData.get('codec') == rwBinCodec.CODEC_NAME and isinstance(rqstData.get('schemas'), dict):
+                table = self._buildCodecTable(rqstData['schemas'])
+                codec = rwBinCodec.rwBinCodec()
+                if table and codec.loadTable(table):
+                    client['codec'] = codec
+                    reply.update({'codec': rwBinCodec.CODEC_NAME, 'schemas': table})
+        self.clients[address] = client
+        self.plcIDs.add(client['plcID'])
+        return ';'.join(('REP', 'login', json.dumps(reply)))
+
+    def _buildCodecTable(self, schemas):
+        """ Add the reply layouts to the offered request layouts: the signals values of
+            the GET request keys and the empty result of the POST (called with the state
+            lock). Returns: the schema table, None if the offered layouts are invalid.
+        """
+        schemaDict = dict(schemas)
+        for name, fields in schemas.items():
+            try:
+                rqstKey, rqstType = name.split(';', 1)
+                keys = [field[0] for field in fields]
+            except Exception:
+                return None
+            if rqstKey == 'GET':
+                for key in keys:
+                    if key not in self.signals and self.autoAdd: self._addSignal(key, {'model': 'ramp'})
+                sample = {key: self.signals[key].values for key in keys if key in self.signals}
+                repFields = rwBinCodec.inferFields(sample)
+                if repFields: schemaDict[rwBinCodec.schemaName('REP', rqstType)] = repFields
+            elif rqstKey == 'POST':
+                schemaDict[rwBinCodec.schemaName('REP', rqstType)] = []
+        return rwBinCodec.rwBinCodec().buildTable(schemaDict)
+
+    #-----------------------------------------------------------------------------
+    def getState(self):
+        """ Return a copy of the signals state dict and the coils state dict."""
+        with self.lock:
+            return ({key: list(signal.values) for key, signal in self.signals.items()},
+                    dict(self.coils))
+
+    def getStats(self):
+        stats = dict(self.stats)
+        stats.update({'clients': len(self.clients), 'plcs': len(self.plcIDs),
+                      'subscribers': len(self.subscribers),
+                      'version': self.version})
+        return stats
+
+    def stop(self):
+        self.terminate = True
+        self.server.serverStop()
+        # wake up the server thread blocked in the receive.
+        try:
+            self.pushSock.sendto(b'', ('127.0.0.1', self.port))
+        except OSError:
+            pass
+        for thread in self._threads: thread.join(1)
+        self.server.server.close()
+        self.pushSock.close()
+
+#-----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Real-world emulator stand-in server')
+    parser.add_argument('-p', '--port', type=int, default=DEF_PORT, help='UDP port')
+    parser.add_argument('-c', '--config', default=None, help='signals config json file')
+    parser.add_argument('-n', '--signals', type=int, default=DEF_SIGNAL_NUM,
+                        help='signals number if no config file')
+    parser.add_argument('-t', '--tick', type=float, default=DEF_TICK_INT, help='tick interval (sec)')
+    args = parser.parse_args()
+    config = args.config or buildConfig(signalNum=args.signals, tickInt=args.tick)
+    emulator = rwEmulator(config=config, port=args.port)
+    emulator.start()
+    print("Real-world emulator stand-in listening port [%s]" % str(args.port))
+    try:
+        while True:
+            time.sleep(5)
+            print(emulator.getStats())
+    except KeyboardInterrupt:
+        emulator.stop()
+
+#-----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        rwShmBridge.py
+#
+# Purpose:     This lib module will provide the shared memory transport between
+#              the Real-world emulator and the PLC/RTU simulators running on the
+#              same host, to replace the UDP + json round trip of every scan.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/04
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    One data channel is a pair of shmCom.sharedStateBlock segments with one writer:
+        - '<name>_layout': the fields layout json [[key, type, shape], ...] (the
+            rwBinCodec field layout), written once when the channel is created.
+        - '<name>': the data dict encoded by the layout (rwBinCodec.rwSchema: fields
+            bitmap + one struct packed values) under the seqlock.
+    The reader decodes the data directly from the shared memory (no copy, no json),
+    the decoded dict is cached by the block seq, so an unchanged state costs one seq
+    read. waitChange() polls the seq with a backoff sleep (50us to 2ms) as the change
+    notification.
+
+    Channels of a Real-world emulator with the name prefix <prefix>:
+        - '<prefix>_input': the sensors state published by the emulator (rwShmServer).
+        - '<prefix>_<plcID>_coils': the coils state written by one PLC/RTU (rwShmClient).
+
+    The PLC/RTU interface selects the transport in the addressInfoDict:
+        addressInfoDict = {'rwtransport': 'shm', 'rwshmname': 'railwayEmu', ...}
+
+    Usage:
+        server = rwShmServer('railwayEmu')     # Real-world emulator side.
+        server.publish({'weline': [1, 0, 1, 0]})
+        coils = server.getCoils('PLC-01')
+        client = rwShmClient('railwayEmu', 'PLC-01')   # PLC side.
+        if client.connect(): state = client.fetch()
+"""
+
+import json
+
+import shmCom
+import rwBinCodec
+
+INPUT_CH = 'input'
+COILS_CH = 'coils'
+
+#-----------------------------------------------------------------------------
+def inputChannelName(prefix):
+    return '%s_%s' % (prefix, INPUT_CH)
+
+def coilsChannelName(prefix, plcID):
+    return '%s_%s_%s' % (prefix, str(plcID), COILS_CH)
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwShmChannel(object):
+    """ One shared memory data channel, details refer to the < Program Design > part."""
+    def __init__(self, name, fields=None, track=True):
+        """ Init example:
+                channel = rwShmChannel('railwayEmu_input', fields=layout)    # writer
+                channel = rwShmChannel('railwayEmu_input', track=False)      # reader
+            Args:
+                name (str): channel name.
+                fields (list, optional): fields layout, create the channel as the writer
+                    if it is set, else attach the existed channel as the reader.
+                track (bool, optional): see shmCom.sharedStateBlock.
+        """
+        self.name = name
+        self.writer = fields is not None
+        self.schema = None
+        self.block = self.layoutBlock = None
+        self._cache = (None, None)  # (seq, decoded dict)
+        self.ready = self._open(fields, track)
+
+    def _open(self, fields, track):
+        if self.writer:
+            schema = rwBinCodec.rwSchema(self.name, fields)
+            if not schema.valid: return False
+            layout = json.dumps(fields).encode('utf-8')
+            dataSz = schema.getMaxSize()
+            # remove the channel left by a crashed writer (one writer per channel).
+            shmCom.removeBlock(self.name + '_layout')
+            shmCom.removeBlock(self.name)
+            self.layoutBlock = shmCom.sharedStateBlock(name=self.name + '_layout', size=len(layout), create=True)
+            self.block = shmCom.sharedStateBlock(name=self.name, size=dataSz, create=True)
+            if not (self.layoutBlock.isReady() and self.block.isReady()):
+                self.close()
+                return False
+            self.layoutBlock.write(layout)
+        else:
+            self.layoutBlock = shmCom.sharedStateBlock(name=self.name + '_layout', create=False, track=track)
+            if not self.layoutBlock.isReady(): return False
+            result = self.layoutBlock.read()
+            if result is None: return False
+            schema = rwBinCodec.rwSchema(self.name, json.loads(result[0]))
+            if not schema.valid: return False
+            self.block = shmCom.sharedStateBlock(name=self.name, create=False, track=track)
+            if not self.block.isReady():
+                self.close()
+                return False
+        self.schema = schema
+        return True
+
+    #-----------------------------------------------------------------------------
+    def write(self, dataDict):
+        """ Encode the data dict (can be a part of the fields) to the channel.
+            Returns: the new seq, None if failed.
+        """
+        if not (self.ready and self.writer): return None
+        try:
+            payload = self.schema.encode(dataDict)
+        except Exception as err:
+            print("Error: rwShmChannel.write() data does not fit the %s layout: %s" % (self.name, str(err)))
+            return None
+        return self.block.write(payload)
+
+    def read(self):
+        """ Read the channel data dict (the cached dict if the seq is not changed).
+            Returns: (data dict, seq), None if failed.
+        """
+        if not self.ready: return None
+        seq = self.block.getSeq()
+        if seq == self._cache[0]: return (self._cache[1], seq)
+        result = self.block.readWith(lambda buf, offset, size: self.schema.decode(buf, offset) if size else {})
+        if result is None: return None
+        self._cache = (result[1], result[0])
+        return (result[0], result[1])
+
+    def getSeq(self):
+        return self.block.getSeq() if self.ready else None
+
+    def waitChange(self, lastSeq, timeout=None):
+        """ Wait the channel data changed from the lastSeq, return the new seq or None."""
+        return self.block.waitChange(lastSeq, timeout=timeout) if self.ready else None
+
+    def isReady(self):
+        return self.ready
+
+    def close(self):
+        for block in (self.block, self.layoutBlock):
+            if block: block.close()
+        self.block = self.layoutBlock = None
+        self.ready = False
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwShmServer(object):
+    """ Real-world emulator side: publish the sensors state and read the PLCs' coils."""
+    def __init__(self, prefix, inputFields=None):
+        """ Init example: server = rwShmServer('railwayEmu')
+            Args:
+                prefix (str): channel name prefix.
+                inputFields (list, optional): sensors fields layout, None to infer it from
+                    the first published state.
+        """
+        self.prefix = prefix
+        self.inputFields = inputFields
+        self.inputCh = None
+        self.coilsChs = {}  # plcID -> rwShmChannel
+        if inputFields: self._createInput(inputFields)
+
+    def _createInput(self, fields):
+        self.inputCh = rwShmChannel(inputChannelName(self.prefix), fields=fields)
+        if not self.inputCh.isReady():
+            print("Error: rwShmServer() can not create the input channel.")
+            self.inputCh = None
+        return self.inputCh is not None
+
+    #-----------------------------------------------------------------------------
+    def publish(self, stateDict):
+        """ Publish the sensors state dict, return the new seq or None if failed."""
+        if self.inputCh is None:
+            fields = rwBinCodec.inferFields(stateDict)
+            if not fields or not self._createInput(fields): return None
+        return self.inputCh.write(stateDict)
+
+    def getCoils(self, plcID):
+        """ Read the PLC's coils state. Returns: (coils dict, seq), None if the PLC
+            has not created its coils channel.
+        """
+        channel = self.coilsChs.get(plcID)
+        if channel is None:
+            channel = rwShmChannel(coilsChannelName(self.prefix, plcID), track=False)
+            if not channel.isReady(): return None
+            self.coilsChs[plcID] = channel
+        return channel.read()
+
+    def close(self):
+        for channel in self.coilsChs.values(): channel.close()
+        self.coilsChs = {}
+        if self.inputCh: self.inputCh.close()
+        self.inputCh = None
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwShmClient(object):
+    """ PLC/RTU side: read the sensors state and write the coils state."""
+    def __init__(self, prefix, plcID):
+        self.prefix = prefix
+        self.plcID = plcID
+        self.inputCh = None
+        self.coilsCh = None
+        self.coilState = {} # full coils state written to the coils channel.
+        self.inputSeq = None    # input channel seq of the last fetched state.
+
+    #-----------------------------------------------------------------------------
+    def connect(self):
+        """ Attach the emulator's input channel, return True if the emulator is online."""
+        if self.inputCh: self.inputCh.close()
+        # the emulator is not the parent process: don't let the tracker unlink it.
+        self.inputCh = rwShmChannel(inputChannelName(self.prefix), track=False)
+        if not self.inputCh.isReady(): self.inputCh = None
+        return self.inputCh is not None
+
+    def fetch(self, keyList=None):
+        """ Return the sensors state dict (only the keys in the keyList if it is set),
+            None if the emulator is offline.
+        """
+        if self.inputCh is None: return None
+        result = self.inputCh.read()
+        if result is None: return None
+        self.inputSeq = result[1]
+        if keyList is None: return dict(result[0])
+        state = result[0]
+        return {key: state[key] for key in keyList if key in state}
+
+    def waitInput(self, lastSeq, timeout=None):
+        """ Wait the sensors state changed from the lastSeq, return the new seq or None."""
+        return self.inputCh.waitChange(lastSeq, timeout=timeout) if self.inputCh else None
+
+    def postCoils(self, coilDict):
+        """ Merge the (changed) coils dict to the coils state and write the full state.
+            The coils channel layout is set by the first posted (full) state.
+            Returns: the new seq, None if failed.
+        """
+        self.coilState.update(coilDict)
+        if self.coilsCh is None:
+            fields = rwBinCodec.inferFields(self.coilState)
+            if not fields: return None
+            self.coilsCh = rwShmChannel(coilsChannelName(self.prefix, self.plcID), fields=fields)
+            if not self.coilsCh.isReady():
+                self.coilsCh = None
+                return None
+        return self.coilsCh.write(self.coilState)
+
+    def close(self):
+        for channel in (self.inputCh, self.coilsCh):
+            if channel: channel.close()
+        self.inputCh = self.coilsCh = None
@@ -0,0 +1,169 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        scanCycle.py
+#
+# Purpose:     This lib module will provide a fixed period scan cycle scheduler
+#              for the PLC/RTU simulator to run the read inputs => ladder logic
+#              => write outputs cycle on a monotonic clock deadline.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/06/10
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    A real PLC executes its program in a fixed period scan cycle: read inputs,
+    execute the ladder logic, then write the outputs. Stacking time.sleep() between
+    the steps makes the real period become sleep time + I/O time and it will drift.
+    The scanCycleEngine will keep the cycle start time on a monotonic clock deadline
+    grid: deadline(n) = startTime + n * period, and only sleep the remaining time
+    before the next deadline.
+
+    If one cycle runs longer than the period (overrun), the engine will handle it
+    with one of the two policies:
+    - SCAN_SKIP: skip the missed cycles and align to the next deadline on the grid.
+    - SCAN_CATCHUP: run the missed cycles back to back without sleep until the engine
+        catch up the deadline grid (limited by maxCatchUp cycles, the rest are skipped).
+
+    The engine will also keep the statistics of the scan: executed/skipped cycles,
+    overrun count, start time jitter (actual start time - deadline) and cycle
+    execution time. The cycle function can call markUnchanged() when it found the
+    state not changed and skipped the evaluation, the 'unchanged' count reports the
+    executed cycles which did no work.
+
+    Usage:
+        engine = scanCycleEngine(period=0.05)
+        while not terminate:
+            engine.runCycle(periodicFun)
+"""
+
+import time
+
+SCAN_SKIP = 'skip'          # skip the missed cycles when overrun.
+SCAN_CATCHUP = 'catchup'    # run the missed cycles back to back when overrun.
+MIN_PERIOD = 0.01           # minimum scan period 10 ms.
+DEF_CATCHUP = 5             # default max number of cycles to catch up.
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class scanCycleEngine(object):
+    """ Fixed period scan cycle scheduler based on the monotonic clock."""
+
+    def __init__(self, period=0.5, overrunPolicy=SCAN_SKIP, maxCatchUp=DEF_CATCHUP) -> None:
+        """ Init example: engine = scanCycleEngine(period=0.1, overrunPolicy=SCAN_CATCHUP)
+            Args:
+                period (float, optional): scan period in sec. Defaults to 0.5.
+                overrunPolicy (str, optional): SCAN_SKIP or SCAN_CATCHUP. Defaults to SCAN_SKIP.
+                maxCatchUp (int, optional): max number of missed cycles to run back to
+                    back under the catch up policy. Defaults to 5.
+        """
+        self.period = MIN_PERIOD
+        self.setPeriod(period)
+        self.overrunPolicy = overrunPolicy if overrunPolicy in (SCAN_SKIP, SCAN_CATCHUP) else SCAN_SKIP
+        self.maxCatchUp = max(0, int(maxCatchUp))
+        self._nextDeadline = None
+        self.resetStats()
+
+    #-----------------------------------------------------------------------------
+    def _waitDeadline(self):
+        """ Sleep until the next deadline and return the deadline."""
+        now = time.monotonic()
+        if self._nextDeadline is None: self._nextDeadline = now
+        if self._nextDeadline > now: time.sleep(self._nextDeadline - now)
+        return self._nextDeadline
+
+    #-----------------------------------------------------------------------------
+    def _scheduleNext(self, endT):
+        """ Calculate the next cycle deadline after one cycle finished at endT."""
+        self._nextDeadline += self.period
+        if endT <= self._nextDeadline: return
+        # The cycle finished after the next deadline.
+        missed = int((endT - self._nextDeadline) // self.period) + 1
+        if self.overrunPolicy == SCAN_CATCHUP and self._catchUpCount < self.maxCatchUp:
+            # keep the deadline so the next cycles run without sleep.
+            self._catchUpCount += 1
+            return
+        # skip the missed cycles and align the deadline to the grid.
+        self._nextDeadline += missed * self.period
+        self.stats['skipped'] += missed
+        self._catchUpCount = 0
+
+    #-----------------------------------------------------------------------------
+    def runCycle(self, cycleFun, *args, **kwargs):
+        """ Wait for the next deadline, run one scan cycle function and schedule the
+            next deadline. The cycle function will be called as cycleFun(now, *args, **kwargs)
+            where now is the cycle start time.time() timestamp.
+            Returns: the cycle function's return value.
+        """
+        deadline = self._waitDeadline()
+        startT = time.monotonic()
+        jitter = startT - deadline
+        result = None
+        try:
+            result = cycleFun(time.time(), *args, **kwargs)
+        finally:
+            endT = time.monotonic()
+            self._recordCycle(jitter, endT - startT)
+            if endT - startT > self.period: self.stats['overrun'] += 1
+            if endT <= deadline + self.period: self._catchUpCount = 0
+            self._scheduleNext(endT)
+        return result
+
+    def _recordCycle(self, jitter, execT):
+        """ Update the scan statistics."""
+        stats = self.stats
+        stats['executed'] += 1
+        stats['lastJitter'] = jitter
+        stats['maxJitter'] = max(stats['maxJitter'], jitter)
+        stats['sumJitter'] += jitter
+        stats['lastExecT'] = execT
+        stats['maxExecT'] = max(stats['maxExecT'], execT)
+
+    #-----------------------------------------------------------------------------
+    def markUnchanged(self):
+        """ Count the current cycle as an unchanged cycle (evaluation skipped)."""
+        self.stats['unchanged'] += 1
+
+    def reset(self):
+        """ Reset the deadline grid, the next cycle will start immediately. Call this
+            function after the scan is paused (such as waiting for reconnection).
+        """
+        self._nextDeadline = None
+        self._catchUpCount = 0
+
+    def resetStats(self):
+        self._catchUpCount = 0
+        self.stats = {
+            'executed': 0,      # number of executed cycles.
+            'skipped': 0,       # number of skipped cycles.
+            'overrun': 0,       # number of cycles run longer than the period.
+            'unchanged': 0,     # number of executed cycles skipped the evaluation.
+            'lastJitter': 0.0,  # last cycle start time - deadline (sec).
+            'maxJitter': 0.0,
+            'sumJitter': 0.0,
+            'lastExecT': 0.0,   # last cycle execution time (sec).
+            'maxExecT': 0.0,
+        }
+
+    #-----------------------------------------------------------------------------
+    def getPeriod(self):
+        return self.period
+
+    def getStats(self):
+        """ Return a copy of the scan statistics dict with the average jitter."""
+        stats = dict(self.stats)
+        stats['avgJitter'] = stats['sumJitter'] / stats['executed'] if stats['executed'] else 0.0
+        stats.pop('sumJitter')
+        return stats
+
+    #-----------------------------------------------------------------------------
+    def setPeriod(self, period):
+        """ Set the scan period (sec), the min period is 10ms."""
+        if isinstance(period, (int, float)) and period > 0:
+            self.period = max(MIN_PERIOD, float(period))
+            return True
+        print("Error: setPeriod() the scan period must be a number > 0.")
+        return False
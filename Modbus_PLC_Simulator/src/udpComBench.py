@@ -0,0 +1,150 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        udpComBench.py
+#
+# Purpose:     Benchmark program used to compare the throughput of the lib module
+#              <udpCom.py> single thread udpServer and the multi-core udpMpServer
+#              under different worker numbers.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/02
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+    The server runs a Real-world emulator like handler: the emulator state (sensors
+    value dict) is published by the main process in a shmCom.sharedStateBlock every
+    10ms, the handler parses the 'GET;input;{"key": null, ...}' request, reads the
+    state block (the json state is only decoded again when the block seq changed)
+    and replies the requested keys. The load generator runs <p> client processes,
+    each client keeps <d> pipelined requests in flight (udpCom.pipeClient) during
+    the test duration. The program reports the replied datagrams per second of the
+    single udpServer (workers = 0) and the udpMpServer with each worker number.
+
+    Usage:
+        python udpComBench.py [-w 0 1 2 4] [-p 8] [-d 4] [-t 5]
+"""
+
+import json
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+
+import udpCom
+import shmCom
+
+BENCH_PORT = 3090
+SENSOR_NUM = 100    # sensors number in the emulator state.
+STATE_INT = 0.01    # emulator state publish interval (sec).
+
+gStateBlock = None  # worker's shared state block.
+gStateCache = [None, None]  # [seq, state dict] of the last decoded state.
+
+#-----------------------------------------------------------------------------
+def initWorker(workerIdx, stateBlock):
+    global gStateBlock
+    gStateBlock = stateBlock
+
+def benchHandler(msg):
+    """ Real-world emulator like request handler."""
+    try:
+        rqstKey, rqstType, rqstJson = msg.decode('utf-8').split(';', 2)
+        keys = json.loads(rqstJson)
+    except Exception:
+        return None
+    seq = gStateBlock.getSeq()
+    if seq != gStateCache[0]:
+        data, seq = gStateBlock.read()
+        gStateCache[:] = [seq, json.loads(data)]
+    state = gStateCache[1]
+    return 'REP;%s;%s' % (rqstType, json.dumps({key: state.get(key) for key in keys}))
+
+def publishState(stateBlock, stopEvent):
+    """ Emulator state publisher thread."""
+    count = 0
+    while not stopEvent.is_set():
+        count += 1
+        state = {'sensor%d' % idx: [count, idx, count % 2 == 0] for idx in range(SENSOR_NUM)}
+        stateBlock.write(json.dumps(state).encode('utf-8'))
+        time.sleep(STATE_INT)
+
+#-----------------------------------------------------------------------------
+def runServer(workerNum, port, stateBlock):
+    """ Sub process function to run the single (workerNum=0) or multi-core server."""
+    if workerNum == 0:
+        initWorker(0, stateBlock)
+        server = udpCom.udpServer(None, port)
+        server.verbose = False
+    else:
+        server = udpCom.udpMpServer(None, port, workerNum=workerNum, workerInit=initWorker,
+                                    initArgs=(stateBlock,))
+        # stop the workers when the benchmark terminates the server process.
+        signal.signal(signal.SIGTERM, lambda *args: server.serverStop())
+    server.serverStart(handler=benchHandler)
+
+def runLoad(port, duration, depth, resultQueue):
+    """ Load process: keep <depth> requests in flight until the end time."""
+    client = udpCom.pipeClient(('127.0.0.1', port), timeout=0.5, retry=0)
+    rqst = 'GET;input;%s' % json.dumps({'sensor%d' % idx: None for idx in range(0, SENSOR_NUM, 10)})
+    count = [0]
+    def onReply(seq, reply):
+        if reply: count[0] += 1
+    endT = time.monotonic() + duration
+    while time.monotonic() < endT:
+        while client.getInflightNum() < depth: client.submit(rqst, callback=onReply)
+        client.poll(0.01)
+    while client.poll(0.01): pass
+    stats = client.getStats()
+    client.disconnect()
+    resultQueue.put((count[0], stats['failed']))
+
+#-----------------------------------------------------------------------------
+def benchServer(workerNum, procNum, duration, depth, port):
+    """ Start the server with the worker number and run the load test, return the result dict."""
+    stateBlock = shmCom.sharedStateBlock(size=SENSOR_NUM * 64)
+    stopEvent = threading.Event()
+    publisher = threading.Thread(target=publishState, args=(stateBlock, stopEvent), daemon=True)
+    publisher.start()
+    server = multiprocessing.Process(target=runServer, args=(workerNum, port, stateBlock))
+    server.start()
+    time.sleep(1)   # wait the server ready.
+    resultQueue = multiprocessing.Queue()
+    loadList = [multiprocessing.Process(target=runLoad, args=(port, duration, depth, resultQueue))
+                for _ in range(procNum)]
+    startT = time.perf_counter()
+    for proc in loadList: proc.start()
+    results = [resultQueue.get() for _ in loadList]
+    usedT = time.perf_counter() - startT
+    for proc in loadList: proc.join()
+    server.terminate()
+    server.join(5)
+    stopEvent.set()
+    publisher.join()
+    stateBlock.close()
+    replied = sum(rst[0] for rst in results)
+    return {'workers': workerNum, 'replied': replied, 'rps': replied/usedT,
+            'failed': sum(rst[1] for rst in results)}
+
+#-----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='UDP server worker number benchmark')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[0, 1, 2, 4],
+                        help='worker numbers, 0 is the single thread udpServer')
+    parser.add_argument('-p', '--procs', type=int, default=8, help='load generator processes')
+    parser.add_argument('-d', '--depth', type=int, default=4, help='pipelined requests per client')
+    parser.add_argument('-t', '--time', type=float, default=5.0, help='test duration (sec)')
+    parser.add_argument('--port', type=int, default=BENCH_PORT)
+    args = parser.parse_args()
+    print("%-8s %10s %10s %7s" % ('workers', 'replied', 'dgram/s', 'failed'))
+    for idx, workerNum in enumerate(args.workers):
+        # use a new port every round so the late datagrams of the last round are not counted.
+        rst = benchServer(workerNum, args.procs, args.time, args.depth, args.port + idx)
+        print("%-8d %10d %10.0f %7d" % (rst['workers'], rst['replied'], rst['rps'], rst['failed']))
+
+#-----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
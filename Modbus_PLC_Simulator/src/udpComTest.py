@@ -0,0 +1,168 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        udpComTest.py
+#
+# Purpose:     testcase program used to test the big message transfer of the lib
+#              module <udpCom.py>: the legacy transfer (default) and the reliable
+#              chunk transfer through a lossy proxy which drops and reorders the
+#              chunks so the NACK and resend paths are used.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/20
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+
+import os
+import math
+import socket
+import threading
+import udpCom
+
+HOST = '127.0.0.1'
+SERVER_PORT = 3011
+PROXY_PORT = 3012
+BUFFER_SZ = 1024    # small buffer so the test message is split to ~200 chunks.
+MSG_SZ = 200000
+LEGACY_MSG_SZ = 20000   # the legacy transfer has no flow control, keep it in the socket buffer.
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class lossyProxy(threading.Thread):
+    """ UDP proxy between one client and the server (both directions):
+        - drops the first copy of the chunks whose sequence is in dropSeqs.
+        - holds the first copy of the chunks in holdSeqs and sends it after the next
+            message (the next chunk or the window checkpoint), so it arrives reordered.
+        - drops the first checkpoint of the windows whose end is in dropChkEnds.
+        The forwarded transfer messages are counted in self.counts.
+    """
+    def __init__(self, port, serverAddr, dropSeqs=(), holdSeqs=(), dropChkEnds=()):
+        threading.Thread.__init__(self, daemon=True)
+        self.serverAddr = serverAddr
+        self.clientAddr = None
+        self.dropSeqs = set(dropSeqs)
+        self.holdSeqs = set(holdSeqs)
+        self.dropChkEnds = set(dropChkEnds)
+        self.counts = {'header': 0, 'legacyHeader': 0, 'chunk': 0, 'dropped': 0,
+                       'held': 0, 'chk': 0, 'ack': 0, 'nack': 0}
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((HOST, port))
+        self.sock.settimeout(0.2)
+        self._seen = set()  # (dest, transfer ID, seq) chunks and checkpoints already seen.
+        self._held = []
+        self.terminate = False
+
+    def run(self):
+        while not self.terminate:
+            try:
+                data, address = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            if address == self.serverAddr:
+                dest = self.clientAddr
+            else:
+                self.clientAddr, dest = address, self.serverAddr
+            if dest: self._forward(data, dest)
+        self.sock.close()
+
+    def _isFirst(self, key):
+        first = key not in self._seen
+        self._seen.add(key)
+        return first
+
+    def _forward(self, data, dest):
+        if data[:2] == udpCom.CHUNK_MAGIC:
+            _, transferID, seq = udpCom.CHUNK_HEADER.unpack_from(data)
+            self.counts['chunk'] += 1
+            first = self._isFirst((dest, transferID, seq))
+            if first and seq in self.dropSeqs:
+                self.counts['dropped'] += 1
+                return
+            if first and seq in self.holdSeqs:
+                self.counts['held'] += 1
+                self._held.append(data)
+                return
+        else:
+            fields = data.split(b';')
+            if fields[:2] == [b'BM', b'Send']:
+                self.counts['header' if len(fields) == 5 else 'legacyHeader'] += 1
+            elif fields[:2] == [b'BM', b'Chk'] and len(fields) == 4:
+                self.counts['chk'] += 1
+                if self._isFirst((dest, 'chk', fields[2], fields[3])) and int(fields[3]) in self.dropChkEnds:
+                    self.counts['dropped'] += 1
+                    return
+            elif fields[:2] == [b'BM', b'Ack']:
+                self.counts['ack'] += 1
+            elif fields[:2] == [b'BM', b'Nack']:
+                self.counts['nack'] += 1
+        self.sock.sendto(data, dest)
+        for heldData in self._held: self.sock.sendto(heldData, dest)
+        self._held = []
+
+    def stop(self):
+        self.terminate = True
+
+#-----------------------------------------------------------------------------
+def startServer(port):
+    server = udpCom.udpServer(None, port)
+    server.setBufferSize(BUFFER_SZ)
+    server.verbose = False
+    # reply the reversed message, so the reply is also a big message.
+    threading.Thread(target=server.serverStart, args=(lambda data: data[::-1],), daemon=True).start()
+    return server
+
+def bigMsgTest(client, proxy, message, expectCounts, testID):
+    """ Send the big message through the proxy, check the server's reply (the reversed
+        message) and the proxy counters: {name: min count}.
+        Example:
+            >>> bigMsgTest(client, proxy, os.urandom(200000), {'legacyHeader': 1}, 1)
+                [x] Test 1: big message transfer passed
+    """
+    reply = client.sendChunk(message, resp=True)
+    assert reply == message[::-1], f"[ ] Test {testID}: big message reply is not correct"
+    for key, minCount in expectCounts.items():
+        assert proxy.counts[key] >= minCount, f"[ ] Test {testID}: {key} count {proxy.counts[key]} < {minCount}"
+    print(f"[x] Test {testID}: big message transfer passed {proxy.counts}")
+
+#-----------------------------------------------------------------------------
+def runTestCases():
+    serverAddr, proxyAddr = (HOST, SERVER_PORT), (HOST, PROXY_PORT)
+    server = startServer(SERVER_PORT)
+    message = os.urandom(MSG_SZ)
+    print("(Unit Test Cases)")
+    # 1. the default client sends the legacy transfer header (the old udpCom peers
+    #    can not parse the reliable transfer header).
+    proxy = lossyProxy(PROXY_PORT, serverAddr)
+    proxy.start()
+    client = udpCom.udpClient(proxyAddr)
+    client.setBufferSize(BUFFER_SZ)
+    bigMsgTest(client, proxy, message[:LEGACY_MSG_SZ], {'legacyHeader': 2}, 1)
+    assert proxy.counts['header'] == 0, "[ ] Test 1: reliable transfer used by default"
+    client.client.close()
+    proxy.stop()
+    proxy.join()
+    # 2/3. the reliable transfer in both directions with the dropped, reordered chunks
+    #    and a lost checkpoint: the receiver NACKs the missing chunks, the sender resends
+    #    them and resends the checkpoint after the time out.
+    server.setReliable(True, proxyAddr)
+    lossRules = {'dropSeqs': (3, 40, 41, 150), 'holdSeqs': (10, 31, 100), 'dropChkEnds': (64,)}
+    expectCounts = {'header': 2, 'dropped': 2 * 5, 'held': 2 * 3, 'nack': 2,
+                    'chunk': 2 * (math.ceil(MSG_SZ / (BUFFER_SZ - 8)) + 4)}
+    for testID, clientClass in ((2, udpCom.udpClient), (3, udpCom.pipeClient)):
+        proxy = lossyProxy(PROXY_PORT, serverAddr, **lossRules)
+        proxy.start()
+        client = clientClass(proxyAddr)
+        if testID == 3: client.bufferSize = BUFFER_SZ
+        else: client.setBufferSize(BUFFER_SZ)
+        client.setReliable(True)
+        bigMsgTest(client, proxy, message, expectCounts, testID)
+        if testID == 3: client.disconnect()
+        else: client.client.close()
+        proxy.stop()
+        proxy.join()
+    server.serverStop()
+
+if __name__ == '__main__':
+    runTestCases()
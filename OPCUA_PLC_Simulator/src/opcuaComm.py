@@ -38,12 +38,17 @@
     OPCUA-HTTPS: https://localhost:443/UADiscovery
     https://github.com/FreeOpcUa/opcua-asyncio/blob/master/examples/client-minimal.py
 
+    The ladder logic can be hand coded by inheriting the ladderLogic class or written 
+    in the ladderDsl text program with the dslLadderLogic class.
+
 """
 
 import asyncio
 from asyncua import Client
 from asyncua import Server, ua
 
+import ladderDsl
+
 OPCUA_DEF_PORT = 4840
 
 UA_TYPE_BOOL = ua.VariantType.Boolean
@@ -103,6 +108,43 @@ class ladderLogic(object):
         """ 
         return None 
     
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class dslLadderLogic(ladderLogic):
+    """ Ladder logic written in the ladderDsl text program. The src variables' values
+        are mapped to the DSL REG[n] (value) and IN[n] (bool), the dest variables are 
+        mapped to OUT[n]. Example:
+            ladder = dslLadderLogic(server, "OUT[0] := REG[0] > 50.5", 
+                                    srcVarIDList=['temp'], destVarIDList=['alarm'])
+    """
+    def __init__(self, parent, program, ladderName='DslLadderDiagram', srcVarIDList=None,
+                 destVarIDList=None):
+        """ Args:
+                parent (opcuaServer): parent need to be a opcua server obj
+                program (str/ladderProgram): DSL program text or a compiled ladderProgram.
+                ladderName (str, optional): ladder name. Defaults to 'DslLadderDiagram'.
+                srcVarIDList (list, optional): src variable ID list. Defaults to None.
+                destVarIDList (list, optional): dest variable ID list. Defaults to None.
+        """
+        if isinstance(program, str): program = ladderDsl.compileLadder(program, name=str(ladderName))
+        self.program = program
+        self._varInfo = (list(srcVarIDList or []), list(destVarIDList or []))
+        super().__init__(parent, ladderName=ladderName)
+
+    def initLadderInfo(self):
+        self.srcVarIDList, self.destVarIDList = self._varInfo
+
+    async def runLadderLogic(self):
+        """ Read the src variables from the parent server, run one scan of the compiled
+            program and update the dest variables, return the OUT values list.
+        """
+        if self.program is None or self.parent is None: return None
+        srcVals = [await self.parent.getVariableVal(varID) for varID in self.srcVarIDList]
+        outList = list(self.program.scan(srcVals, srcVals))
+        for varID, val in zip(self.destVarIDList, outList):
+            await self.parent.updateVariable(varID, val)
+        return outList
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class opcuaServer(object):
@@ -71,10 +71,7 @@ class trainPowerRtu(rtuSimulator.rtuSimuInterface):
         for key, value in self.regsStateRW.items():
             for idx, rstData in enumerate(result[key]):
                 memoryIdx = value[idx]
-                s7commServer.setMemoryVal(memoryIdx, 0, rstData[0])
-                s7commServer.setMemoryVal(memoryIdx, 2, rstData[1])
-                s7commServer.setMemoryVal(memoryIdx, 4, rstData[2])
-                s7commServer.setMemoryVal(memoryIdx, 6, rstData[3])
+                s7commServer.setMemoryBlock(memoryIdx, rstData[:4])
 
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
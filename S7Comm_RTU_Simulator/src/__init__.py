@@ -30,4 +30,25 @@ Modules included in the current package:
 
 3. UdpCom.py: 
 - provide UDP communication API in the distribution system.
-"""
\ No newline at end of file
+
+4. scanCycle.py
+- provide the fixed period scan cycle scheduler for the PLC/RTU simulator.
+
+5. ladderDsl.py
+- provide the ladder rung DSL compiler which compiles the text ladder program to a python scan function.
+
+6. rwBinCodec.py
+- provide the binary schema negotiated message codec for the Real-world emulator protocol.
+
+7. shmCom.py
+- provide the seqlock protected shared memory state block to hand off state between processes.
+
+8. rwShmBridge.py
+- provide the shared memory transport between the Real-world emulator and the PLC/RTU on the same host.
+
+9. rwEmulator.py
+- provide the local Real-world emulator stand-in server with the modeled signals for load and regression tests.
+
+10. s7DbLayout.py
+- provide the declarative S7 data block layout compiler to read/write the variable size DB values.
+"""
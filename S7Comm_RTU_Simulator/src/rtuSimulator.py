@@ -24,15 +24,28 @@ A RTU simulator interface module with 3 components:
     signal from sensor and change the switch state)
 
 - s7CommService: A sub-threading service class to run the S7Comm server parallel with 
-    the main program thread. 
+    the main program thread. Besides the single ladder handler, the DB write handlers 
+    can be registered per DB number/byte range (snap7Comm.s7WriteDispatcher), the writes
+    of one tick are coalesced and the handlers run in a small worker pool.
     
 - rtuSimuInterface: A interface class with the basic function for the user to inherit 
     it to build their RTU module.
 
+The real world emulator messages use the 'GET;type;{json}' text format by default, set 
+binCodec=True to offer the compact binary format (see rwBinCodec.py) in the login, the 
+text format is used if the emulator does not accept it. Set pipeline=True to use the 
+pipelined UDP client (udpCom.pipeClient) with the per request deadline and resend 
+instead of blocking the scan for the 20 sec socket time out. Set subscribe=True to 
+subscribe the sensors changes pushed by the emulator instead of polling it every scan
+(the versioned conditional GET is the fallback). To host many RTUs in one process, pass 
+one RealWorldConnectorHub as the hub to all of them: they share one UDP socket and the 
+sensors fetch requests of the same tick are sent in one batch datagram.
+
 """
 
 import os
 import time
+import socket
 import json
 import threading
 from datetime import datetime
@@ -40,11 +53,25 @@ from collections import OrderedDict
 
 import Log # the module need to work with the lib Log module
 import udpCom
+import rwBinCodec
+import rwShmBridge
+import scanCycle
 import snap7Comm
 from snap7Comm import BOOL_TYPE, INT_TYPE, REAL_TYPE
 
 RECON_INT = 15      # reconnection time interval default set 15 sec
+SUB_CHECK_INT = 5   # subscribe mode versioned conditional GET check interval (sec).
+VERSION_KEY = '_version'        # state version key in the versioned reply/push.
+SINCE_KEY = '_sinceVersion'     # conditional GET key: only the changes after the version.
 DEF_RW_PORT = 3001  # default real-world UDP connection port
+DEF_SHM_NAME = 'rwEmulator' # default Real-world shared memory channels name prefix.
+TRANSPORT_UDP = 'udp'
+TRANSPORT_SHM = 'shm'
+EXCHANGE_TYPE = 'exchange'    # combined coils setting + sensors fetch request type.
+HUB_BATCH_WAIT = 0.005  # connector hub max wait (sec) for the other connectors' GET of the same tick.
+HUB_POLL_INT = 0.001    # connector hub reply poll interval (sec) while requests are pending.
+HUB_IDLE_WAIT = 0.5     # connector hub idle wait (sec).
+HUB_HEADER_SZ = 16      # 'GET;batch;[' + '#<seq>;' bytes reserved in the batch datagram.
 DEF_S7_PORT = 102   # default S7comm port.
 
 
@@ -70,16 +97,86 @@ def parseIncomeMsg(msg):
 class RealWorldConnector(object):
     """ A UDP connector(client) used to connect to the real word emulator app 
         to fetch the Real-world electrical signal changes or sensor value.
+        Subscribe mode (subscribe()): the login request adds the subscription
+            "subscribe": {"type": <fetch type>, "keys": [...], "port": <listener port>},
+        the emulator replies "subscribed": true and sends the changed keys to the 
+        listener port: 'PUSH;<type>;{"_version": <n>, <key>: <val>, ...}' with the state
+        version increased by one per push. The fetch is served from the state cache, a
+        versioned conditional GET (request key "_sinceVersion": <n>, the reply has only
+        the changed keys and the "_version") resyncs the cache after a version gap and
+        every SUB_CHECK_INT sec, it is also the fallback if the subscription is rejected.
+        Shared memory transport (transport='shm'): the emulator on the same host publishes
+        the sensors state in shared memory and the coils state is written to the PLC's
+        coils channel (see rwShmBridge.py), the requests are served without the UDP and 
+        json round trip.
+        Exchange request (exchangeRW()): the coils setting and the sensors fetch are sent
+        in one round trip, offered in the login ("exchange": true) and used if the 
+        emulator accepted it in the login reply:
+            'POST;exchange;{"post": [<set type>, {coils}], "fetch": [<fetch type>, {keys}]}'
+            'REP;exchange;{"post": {result}, "fetch": {result}}'
+        Hub mode (hub=RealWorldConnectorHub): the requests are sent through the hub's 
+        socket shared by all the connectors in the process, the GET requests of the same
+        tick are batched in one datagram (so the hub connectors don't use the exchange 
+        request, it is not batched).
+        The big requests (bigger than the UDP buffer) are sent with the udpCom legacy 
+        transfer, the reliable chunk transfer is offered in the login ("reliable": true)
+        and used after the emulator accepted it (an old emulator can not parse it).
     """
 
-    def __init__(self, parent, address) -> None:
+    def __init__(self, parent, address, codecSchemas=None, pipeline=False, timeout=udpCom.PIPE_TIMEOUT, 
+                 transport=TRANSPORT_UDP, shmName=DEF_SHM_NAME, hub=None) -> None:
+        """ Init example: connector = RealWorldConnector(plc, ('127.0.0.1', 3001))
+            Args:
+                parent (ref): parent PLC/RTU interface object.
+                address (tuple): Real-world emulator UDP (ip, port).
+                codecSchemas (dict, optional): request layouts {'GET;<type>': fields, ...}
+                    offered with the binary codec in the login request. Defaults to None
+                    use the text format only.
+                pipeline (bool, optional): use the pipelined UDP client (several requests
+                    in flight, per request deadline and resend). Defaults to False.
+                timeout (float, optional): pipelined request first try time out (sec).
+                transport (str, optional): 'udp' or 'shm' (shared memory). Defaults to 'udp'.
+                shmName (str, optional): shared memory channels name prefix of the emulator.
+                hub (RealWorldConnectorHub, optional): shared UDP connector hub. Defaults 
+                    to None use the connector's own socket.
+        """
         self.parent = parent
         self.address = address
         self.realworldInfo= { 'ip': address[0], 'port': address[1]}
-        self.rwConnector = udpCom.udpClient((self.realworldInfo['ip'], self.realworldInfo['port']))
+        self.shmClient = None
+        self.hub = None
+        if transport == TRANSPORT_SHM:
+            self.shmClient = rwShmBridge.rwShmClient(shmName, parent.getPlcID())
+            pipeline = False
+        elif hub is not None:
+            self.hub = hub
+            pipeline = False
+        self.pipeline = pipeline
+        self.postFailed = False # pipelined coils setting request failed flag.
+        self.exchangeEnabled = False
+        if self.shmClient or self.hub:
+            self.rwConnector = None
+        elif self.pipeline:
+            self.rwConnector = udpCom.pipeClient((self.realworldInfo['ip'], self.realworldInfo['port']), timeout=timeout)
+        else:
+            self.rwConnector = udpCom.udpClient((self.realworldInfo['ip'], self.realworldInfo['port']))
         self.reconnectCount = RECON_INT
+        self.codecSchemas = codecSchemas
+        self.binCodec = rwBinCodec.rwBinCodec()
+        # subscribe mode and versioned conditional GET state.
+        self.subInfo = None     # {'type': rqstType, 'keys': [...], 'port': listener port}
+        self.subscribed = False
+        self.condGet = False
+        self.stateCache = {}
+        self.stateVersion = None
+        self._needSync = True
+        self._lastCheckT = 0
+        self.inputVersion = None    # state version of the last fetched input, see getInputVersion()
+        self._stateLock = threading.Lock()
+        self._listener = None
         # Test login the Real-world emulator
         self.plcID = self.parent.getPlcID()
+        if self.hub: self.hub.register(self)
         self.realworldOnline = self._loginRealWord(plcID= self.plcID)
         connMsg = 'Login the Real-world simulator successfully' if self.realworldOnline else 'Cannot connect to the Real-world emulator'
         Log.info(connMsg)
@@ -87,10 +184,27 @@ class RealWorldConnector(object):
 #-----------------------------------------------------------------------------
     def _loginRealWord(self, plcID=None):
         """ Try to connect to the Real-world emulator with the plc ID."""
+        if self.shmClient:
+            Log.info("Try to attach the real word shared memory [%s]..." % str(self.shmClient.prefix))
+            return self._queryToRW('GET', 'login', {'plcID': plcID}) is not None
         Log.info("Try to connect to the real word [%s]..." % str(self.address))
         rqstKey, rqstType, rqstDict = 'GET', 'login', {'plcID': plcID}
+        self.binCodec.reset()   # the login is always sent in text format.
+        if self.codecSchemas:
+            rqstDict['codec'] = rwBinCodec.CODEC_NAME
+            rqstDict['schemas'] = self.codecSchemas
+        if self.subInfo: rqstDict['subscribe'] = self.subInfo
+        if self.hub: rqstDict['batch'] = True
+        rqstDict[EXCHANGE_TYPE] = True
+        rqstDict['reliable'] = True
+        self._setupReliable(None)   # the login is sent with the legacy transfer.
         result = self._queryToRW(rqstKey, rqstType, rqstDict)
         if result:
+            if self.hub: self.hub.setBatchEnabled(result[2])
+            self._setupReliable(result[2])
+            self.exchangeEnabled = isinstance(result[2], dict) and bool(result[2].get(EXCHANGE_TYPE))
+            self._setupCodec(result[2])
+            self._setupSubscribe(result[2])
             Log.info("Real-world emulator online, state: ready")
             return True
         if result is None: 
@@ -117,9 +231,107 @@ class RealWorldConnector(object):
             Log.warning("Real-world emulator response format not valid: %s , ignore the message." %str(result))
             return False
 
+    def _setupCodec(self, loginReply):
+        """ Enable the binary codec if the Real-world emulator accepted it in the login
+            reply, else keep using the text format.
+        """
+        if not (self.codecSchemas and isinstance(loginReply, dict)): return
+        if loginReply.get('codec') != rwBinCodec.CODEC_NAME: 
+            Log.info("Real-world emulator does not support binary codec, use text format.")
+            return
+        if self.binCodec.loadTable(loginReply.get('schemas')):
+            Log.info("Binary codec enabled: %s" %str(self.binCodec.getSchemaNames()))
+        else:
+            Log.warning("Real-world emulator binary codec schema table invalid, use text format.")
+
+    def _setupReliable(self, loginReply):
+        """ Send the big requests with the udpCom reliable chunk transfer if the Real-world
+            emulator accepted it in the login reply, else use the legacy transfer.
+        """
+        flag = isinstance(loginReply, dict) and bool(loginReply.get('reliable'))
+        client = self.hub.client if self.hub else self.rwConnector
+        if client: client.setReliable(flag)
+
+    def _setupSubscribe(self, loginReply):
+        """ Check whether the Real-world emulator accepted the subscription in the login 
+            reply, the state cache needs a full sync after every login.
+        """
+        if not self.subInfo: return
+        with self._stateLock:
+            self.subscribed = isinstance(loginReply, dict) and bool(loginReply.get('subscribed'))
+            self.stateVersion, self._needSync = None, True
+        Log.info("Real-world emulator push subscription: %s" %str(self.subscribed))
+
+    def subscribe(self, rqstType, keyList):
+        """ Start the push listener and login again to subscribe the keys' changes of 
+            the fetch request type. If the emulator does not accept the subscription, 
+            the versioned conditional GET is used to fetch only the changed keys.
+            Returns: True if the emulator accepted the subscription.
+        """
+        if self.shmClient: return False # the shared memory state is always current.
+        if self._listener is None:
+            self._listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._listener.bind(('0.0.0.0', 0))
+            self._listener.settimeout(1)
+            threading.Thread(target=self._listenPush, daemon=True).start()
+        self.subInfo = {'type': rqstType, 'keys': list(keyList), 'port': self._listener.getsockname()[1]}
+        self.condGet = True
+        self.realworldOnline = self._loginRealWord(plcID=self.plcID)
+        return self.subscribed
+
+    def _listenPush(self):
+        """ Push listener thread: receive the 'PUSH;<type>;{"_version": n, <key>: val}' 
+            delta messages and merge them in the state cache.
+        """
+        while self._listener:
+            try:
+                data, _ = self._listener.recvfrom(udpCom.BUFFER_SZ_MAX)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            k, t, body = parseIncomeMsg(data)
+            if k != 'PUSH' or not self.subInfo or t != self.subInfo['type']: continue
+            try:
+                delta = json.loads(body)
+                version = int(delta.pop(VERSION_KEY))
+            except Exception as err:
+                Log.warning("_listenPush(): invalid push message: %s" %str(err))
+                continue
+            with self._stateLock:
+                if self.stateVersion is None or version <= self.stateVersion: continue
+                self.stateCache.update(delta)
+                # a version gap means a lost push: keep the old version for the resync.
+                if version == self.stateVersion + 1:
+                    self.stateVersion = version
+                else:
+                    self._needSync = True
+
+    def negotiateCodec(self, codecSchemas):
+        """ Set the request layouts and login again to negotiate the binary codec, 
+            return True if the binary codec is enabled.
+        """
+        self.codecSchemas = codecSchemas
+        self.realworldOnline = self._loginRealWord(plcID=self.plcID)
+        return self.binCodec.isEnabled()
+
     def isRealWorldOnline(self):
         return self.realworldOnline
 
+    def getInputVersion(self):
+        """ Return the state version of the last fetched input (the subscribe/conditional
+            GET state version or the shared memory seq, the same version means the same 
+            state), None if the transport has no version (compare the fetched values).
+        """
+        return self.inputVersion
+
+    def isExchangeEnabled(self):
+        """ Return True if the emulator accepted the exchange request, the subscribe and
+            conditional GET modes fetch the sensors with their own cache so they don't use it,
+            the hub connectors don't use it as the hub only batches the GET requests.
+        """
+        return self.exchangeEnabled and not self.condGet and self.hub is None
+
 #-----------------------------------------------------------------------------
     def reConnectRW(self):
         """ Try to reconnect to the Real-world emulator."""
@@ -137,22 +349,123 @@ class RealWorldConnector(object):
             return: (key, rqstType, inputResultDict)
         """
         rqstKey = 'GET'
+        self.inputVersion = None
         if isinstance(inputDict, dict):
+            if self.subscribed and rqstType == self.subInfo['type']:
+                with self._stateLock:
+                    if not self._needSync and time.monotonic() - self._lastCheckT < SUB_CHECK_INT:
+                        self.inputVersion = self.stateVersion
+                        return ('REP', rqstType, dict(self.stateCache))
+            if self.condGet: return self._condFetch(rqstKey, rqstType, inputDict)
             return self._queryToRW(rqstKey, rqstType, inputDict)
         Log.warning("getRWInputData(): passed in input parm needs to be a dict() type.")
         return None
 
+    def _condFetch(self, rqstKey, rqstType, inputDict):
+        """ Versioned conditional GET: the emulator replies only the keys changed after 
+            the cached state version (all the keys if the version is -1) with the current
+            version. If the reply has no version (emulator doesn't support it), the 
+            conditional GET is disabled and the reply is used as the full state.
+        """
+        rqstDict = dict(inputDict)
+        rqstDict[SINCE_KEY] = -1 if self.stateVersion is None else self.stateVersion
+        result = self._queryToRW(rqstKey, rqstType, rqstDict)
+        if result is None or not isinstance(result[2], dict): return result
+        k, t, data = result
+        if VERSION_KEY not in data:
+            Log.info("Real-world emulator does not support the versioned GET.")
+            self.condGet = self.subscribed = False
+            return result
+        with self._stateLock:
+            version = data.pop(VERSION_KEY)
+            if self.stateVersion is None: self.stateCache.clear()
+            self.stateCache.update(data)
+            self.stateVersion, self._needSync = version, False
+            self.inputVersion = version
+            self._lastCheckT = time.monotonic()
+            return (k, t, dict(self.stateCache))
+
 #-----------------------------------------------------------------------------
-    def changeRWCoil(self, rqstType='signals', coilDict={}):
-        """ Send the current plc coils state to the Real-world emulator."""
+    def changeRWCoil(self, rqstType='signals', coilDict={}, wait=True):
+        """ Send the current plc coils state to the Real-world emulator. If wait is False 
+            and the connector is pipelined, the request is sent without waiting the reply
+            (the reply is handled during the next request), if the request failed after 
+            all the tries, the postFailed flag will be set.
+        """
         rqstKey = 'POST'
         print(coilDict)
         if isinstance(coilDict, dict):
+            if not wait and self.hub:
+                return self.hub.query(self, rqstKey, rqstType, coilDict, wait=False)
+            if not wait and self.pipeline:
+                return self.rwConnector.submit(self._buildRqst(rqstKey, rqstType, coilDict),
+                                               callback=self._postCallback)
             return self._queryToRW(rqstKey, rqstType, coilDict)
         else:
             Log.warning("changeRWCoil(): passed in input parm needs to be a dict() type.get %s" %str(coilDict))
             return None
 
+#-----------------------------------------------------------------------------
+    def exchangeRW(self, fetchType='input', inputDict={}, postType='signals', coilDict={}):
+        """ Send the coils state and fetch the sensors state in one exchange request. If
+            the exchange is not enabled, the coils setting request and the fetch request 
+            are sent separately (the pipelined/hub connector sends the coils setting 
+            without waiting the reply).
+            Returns: (key, fetchType, inputResultDict), None if failed.
+        """
+        self.inputVersion = None
+        if not (isinstance(inputDict, dict) and isinstance(coilDict, dict)):
+            Log.warning("exchangeRW(): passed in input parm needs to be a dict() type.")
+            return None
+        if not coilDict: return self.fetchRWInputData(rqstType=fetchType, inputDict=inputDict)
+        if not self.isExchangeEnabled():
+            if self.changeRWCoil(rqstType=postType, coilDict=coilDict, 
+                                 wait=not (self.pipeline or self.hub)) is None: return None
+            return self.fetchRWInputData(rqstType=fetchType, inputDict=inputDict)
+        rqstDict = {'post': [postType, coilDict], 'fetch': [fetchType, inputDict]}
+        result = self._queryToRW('POST', EXCHANGE_TYPE, rqstDict)
+        if result is None: return None
+        if not (isinstance(result[2], dict) and isinstance(result[2].get('fetch'), dict)):
+            Log.warning("exchangeRW(): the exchange reply is invalid: %s" %str(result))
+            return None
+        return (result[0], fetchType, result[2]['fetch'])
+
+#-----------------------------------------------------------------------------
+    def _buildRqst(self, rqstKey, rqstType, rqstDict):
+        """ Build the request bytes, binary frame if the codec has the schema else text."""
+        rqst = self.binCodec.encodeMsg(rqstKey, rqstType, rqstDict)
+        if rqst is None: rqst = ';'.join((rqstKey, rqstType, json.dumps(rqstDict))).encode('UTF-8')
+        return rqst
+
+    def _parseReply(self, resp, rqstType):
+        """ Parse the reply bytes to (key, type, result), return None if invalid."""
+        if self.binCodec.isBinMsg(resp):
+            reply = self.binCodec.decodeMsg(resp)
+            if reply is None: return None
+            k, t, result = reply
+        else:
+            #gv.gDebugPrint('===> resp:%s' %str(resp), logType=gv.LOG_INFO)
+            k, t, data = parseIncomeMsg(resp)
+            try:
+                result = json.loads(data)
+            except Exception as err:
+                Log.exception('Exception: %s' %str(err))
+                return None
+        if k != 'REP': Log.warning('The msg reply key %s is invalid' % k)
+        if t != rqstType: Log.warning('The reply type do not match : %s' %str((rqstType, t)))
+        self.lastUpdateT = datetime.now()
+        return (k, t, result)
+
+    def _postCallback(self, seq, resp):
+        if resp is None:
+            Log.warning("The coils setting request %s is not replied." %str(seq))
+            self.postFailed = True
+
+    def popPostFailed(self):
+        """ Return and clear the pipelined coils setting request failed flag."""
+        failed, self.postFailed = self.postFailed, False
+        return failed
+
 #-----------------------------------------------------------------------------
     def _queryToRW(self, rqstKey, rqstType, rqstDict, response=True):
         """ Query message send to Real-world emulator app.
@@ -160,38 +473,241 @@ class RealWorldConnector(object):
                 rqstKey (str): request key (GET/POST/REP)
                 rqstType (str): request type string.
                 rqstDict (dict): request detail dictionary.
-                dataOnly (bool, optional): flag to identify whether only return the 
-                    data. Defaults to True. return (responseKey, responseType, responseJson) if set
-                    to False.
+                response (bool, optional): wait for the response. Defaults to True.
             Returns:
                 tuple: (key, type, result) or None if lose connection.
         """
-        k = t = result = None
-        if rqstKey and rqstType and rqstDict:
-            rqst = ';'.join((rqstKey, rqstType, json.dumps(rqstDict)))
-            if self.rwConnector:
-                resp = self.rwConnector.sendMsg(rqst, resp=response)
-                if resp:
-                    #gv.gDebugPrint('===> resp:%s' %str(resp), logType=gv.LOG_INFO)
-                    k, t, data = parseIncomeMsg(resp)
-                    if k != 'REP': Log.warning('The msg reply key %s is invalid' % k)
-                    if t != rqstType: Log.warning('The reply type do not match : %s' %str((rqstType, t)))
-                    try:
-                        result = json.loads(data)
-                        self.lastUpdateT = datetime.now()
-                    except Exception as err:
-                        Log.exception('Exception: %s' %str(err))
-                        return None
-                else:
-                    Log.warning("Lost connection to the server.")
-                    self.realworldOnline = False
-                    return None
+        if not (rqstKey and rqstType and rqstDict):
+            Log.error("queryBE: input missing: %s" %str((rqstKey, rqstType, rqstDict)))
+            return (None, None, None)
+        if self.shmClient: return self._shmQuery(rqstKey, rqstType, rqstDict)
+        if self.hub:
+            result = self.hub.query(self, rqstKey, rqstType, rqstDict)
+            if result is None:
+                Log.warning("Lost connection to the server.")
+                self.realworldOnline = False
+            return result
+        if not self.rwConnector: return (None, None, None)
+        rqst = self._buildRqst(rqstKey, rqstType, rqstDict)
+        # the login with the codec schemas may be bigger than the UDP buffer.
+        if len(rqst) < self.rwConnector.bufferSize:
+            resp = self.rwConnector.sendMsg(rqst, resp=response)
         else:
-            Log.error("queryBE: input missing: %s" %str(rqstKey, rqstType, rqstDict))
-        return (k, t, result)
+            resp = self.rwConnector.sendChunk(rqst, resp=response)
+        if not resp:
+            Log.warning("Lost connection to the server.")
+            self.realworldOnline = False
+            return None
+        return self._parseReply(resp, rqstType)
+
+    def _shmQuery(self, rqstKey, rqstType, rqstDict):
+        """ Serve the request with the shared memory channels: login attaches the input
+            channel, GET reads the sensors state and POST writes the coils state.
+        """
+        if rqstType == 'login':
+            result = {'state': 'ready'} if self.shmClient.connect() else None
+        elif rqstKey == 'GET':
+            result = self.shmClient.fetch([key for key in rqstDict.keys() if key != SINCE_KEY])
+            self.inputVersion = self.shmClient.inputSeq
+        elif rqstKey == 'POST':
+            result = {} if self.shmClient.postCoils(rqstDict) is not None else None
+        else:
+            result = None
+        if result is None:
+            Log.warning("Lost connection to the Real-world shared memory.")
+            self.realworldOnline = False
+            return None
+        self.lastUpdateT = datetime.now()
+        return ('REP', rqstType, result)
+
+    def stop(self):
+        if self.hub: self.hub.unregister(self)
+        if self._listener:
+            listener, self._listener = self._listener, None
+            listener.close()
+        if self.shmClient: self.shmClient.close()
+        if self.rwConnector: self.rwConnector.disconnect()
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class RealWorldConnectorHub(object):
+    """ One UDP socket (udpCom.pipeClient) shared by the RealWorldConnectors of many 
+        PLC/RTU interfaces in the same process. The connectors' requests are queued to
+        the hub thread, the GET requests queued in the same tick (all the registered 
+        connectors queued one or the batchWait time passed) are sent in one datagram:
+            'GET;batch;[[<plcID>, <type>, {request}], ...]'
+        the emulator replies the results in the request sequence:
+            'REP;batch;[[<plcID>, <type>, {result}], ...]'
+        The batch is offered in the login request ("batch": true) and used after the 
+        emulator accepted it in the login reply, the other requests (login, POST, the 
+        binary codec requests) are sent one by one over the same socket and the replies 
+        are demultiplexed by the request sequence ID.
+    """
+    def __init__(self, address, batchWait=HUB_BATCH_WAIT, timeout=udpCom.PIPE_TIMEOUT):
+        """ Init example: 
+                hub = RealWorldConnectorHub(('127.0.0.1', 3001))
+                plc = plcSimuInterface(None, 'PLC-01', addressInfoDict, ladder, hub=hub)
+            Args:
+                address (tuple): Real-world emulator UDP (ip, port).
+                batchWait (float, optional): max time (sec) to wait the other connectors'
+                    GET requests of the same tick. Defaults to 0.005.
+                timeout (float, optional): request first try time out (sec).
+        """
+        self.address = address
+        self.batchWait = batchWait
+        self.client = udpCom.pipeClient(address, timeout=timeout)
+        self.batchEnabled = False
+        self.connectors = {}    # plcID -> RealWorldConnector
+        self._pending = []      # queued requests, see _queue()
+        self._firstT = None     # queue time of the first pending request.
+        self._cond = threading.Condition()
+        self.stats = {'batches': 0, 'batched': 0, 'single': 0, 'failed': 0}
+        self.terminate = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    #-----------------------------------------------------------------------------
+    def register(self, connector):
+        with self._cond:
+            self.connectors[connector.plcID] = connector
+
+    def unregister(self, connector):
+        with self._cond:
+            if self.connectors.get(connector.plcID) is connector: 
+                self.connectors.pop(connector.plcID)
+
+    def setBatchEnabled(self, loginReply):
+        """ Enable the batched GET if the emulator accepted it in the login reply."""
+        flag = isinstance(loginReply, dict) and bool(loginReply.get('batch'))
+        if flag != self.batchEnabled: 
+            Log.info("Real-world emulator batched GET: %s" %str(flag))
+        self.batchEnabled = flag
+
+    #-----------------------------------------------------------------------------
+    def query(self, connector, rqstKey, rqstType, rqstDict, wait=True):
+        """ Queue one request of the connector to the hub thread.
+            Returns: (key, type, result) or None if failed, if wait is False, return True 
+                without waiting (the connector's postFailed flag is set if failed).
+        """
+        if self.terminate: return None if wait else True
+        entry = self._queue(connector, rqstKey, rqstType, rqstDict, wait=wait)
+        if not wait: return True
+        entry[4].wait()
+        return entry[5]
+
+    def _queue(self, connector, rqstKey, rqstType, rqstDict, wait=True):
+        # entry: [connector, rqstKey, rqstType, rqstDict, done event, result, wait]
+        entry = [connector, rqstKey, rqstType, rqstDict, threading.Event(), None, wait]
+        with self._cond:
+            if not self._pending: self._firstT = time.monotonic()
+            self._pending.append(entry)
+            self._cond.notify()
+        return entry
+
+    def _finish(self, entry, result):
+        entry[5] = result
+        if result is None: 
+            self.stats['failed'] += 1
+            if not entry[6]: entry[0]._postCallback(None, None)
+        entry[4].set()
+
+    #-----------------------------------------------------------------------------
+    def _batchDue(self):
+        """ The pending requests are sent when all the registered connectors queued a 
+            request or the batchWait time passed.
+        """
+        if not self._pending: return False
+        if time.monotonic() - self._firstT >= self.batchWait: return True
+        return len(set(entry[0].plcID for entry in self._pending)) >= len(self.connectors)
+
+    def _run(self):
+        """ Hub thread: send the due requests and handle the replies."""
+        while not self.terminate:
+            with self._cond:
+                if not (self._pending or self.client.getInflightNum()):
+                    self._cond.wait(HUB_IDLE_WAIT)
+                entryList = []
+                if self._batchDue(): entryList, self._pending = self._pending, []
+            if entryList: self._send(entryList)
+            busy = self.client.getInflightNum() or self._pending
+            self.client.poll(HUB_POLL_INT if busy else 0)
+        # release the connectors still waiting.
+        with self._cond: 
+            entryList, self._pending = self._pending, []
+        for entry in entryList: self._finish(entry, None)
+
+    def _send(self, entryList):
+        batchList = []
+        for entry in entryList:
+            connector, rqstKey, rqstType, rqstDict = entry[:4]
+            if (self.batchEnabled and rqstKey == 'GET' and rqstType != 'login' 
+                    and not connector.binCodec.isEnabled()):
+                batchList.append(entry)
+            else:
+                self._sendSingle(entry)
+        # split the batch to fit the socket buffer.
+        msgSz, batch = 0, []
+        for entry in batchList:
+            item = json.dumps([entry[0].plcID, entry[2], entry[3]])
+            if len(item) + 2 >= self.client.bufferSize - HUB_HEADER_SZ:
+                self._sendSingle(entry) # too big for a batch, send with the chunk transfer.
+                continue
+            if batch and msgSz + len(item) + 2 >= self.client.bufferSize - HUB_HEADER_SZ:
+                self._sendBatch(batch)
+                msgSz, batch = 0, []
+            batch.append((entry, item))
+            msgSz += len(item) + 2
+        if batch: self._sendBatch(batch)
+
+    def _sendSingle(self, entry):
+        connector, rqstKey, rqstType, rqstDict = entry[:4]
+        rqst = connector._buildRqst(rqstKey, rqstType, rqstDict)
+        self.stats['single'] += 1
+        if len(rqst) < self.client.bufferSize:
+            def onReply(seq, resp):
+                self._finish(entry, connector._parseReply(resp, rqstType) if resp else None)
+            if self.client.submit(rqst, callback=onReply) is None: self._finish(entry, None)
+        else:
+            # the login with the codec schemas may be bigger than the UDP buffer.
+            resp = self.client.sendChunk(rqst, resp=True)
+            self._finish(entry, connector._parseReply(resp, rqstType) if resp else None)
+
+    def _sendBatch(self, batch):
+        rqst = 'GET;batch;[%s]' % ', '.join(item for _, item in batch)
+        def onReply(seq, resp):
+            results = None
+            if resp:
+                k, t, data = parseIncomeMsg(resp)
+                try:
+                    results = json.loads(data) if k == 'REP' and t == 'batch' else None
+                except Exception as err:
+                    Log.warning("The batch reply is invalid: %s" %str(err))
+            if not isinstance(results, list) or len(results) != len(batch): results = [None] * len(batch)
+            for (entry, _), result in zip(batch, results):
+                # result: [plcID, type, {result}] or null if the emulator failed it.
+                valid = (isinstance(result, list) and len(result) == 3 and 
+                         result[0] == entry[0].plcID and isinstance(result[2], dict))
+                self._finish(entry, ('REP', result[1], result[2]) if valid else None)
+        self.stats['batches'] += 1
+        self.stats['batched'] += len(batch)
+        if self.client.submit(rqst, callback=onReply) is None: onReply(None, None)
+
+    #-----------------------------------------------------------------------------
+    def getStats(self):
+        """ Return the hub statistics (batch number, batched/single/failed requests)
+            with the socket's pipelined requests statistics.
+        """
+        stats = dict(self.stats)
+        stats.update({'pipe_%s' % key: val for key, val in self.client.getStats().items()})
+        return stats
 
     def stop(self):
-        self.rwConnector.disconnect()
+        """ Stop the hub thread and close the socket."""
+        if self.terminate: return
+        self.terminate = True
+        with self._cond: self._cond.notify()
+        self._thread.join()
+        self.client.disconnect()
 
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
@@ -219,6 +735,7 @@ class s7CommService(threading.Thread):
         else:
             self.server = snap7Comm.s7commServer(hostIp=self.hostIp, hostPort=self.hostPort)
         self.ladderHandler = None 
+        self.writeDispatcher = None # DB write handlers dispatch table.
 
 #-----------------------------------------------------------------------------
     def getHostAddress(self):
@@ -234,7 +751,11 @@ class s7CommService(threading.Thread):
     def run(self):
         """ Start the udp server's main message handling loop."""
         Log.info("S7comm service thread run() start.")
-        self.server.startService(eventHandlerFun=self.ladderHandler)
+        eventHandler = self.ladderHandler
+        if self.writeDispatcher:
+            self.writeDispatcher.start()
+            eventHandler = self._handleWrite
+        self.server.startService(eventHandlerFun=eventHandler)
         Log.info("S7comm service thread run() end.")
         self.threadName = None # set the thread name to None when finished.
 
@@ -242,8 +763,21 @@ class s7CommService(threading.Thread):
     def setLadderHandler(self, ladderHandler):
         self.ladderHandler = ladderHandler
 
+    def addWriteHandler(self, handlerFun, dbNumber=None, byteRange=None):
+        """ Register the DB write handler called with the merged dirty ranges list
+            [(address, dataIdx, writeLen), ...], need to be called before the service
+            start. Refer to snap7Comm.s7WriteDispatcher.addHandler().
+        """
+        if self.writeDispatcher is None: self.writeDispatcher = snap7Comm.s7WriteDispatcher()
+        return self.writeDispatcher.addHandler(handlerFun, dbNumber=dbNumber, byteRange=byteRange)
+
+    def _handleWrite(self, writeInfo):
+        if self.ladderHandler: self.ladderHandler(writeInfo)
+        self.writeDispatcher.dispatch(writeInfo)
+
     def stop(self):
         self.server.stopServer()
+        if self.writeDispatcher: self.writeDispatcher.stop()
 
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
@@ -255,23 +789,37 @@ class rtuSimuInterface(object):
             the output coils state based on the ladder logic. 
         - Send the signal setup request to the real world emulator to change the signal.
     """
-    def __init__(self, parent, rtuID, addressInfoDict, dllPath=None, updateInt=0.5):
+    def __init__(self, parent, rtuID, addressInfoDict, dllPath=None, updateInt=0.5, binCodec=False,
+                 pipeline=False, subscribe=False, hub=None):
         """ init example:
             addressInfoDict = {
                 'hostaddress': gv.gS7serverIP,
                 'realworld':gv.gRealWorldIP, 
+                'rwtransport': 'udp',   # optional: 'shm' to use the shared memory transport.
+                'rwshmname': 'rwEmulator',  # optional: emulator shared memory name prefix.
             }
             rtu = rtuSimuInterface(None, gv.RTU_NAME, addressInfoDict, 
                     dllPath=gv.gS7snapDllPath, updateInt=gv.gInterval)
+            hub (RealWorldConnectorHub, optional): connector hub shared by the RTUs in
+                the same process.
         """
         self.parent = parent
         self.rtuID = rtuID
         self.regsStateRW = OrderedDict()
-        self.updateInt = updateInt
+        self.updateInt = updateInt  # RTU scan cycle period (sec).
+        self.scanEngine = scanCycle.scanCycleEngine(period=self.updateInt)
+        self._lastInput = None      # last applied sensors state and its version.
+        self._inputVersion = None
         # Init the UDP connector to connect to the realworld and test the connection.
         self.regSRWfetchKey = None 
         self.realworldAddr = addressInfoDict['realworld'] if 'realworld' in addressInfoDict.keys() else ('127.0.0.1', DEF_RW_PORT)
-        self.rwConnector = RealWorldConnector(self, self.realworldAddr)
+        # Real-world transport: 'udp' or 'shm' (emulator on the same host, see rwShmBridge.py)
+        self.rwTransport = addressInfoDict.get('rwtransport', TRANSPORT_UDP)
+        self.rwShmName = addressInfoDict.get('rwshmname', DEF_SHM_NAME)
+        self.rwConnector = RealWorldConnector(self, self.realworldAddr, pipeline=pipeline, 
+                                              timeout=min(udpCom.PIPE_TIMEOUT, self.updateInt),
+                                              transport=self.rwTransport, shmName=self.rwShmName,
+                                              hub=hub)
         self._initRealWorldConnectionParm()
         # Init the S7Comm TCP service
         self.s7commAddr = addressInfoDict['hostaddress'] if 'hostaddress' in addressInfoDict.keys() else ('127.0.0.1', DEF_S7_PORT)
@@ -283,6 +831,10 @@ class rtuSimuInterface(object):
         self._initMemoryAddrs()
         self._initMemoryDefaultVals()
         self._initLadderHandler()
+        # negotiate the binary codec after the memory (regsStateRW) init.
+        if binCodec: self.rwConnector.negotiateCodec(self._getCodecSchemas())
+        if subscribe and self.regSRWfetchKey and self.regsStateRW:
+            self.rwConnector.subscribe(self.regSRWfetchKey, list(self.regsStateRW.keys()))
 
         self.s7Service.start()
         self.terminate = False
@@ -320,6 +872,8 @@ class rtuSimuInterface(object):
         #def handlerS7request(parmList):
         #    print(parmList)
         #self.s7Service.setLadderHandler(handlerS7request)
+        # or register the handler per DB, called with the dirty ranges of one tick:
+        #self.s7Service.addWriteHandler(handlerTrainDb, dbNumber=1)
         pass
 
     def _updateMemory(self, result):
@@ -331,12 +885,18 @@ class rtuSimuInterface(object):
         # for key, value in self.regsStateRW.items():
         #     for idx, rstData in enumerate(result[key]):
         #         memoryIdx = value[idx]
-        #         s7commServer.setMemoryVal(memoryIdx, 0, rstData[0])
-        #         s7commServer.setMemoryVal(memoryIdx, 2, rstData[1])
-        #         s7commServer.setMemoryVal(memoryIdx, 4, rstData[2])
-        #         s7commServer.setMemoryVal(memoryIdx, 6, rstData[3])
+        #         s7commServer.setMemoryBlock(memoryIdx, rstData[:4]) # bool, int, int, int
         pass
 
+    def _getCodecSchemas(self):
+        """ Build the binary codec request layouts offered in the login: the sensors
+            fetch request keys.
+        """
+        schemas = OrderedDict()
+        if self.regSRWfetchKey and self.regsStateRW:
+            schemas[rwBinCodec.schemaName('GET', self.regSRWfetchKey)] = rwBinCodec.inferFields(self.regsStateRW, keyOnly=True)
+        return schemas
+
 #-----------------------------------------------------------------------------
     def getID(self):
         return self.rtuID
@@ -358,20 +918,34 @@ class rtuSimuInterface(object):
         sensorInfo = self.getRWInputInfo()
         if sensorInfo is None: return
         (_, _, result) = sensorInfo
-        time.sleep(0.1)
+        # skip the memory update if the sensors state didn't change (same state version, 
+        # or same values if the connector has no version).
+        inputVersion = self.rwConnector.getInputVersion()
+        if self._lastInput is not None and (result == self._lastInput if inputVersion is None 
+                                            else inputVersion == self._inputVersion):
+            self.scanEngine.markUnchanged()
+            return
+        self._lastInput, self._inputVersion = result, inputVersion
         self._updateMemory(result)
-        
+
+#-----------------------------------------------------------------------------
+    def getScanStats(self):
+        """ Return the scan cycle statistics (executed/skipped/overrun cycles, jitter),
+            the 'unchanged' cycles skipped the memory update.
+        """
+        return self.scanEngine.getStats()
+
 #-----------------------------------------------------------------------------
     def run(self):
+        """ Run the RTU scan cycle every updateInt sec on the monotonic clock deadline."""
         while not self.terminate:
-            now = time.time()
             if self.rwConnector.isRealWorldOnline():
-                self.periodic(now)
-                time.sleep(0.6)
+                self.scanEngine.runCycle(self.periodic)
             else:
                 self.rwConnector.reConnectRW()
                 time.sleep(1)
-            time.sleep(self.updateInt)
+                self.scanEngine.reset()
+                self._lastInput = None  # update the memory after reconnection.
         self.s7Service.stop()
 
 #-----------------------------------------------------------------------------
@@ -0,0 +1,279 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        rwBinCodec.py
+#
+# Purpose:     This lib module will provide a compact binary message codec for the
+#              PLC/RTU simulator <=> Real-world emulator UDP protocol. The message
+#              key layout is negotiated once at login, then every request/reply is
+#              a fixed struct payload indexed by the field position.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/06/26
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    The text protocol message is 'GET;<type>;{json}', every cycle pays the json dumps/
+    loads, the utf-8 encode/decode and repeats all the key names. The binary codec
+    replaces it with a schema table negotiated in the login request:
+
+    1. The PLC/RTU login request adds the codec offer and the request layouts it knows:
+        GET;login;{"plcID": "PLC-01", "codec": "bin1",
+                   "schemas": {"GET;input": [["weline", "n", []], ...],
+                               "POST;signals": [["weline", "?", [4]], ...]}}
+    2. The Real-world emulator adds its reply layouts and returns the whole schema table
+        (the schema ID is the index in the table), the binary codec is used only if
+        the reply contains the "codec": "bin1":
+        REP;login;{"state": "ready", "codec": "bin1",
+                   "schemas": [["GET;input", [...]], ["REP;input", [...]], ...]}
+    3. After login, a message with a schema is sent as the binary frame:
+        | magic 0xB1 (1B) | msg key (1B) | schema ID (2B) | fields bitmap | values |
+        The bitmap marks the fields in the message (a partial dict such as the changed
+        coil groups only), the values of the marked fields are packed by one precompiled
+        little-endian struct in the field position sequence.
+    4. A message without schema or whose values don't fit the schema is sent as text,
+        the receiver checks the first byte to select the decoder (text never starts
+        with 0xB1), so the text format is always the fallback. The Real-world emulator
+        needs to keep the negotiated codec per client and reply a text request in text.
+
+    Field layout: [key, type, shape], type: 'n' (no value, request key only), '?' bool,
+    'h' int16, 'i' int32, 'f' float32, 'd' float64. shape: [] scalar, [4] list, [4, 3]
+    nested list.
+
+    Usage:
+        codec = rwBinCodec()
+        codec.loadTable(table)
+        data = codec.encodeMsg('GET', 'input', {'weline': None})  # None if no schema.
+        if codec.isBinMsg(reply): k, t, result = codec.decodeMsg(reply)
+"""
+
+import struct
+from math import prod
+from itertools import chain
+from collections import OrderedDict
+
+CODEC_NAME = 'bin1'     # codec name used in the login negotiation.
+BIN_MAGIC = 0xB1        # first byte of the binary frame.
+HEADER = struct.Struct('<BBH')  # magic, msg key code, schema ID.
+MSG_KEYS = {'GET': 1, 'POST': 2, 'REP': 3}
+MSG_CODES = {code: key for key, code in MSG_KEYS.items()}
+FIELD_TYPES = ('n', '?', 'h', 'i', 'f', 'd')
+MAX_SCHEMAS = 0xFFFF
+
+#-----------------------------------------------------------------------------
+def schemaName(rqstKey, rqstType):
+    """ Return the schema table name of the message: '<key>;<type>'."""
+    return '%s;%s' % (rqstKey, rqstType)
+
+def inferFields(dataDict, keyOnly=False):
+    """ Build the field layout list [[key, type, shape], ...] from a sample data dict.
+        Args:
+            dataDict (dict): sample message data dict {key: value/list/nested list}.
+            keyOnly (bool, optional): build the request key only ('n') layout. Defaults to False.
+        Returns:
+            list: field layout list, None if a value type is not supported.
+    """
+    fields = []
+    for key, val in dataDict.items():
+        if keyOnly:
+            fields.append([str(key), 'n', []])
+            continue
+        shape, items = [], [val]
+        while isinstance(items[0], (list, tuple)):
+            if not items[0]: return None
+            shape.append(len(items[0]))
+            if any(not isinstance(item, (list, tuple)) or len(item) != shape[-1] for item in items):
+                return None
+            items = [sub for item in items for sub in item]
+        # a mixed bool/number list (such as a RTU memory row) is promoted to number.
+        if all(isinstance(item, bool) for item in items):
+            fieldType = '?'
+        elif all(isinstance(item, int) for item in items):
+            fieldType = 'h' if all(-0x8000 <= item < 0x8000 for item in items) else 'i'
+        elif all(isinstance(item, (int, float)) for item in items):
+            fieldType = 'd'
+        else:
+            return None
+        fields.append([str(key), fieldType, shape])
+    return fields
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwSchema(object):
+    """ One message layout: the fields' key, type and shape compiled to the struct
+        packers of the present fields (cached by the fields bitmap).
+    """
+    def __init__(self, name, fields) -> None:
+        self.name = name
+        self.fields = []    # [(key, type, shape, value count)]
+        self.keyIdx = {}    # key -> field position.
+        self.valid = self._compile(fields)
+        self.maskLen = (len(self.fields) + 7) // 8
+        self._packers = {}  # fields bitmap -> (struct packer, present fields list)
+
+    def _compile(self, fields):
+        try:
+            for key, fieldType, shape in fields:
+                shape = tuple(int(dim) for dim in shape)
+                if fieldType not in FIELD_TYPES or any(dim < 1 for dim in shape) or key in self.keyIdx:
+                    raise ValueError('field %s layout invalid' % str(key))
+                self.keyIdx[key] = len(self.fields)
+                count = 0 if fieldType == 'n' else prod(shape)
+                self.fields.append((key, fieldType, shape, count))
+        except Exception as err:
+            print("Error: rwSchema() %s fields invalid: %s" % (self.name, str(err)))
+            return False
+        return True
+
+    def _getPacker(self, mask):
+        """ Return the (struct packer, present fields, list fields slices) of the fields
+            bitmap, the slices are set only if all the present fields are 1D lists (the
+            common sensors/coils layout) to use the fast encode/decode path.
+        """
+        if mask not in self._packers:
+            fmt, present, slices, pos = ['<'], [], [], 0
+            for idx, field in enumerate(self.fields):
+                if not mask >> idx & 1: continue
+                present.append(field)
+                if field[3]: fmt.append('%d%s' % (field[3], field[1]))
+                slices.append(slice(pos, pos + field[3]))
+                pos += field[3]
+            isFlat = all(len(field[2]) == 1 and field[3] for field in present)
+            keys = tuple(field[0] for field in present)
+            # same length lists can be grouped by zip() without slicing.
+            sameLen = present[0][3] if present and all(field[3] == present[0][3] for field in present) else 0
+            self._packers[mask] = (struct.Struct(''.join(fmt)), present, (keys, slices, sameLen) if isFlat else None)
+        return self._packers[mask]
+
+    def getMaxSize(self):
+        """ Return the bitmap + values size of the message with all the fields."""
+        return self.maskLen + self._getPacker((1 << len(self.fields)) - 1)[0].size
+
+    #-----------------------------------------------------------------------------
+    def encode(self, dataDict):
+        """ Encode the data dict (all the keys need to be in the schema) to the bitmap +
+            values bytes, raise ValueError/struct.error if the data doesn't fit the schema.
+        """
+        mask, keyIdx = 0, self.keyIdx
+        for key in dataDict:
+            mask |= 1 << keyIdx[key]
+        packer, present, flatInfo = self._getPacker(mask)
+        if flatInfo:
+            # the values number mismatch will raise the struct.error in pack().
+            values = list(chain.from_iterable(map(dataDict.__getitem__, flatInfo[0])))
+            return mask.to_bytes(self.maskLen, 'little') + packer.pack(*values)
+        values = []
+        for key, fieldType, shape, count in present:
+            if not count: continue
+            val = dataDict[key]
+            for _ in shape: val = [sub for item in val for sub in item] if isinstance(val[0], (list, tuple)) else val
+            if len(shape) and len(val) != count: raise ValueError('field %s size invalid' % key)
+            values.extend(val if shape else (val,))
+        return mask.to_bytes(self.maskLen, 'little') + packer.pack(*values)
+
+    def decode(self, data, offset=0):
+        """ Decode the bitmap + values bytes to the data dict."""
+        mask = int.from_bytes(data[offset:offset + self.maskLen], 'little')
+        packer, present, flatInfo = self._getPacker(mask)
+        if not packer.size: return dict.fromkeys(field[0] for field in present) # request keys only.
+        values = packer.unpack_from(data, offset + self.maskLen)
+        if flatInfo:
+            keys, slices, sameLen = flatInfo
+            if sameLen: return dict(zip(keys, map(list, zip(*[iter(values)] * sameLen))))
+            return dict(zip(keys, map(list, map(values.__getitem__, slices))))
+        result, pos = OrderedDict(), 0
+        for key, fieldType, shape, count in present:
+            if not count:
+                result[key] = None
+                continue
+            val = values[pos:pos + count]
+            pos += count
+            if not shape:
+                result[key] = val[0]
+                continue
+            val = list(val)
+            for dim in reversed(shape[1:]):
+                val = [val[idx:idx + dim] for idx in range(0, len(val), dim)]
+            result[key] = val
+        return result
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class rwBinCodec(object):
+    """ The negotiated schema table and the binary message encoder/decoder."""
+
+    def __init__(self) -> None:
+        self.schemaList = []    # schema ID -> rwSchema
+        self.schemaIDs = {}     # schema name -> schema ID
+        self.enabled = False
+
+    #-----------------------------------------------------------------------------
+    def buildTable(self, schemaDict):
+        """ Build the schema table list [[name, fields], ...] from the schemas dict
+            {name: fields}, used by the Real-world emulator side to reply the login.
+        """
+        return [[name, fields] for name, fields in schemaDict.items()][:MAX_SCHEMAS]
+
+    def loadTable(self, table):
+        """ Load the negotiated schema table, return True if the binary codec is enabled."""
+        self.reset()
+        if not isinstance(table, (list, tuple)) or len(table) > MAX_SCHEMAS: return False
+        for item in table:
+            try:
+                name, fields = item
+            except Exception:
+                print("Error: loadTable() the schema table item is invalid: %s" % str(item))
+                self.reset()
+                return False
+            schema = rwSchema(str(name), fields)
+            if not schema.valid:
+                self.reset()
+                return False
+            self.schemaIDs[schema.name] = len(self.schemaList)
+            self.schemaList.append(schema)
+        self.enabled = True
+        return True
+
+    def reset(self):
+        """ Disable the binary codec (text format only)."""
+        self.schemaList, self.schemaIDs = [], {}
+        self.enabled = False
+
+    #-----------------------------------------------------------------------------
+    def encodeMsg(self, rqstKey, rqstType, dataDict):
+        """ Encode the message to the binary frame, return None if the codec is not
+            enabled, the message has no schema or the data doesn't fit the schema (the
+            caller needs to send the text message).
+        """
+        if not self.enabled or rqstKey not in MSG_KEYS: return None
+        schemaID = self.schemaIDs.get(schemaName(rqstKey, rqstType))
+        if schemaID is None: return None
+        try:
+            payload = self.schemaList[schemaID].encode(dataDict)
+        except (KeyError, ValueError, TypeError, IndexError, struct.error):
+            return None
+        return HEADER.pack(BIN_MAGIC, MSG_KEYS[rqstKey], schemaID) + payload
+
+    def isBinMsg(self, data):
+        return isinstance(data, (bytes, bytearray)) and len(data) >= HEADER.size and data[0] == BIN_MAGIC
+
+    def decodeMsg(self, data):
+        """ Decode the binary frame to (key, type, dataDict), return None if failed."""
+        try:
+            _, keyCode, schemaID = HEADER.unpack_from(data)
+            schema = self.schemaList[schemaID]
+            result = schema.decode(data, HEADER.size)
+        except Exception as err:
+            print("Error: decodeMsg() can not decode the binary message: %s" % str(err))
+            return None
+        return (MSG_CODES.get(keyCode), schema.name.split(';', 1)[1], result)
+
+    #-----------------------------------------------------------------------------
+    def isEnabled(self):
+        return self.enabled
+
+    def getSchemaNames(self):
+        return list(self.schemaIDs.keys())
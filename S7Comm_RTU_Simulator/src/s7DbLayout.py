@@ -0,0 +1,336 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        s7DbLayout.py
+#
+# Purpose:     This lib module will provide a declarative S7 data block (DB) layout
+#              compiler, the layout (value name => byte offset, bit, type) is compiled
+#              once to the struct codecs so a DB of any size can be read/written by
+#              the value name or byte offset, or decoded with one struct unpack.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/08
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    The DB layout is declared as a value list, each value has 4 parameters:
+        name (str): value name such as 'train1_speed'.
+        offset (int): byte offset in the DB.
+        type (str): S7 type (big-endian): 'BOOL', 'BYTE', 'USINT', 'SINT', 'CHAR',
+            'INT', 'UINT', 'WORD', 'DINT', 'UDINT', 'DWORD', 'REAL', 'LREAL', 'STRING'.
+        bit (int): bit index 0-7 of the 'BOOL' value. Defaults to 0.
+        length (int): max chars of the 'STRING' value (S7 string: max length byte +
+            actual length byte + chars). Defaults to 254.
+
+    The layout can be loaded from a dict, a list or a json file:
+        {'speed': {'offset': 0, 'type': 'REAL'}, 'running': {'offset': 4, 'type': 'BOOL', 'bit': 0}}
+        [{'name': 'speed', 'offset': 0, 'type': 'REAL'}, ...]
+
+    The s7DbLayout validates the layout (byte overlaps, BOOL values can share a byte
+    with the different bits) when it is created and compiles:
+        - one struct.Struct codec per value for the read/write by name or offset.
+        - one struct.Struct of all the number values (the gaps are padded) to decode
+            the whole DB bytes (such as one db_read reply) with one unpack.
+
+    Usage:
+        layout = s7DbLayout({'speed': {'offset': 0, 'type': 'REAL'}})
+        if layout.isValid():
+            dbData = bytearray(layout.getSize())
+            layout.setValue(dbData, 'speed', 1.5)
+            valDict = layout.unpack(dbData)
+"""
+
+import os
+import json
+import math
+import struct
+from operator import itemgetter
+from collections import OrderedDict
+
+# S7 type : struct format char (None: bit/string), bytes size.
+DB_TYPES = {
+    'BOOL': (None, 1),
+    'BYTE': ('B', 1),
+    'USINT': ('B', 1),
+    'SINT': ('b', 1),
+    'CHAR': ('c', 1),
+    'INT': ('h', 2),
+    'UINT': ('H', 2),
+    'WORD': ('H', 2),
+    'DINT': ('i', 4),
+    'UDINT': ('I', 4),
+    'DWORD': ('I', 4),
+    'REAL': ('f', 4),
+    'LREAL': ('d', 8),
+    'STRING': (None, 2),    # + max length.
+}
+STR_MAX_LEN = 254
+STR_CODE = 'latin-1'
+REAL_MAX = 3.4028234663852886e38
+
+#-----------------------------------------------------------------------------
+def intConverter(valType):
+    """ Return the function to convert a value (such as a float sensor value or a number
+        str) to the int of the S7 integer type, raise ValueError if out of the type range.
+    """
+    fmtChar, size = DB_TYPES[valType]
+    minVal, maxVal = (-(1 << (size * 8 - 1)), (1 << (size * 8 - 1)) - 1) if fmtChar.islower() \
+        else (0, (1 << (size * 8)) - 1)
+    def convert(val):
+        intVal = val if val.__class__ is int else int(float(val)) if isinstance(val, str) else int(val)
+        if minVal <= intVal <= maxVal: return intVal
+        raise ValueError("%d out of the %s range [%d, %d]" % (intVal, valType, minVal, maxVal))
+    return convert
+
+def realConverter(val):
+    """ Convert a value to the float of the S7 REAL (4 bytes float) type, raise ValueError
+        if the finite value is out of the float range (the struct can not pack it).
+    """
+    floatVal = float(val)
+    if abs(floatVal) <= REAL_MAX or not math.isfinite(floatVal): return floatVal
+    raise ValueError("%s out of the REAL range" % str(floatVal))
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class s7DbLayout(object):
+    """ Compile a DB layout config to the struct codecs, details refer to the < Program
+        Design > part.
+    """
+    def __init__(self, layoutConfig, size=None) -> None:
+        """ Init example: layout = s7DbLayout('lineDb.json')
+            Args:
+                layoutConfig (dict/list/str): layout dict, value list or json file path.
+                size (int, optional): DB bytes size, Defaults to None use the end of
+                    the last value.
+        """
+        self.values = OrderedDict()     # value name -> value info dict, sorted by offset.
+        self.size = 0
+        self._offsetIdx = {}    # byte offset -> the first value name at the offset.
+        self._codecs = {}       # value name -> (kind, offset, codec, convert), see _compileValue()
+        self._keyCodecs = {}    # value name and byte offset -> codec, one lookup per access.
+        self._blockGetters = None   # (values list, values dict) -> block struct values.
+        self._bitItems = []     # (values list index, value name, codec) of the _bitNames.
+        self._blockConverts = []    # convert functions of the block struct values.
+        self._blockCodec = None # struct of all the number values in the DB.
+        self._blockNames = []   # value names in the block struct sequence.
+        self._bitNames = []     # BOOL/STRING/CHAR value names decoded after the block.
+        self.valid = self._compile(self._loadConfig(layoutConfig), size)
+
+    #-----------------------------------------------------------------------------
+    def _loadConfig(self, layoutConfig):
+        """ Load the layout config from the dict, list or json file to a value list."""
+        if isinstance(layoutConfig, str):
+            if not os.path.exists(layoutConfig):
+                print("Error: _loadConfig() layout file not exist: %s" % layoutConfig)
+                return None
+            try:
+                with open(layoutConfig, 'r') as fh:
+                    layoutConfig = json.load(fh)
+            except Exception as err:
+                print("Error: _loadConfig() can not load the layout file: %s" % str(err))
+                return None
+        if isinstance(layoutConfig, dict):
+            valList = []
+            for name, valInfo in layoutConfig.items():
+                val = dict(valInfo)
+                val['name'] = name
+                valList.append(val)
+            return valList
+        if isinstance(layoutConfig, (list, tuple)): return list(layoutConfig)
+        print("Error: _loadConfig() layout config needs to be a dict, list or file path.")
+        return None
+
+    #-----------------------------------------------------------------------------
+    def _compile(self, valList, size):
+        """ Validate the value list and compile the codecs, return True if valid."""
+        if not valList: return False
+        vals = []
+        for val in valList:
+            try:
+                name = str(val['name'])
+                offset, valType = int(val['offset']), str(val.get('type', 'INT')).upper()
+                bit = int(val.get('bit', 0))
+                length = int(val.get('length', STR_MAX_LEN))
+            except Exception as err:
+                print("Error: _compile() value config invalid %s: %s" % (str(val), str(err)))
+                return False
+            if name in self.values or offset < 0 or valType not in DB_TYPES \
+                    or not 0 <= bit <= 7 or not 0 < length <= STR_MAX_LEN:
+                print("Error: _compile() value %s duplicated or offset/type/bit/length invalid." % name)
+                return False
+            valSize = DB_TYPES[valType][1] + (length if valType == 'STRING' else 0)
+            valInfo = {'name': name, 'offset': offset, 'type': valType, 'bit': bit,
+                       'length': length, 'size': valSize}
+            self.values[name] = valInfo
+            vals.append(valInfo)
+        vals.sort(key=lambda v: (v['offset'], v['bit']))
+        # check the byte overlap, the BOOL values in one byte need different bits.
+        for prev, val in zip(vals, vals[1:]):
+            if val['offset'] >= prev['offset'] + prev['size']: continue
+            if prev['type'] == val['type'] == 'BOOL' and prev['offset'] == val['offset'] \
+                    and prev['bit'] != val['bit']: continue
+            print("Error: _compile() value %s [%d, %d) overlaps with value %s [%d, %d)." % (
+                val['name'], val['offset'], val['offset'] + val['size'],
+                prev['name'], prev['offset'], prev['offset'] + prev['size']))
+            return False
+        self.values = OrderedDict((val['name'], val) for val in vals)
+        endOffset = max(val['offset'] + val['size'] for val in vals)
+        self.size = max(endOffset, int(size or 0))
+        # compile the codecs.
+        fmt, pos = ['>'], 0
+        for val in vals:
+            self._offsetIdx.setdefault(val['offset'], val['name'])
+            self._codecs[val['name']] = self._compileValue(val)
+            fmtChar = DB_TYPES[val['type']][0]
+            if fmtChar is None or fmtChar == 'c':
+                self._bitNames.append(val['name'])
+                continue
+            if val['offset'] > pos: fmt.append('%dx' % (val['offset'] - pos))
+            fmt.append(fmtChar)
+            pos = val['offset'] + val['size']
+            self._blockNames.append(val['name'])
+        self._blockCodec = struct.Struct(''.join(fmt))
+        self._keyCodecs = dict(self._codecs)
+        for offset, name in self._offsetIdx.items(): self._keyCodecs[offset] = self._codecs[name]
+        names = list(self.values.keys())
+        self._blockGetters = (self._makeGetter([names.index(name) for name in self._blockNames]),
+                              self._makeGetter(self._blockNames))
+        self._bitItems = [(names.index(name), name, self._codecs[name]) for name in self._bitNames]
+        self._blockConverts = [self._codecs[name][3] for name in self._blockNames]
+        return True
+
+    def _makeGetter(self, keys):
+        """ Return a function to get the keys items tuple from a list/dict."""
+        if len(keys) == 1: return lambda vals, key=keys[0]: (vals[key],)
+        return itemgetter(*keys) if keys else lambda vals: ()
+
+    def _compileValue(self, val):
+        """ Return the value codec: ('bit', offset, bit mask, bool), ('str', offset, max 
+            length, str), ('chr', offset, struct, str) or ('num', offset, struct, convert),
+            the convert function is applied to the value before it is packed.
+        """
+        valType = val['type']
+        if valType == 'BOOL': return ('bit', val['offset'], 1 << val['bit'], bool)
+        if valType == 'STRING': return ('str', val['offset'], val['length'], str)
+        codec = struct.Struct('>' + DB_TYPES[valType][0])
+        if valType == 'CHAR': return ('chr', val['offset'], codec, str)
+        convert = realConverter if valType == 'REAL' else float if valType == 'LREAL' \
+            else intConverter(valType)
+        return ('num', val['offset'], codec, convert)
+
+    #-----------------------------------------------------------------------------
+    def _getCodec(self, key):
+        """ Return the codec of the value name or byte offset, None if not found."""
+        return self._keyCodecs.get(key)
+
+    def _decode(self, buf, codec):
+        kind, offset, arg, _ = codec
+        if kind == 'bit': return bool(buf[offset] & arg)
+        if kind == 'num': return arg.unpack_from(buf, offset)[0]
+        if kind == 'chr': return arg.unpack_from(buf, offset)[0].decode(STR_CODE)
+        strLen = min(buf[offset + 1], arg)
+        return bytes(buf[offset + 2:offset + 2 + strLen]).decode(STR_CODE)
+
+    def getValue(self, buf, key):
+        """ Read the value from the DB bytes (bytes/bytearray/ctypes array) by the value
+            name or byte offset, return None if the value is not in the layout.
+        """
+        codec = self._getCodec(key)
+        return None if codec is None else self._decode(buf, codec)
+
+    def setValue(self, buf, key, val):
+        """ Write the value to the DB buffer (bytearray/ctypes array) by the value name or
+            byte offset, return True if set, False if not in the layout or invalid value.
+        """
+        codec = self._getCodec(key)
+        return False if codec is None else self._encode(buf, codec, val, key)
+
+    def encodeValue(self, key, val):
+        """ Return the bytes of the value (the value size, the BOOL value is one byte 
+            0/1 for the S7 bit write), None if not in the layout or invalid value.
+        """
+        codec = self._getCodec(key)
+        if codec is None: return None
+        if codec[0] == 'bit': return bytes([1 if val else 0])
+        data = bytearray(self.getValueInfo(key)['size'])
+        return bytes(data) if self._encode(data, (codec[0], 0) + codec[2:], val, key) else None
+
+    def _encode(self, buf, codec, val, key):
+        kind, offset, arg, convert = codec
+        try:
+            if kind == 'bit':
+                buf[offset] = buf[offset] | arg if val else buf[offset] & ~arg & 0xFF
+            elif kind == 'num':
+                # convert before the pack_into, a failed pack_into clears the value bytes.
+                arg.pack_into(buf, offset, convert(val))
+            elif kind == 'chr':
+                val = convert(val)
+                arg.pack_into(buf, offset, val.encode(STR_CODE)[:1] or b'\0')
+            else:
+                data = convert(val).encode(STR_CODE)[:arg]
+                buf[offset] = arg
+                buf[offset + 1] = len(data)
+                buf[offset + 2:offset + 2 + len(data)] = data
+        except (struct.error, ValueError, TypeError, OverflowError, UnicodeEncodeError) as err:
+            print("Error: setValue() value %s invalid for %s: %s" % (str(val), str(key), str(err)))
+            return False
+        return True
+
+    #-----------------------------------------------------------------------------
+    def unpack(self, buf):
+        """ Decode all the values of the DB bytes to the {name: value} dict."""
+        if not self.valid: return None
+        result = OrderedDict(zip(self._blockNames, self._blockCodec.unpack_from(buf, 0)))
+        for name in self._bitNames: result[name] = self._decode(buf, self._codecs[name])
+        return result
+
+    def pack(self, buf, values):
+        """ Write the values to the DB buffer, return True if all set.
+            Args:
+                buf (bytearray/ctypes array/memoryview): DB buffer.
+                values (dict/list): {name/offset: value} dict or all the values list in 
+                    the getNames() order. If all the values are given, the number values
+                    are packed with one struct pack_into (the not used gap bytes are 0).
+        """
+        if not self.valid: return False
+        isList = isinstance(values, (list, tuple))
+        if len(values) != len(self.values):
+            if isList:
+                print("Error: pack() need %d values, got %d." % (len(self.values), len(values)))
+                return False
+            return all([self.setValue(buf, key, val) for key, val in values.items()])
+        try:
+            blockVals = self._blockGetters[0 if isList else 1](values)
+        except KeyError:    # the dict keys are not all the value names.
+            return all([self.setValue(buf, key, val) for key, val in values.items()])
+        try:
+            # check with pack() (no buffer write) first, a failed pack_into clears the DB bytes.
+            try:
+                self._blockCodec.pack(*blockVals)
+            except struct.error:    # convert the values not in the packable type.
+                blockVals = [convert(val) for convert, val in zip(self._blockConverts, blockVals)]
+            self._blockCodec.pack_into(buf, 0, *blockVals)
+        except (struct.error, ValueError, TypeError, OverflowError) as err:
+            print("Error: pack() values invalid: %s" % str(err))
+            return False
+        for idx, name, codec in self._bitItems:
+            if not self._encode(buf, codec, values[idx if isList else name], name): return False
+        return True
+
+    #-----------------------------------------------------------------------------
+    def getSize(self):
+        return self.size
+
+    def getNames(self):
+        return list(self.values.keys())
+
+    def getValueInfo(self, key):
+        """ Return the value info dict of the value name or byte offset."""
+        if not isinstance(key, str): key = self._offsetIdx.get(key)
+        return self.values.get(key)
+
+    def isValid(self):
+        return self.valid
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        shmCom.py
+#
+# Purpose:     This lib module will provide a seqlock protected shared memory
+#              state block, so the processes on the same host (such as the UDP
+#              server worker processes or the Real-world emulator and the PLC/RTU
+#              simulators) can hand off the state data without pickling/copying
+#              it through a socket or pipe.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/02
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+
+    One state block is one multiprocessing.shared_memory segment with one writer
+    and any number of readers:
+        | seq (uint64) | payload size (uint32) | reserved (4B) | payload ... |
+    The writer increases the seq to odd before changing the payload and to even after
+    the payload is written. The reader copies the payload and reads the seq again,
+    the copy is retried if the seq is odd or changed (the reader never blocks the
+    writer and never gets a half written payload). The even seq is also the state
+    version, a reader can compare it with its last seq to skip the unchanged state.
+
+    The payload can be raw bytes (such as a json string) or the typed values packed
+    by the block's struct format directly into the segment (no intermediate bytes).
+
+    The block is pickled by its segment name, so it can be passed to the worker
+    processes as an argument (the worker attaches the same segment).
+
+    Usage:
+        block = sharedStateBlock(size=4096)                     # writer (creator)
+        block.write(b'{"weline": [1, 2]}')
+        reader = sharedStateBlock(name=block.getName())         # reader (attach)
+        data, seq = reader.read()
+"""
+
+import sys
+import time
+import struct
+from multiprocessing import shared_memory, resource_tracker
+
+HEADER = struct.Struct('<QI4x')     # seq, payload size, reserved.
+READ_RETRY = 1000   # max payload copy retries of one read.
+WAIT_MIN = 0.00005  # waitChange() first poll sleep time (sec).
+WAIT_MAX = 0.002    # waitChange() max poll sleep time (sec).
+
+#-----------------------------------------------------------------------------
+def attachSegment(name, track=True):
+    """ Attach the existed shared memory segment, if track is False the segment is not
+        registered in the resource tracker (python < 3.13 always registers it, so the
+        tracker of a not related process would unlink the segment when it exits).
+    """
+    if track: return shared_memory.SharedMemory(name=name)
+    if sys.version_info >= (3, 13): return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def removeBlock(name):
+    """ Remove the state block segment if it exists, return True if removed."""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except (FileNotFoundError, ValueError, OSError):
+        return False
+    shm.close()
+    shm.unlink()
+    return True
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class sharedStateBlock(object):
+    """ Seqlock protected shared memory state block, details refer to the < Program
+        Design > part.
+    """
+    def __init__(self, name=None, size=4096, fmt=None, create=None, track=True):
+        """ Init example:
+                block = sharedStateBlock(size=4096)                  # create
+                block = sharedStateBlock(name='plcState', fmt='<8d') # attach
+            Args:
+                name (str, optional): segment name, None to create a random name.
+                size (int, optional): payload size (bytes). Defaults to 4096.
+                fmt (str, optional): struct format of the typed values payload, the
+                    size is set to the format size. Defaults to None.
+                create (bool, optional): create the segment, None: create if the name
+                    is None else attach.
+                track (bool, optional): keep the attached segment in the resource
+                    tracker, set to False if this process is not a child of the
+                    creator (the tracker unlinks the segment when this process exits).
+        """
+        self.packer = struct.Struct(fmt) if fmt else None
+        if self.packer: size = self.packer.size
+        self.size = size
+        self.fmt = fmt
+        self.creator = name is None if create is None else bool(create)
+        self.shm = None
+        try:
+            if self.creator:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + size)
+                HEADER.pack_into(self.shm.buf, 0, 0, 0)
+            else:
+                self.shm = attachSegment(name, track)
+                self.size = self.shm.size - HEADER.size
+        except Exception as err:
+            print("Error: sharedStateBlock() can not open the shared memory %s: %s" % (str(name), str(err)))
+            return
+        self.buf = self.shm.buf
+
+    #-----------------------------------------------------------------------------
+    def __getstate__(self):
+        return {'name': self.getName(), 'fmt': self.fmt}
+
+    def __setstate__(self, state):
+        self.__init__(name=state['name'], fmt=state['fmt'], create=False)
+
+    #-----------------------------------------------------------------------------
+    def write(self, data):
+        """ Write the bytes payload (single writer), return the new seq, None if failed."""
+        if self.shm is None: return None
+        if len(data) > self.size:
+            print("Error: write() data size %d is bigger than the block size." % len(data))
+            return None
+        seq = HEADER.unpack_from(self.buf)[0] | 1
+        HEADER.pack_into(self.buf, 0, seq, 0)           # odd: writing.
+        self.buf[HEADER.size:HEADER.size + len(data)] = data
+        HEADER.pack_into(self.buf, 0, seq + 1, len(data))
+        return seq + 1
+
+    def writeValues(self, *values):
+        """ Pack the typed values into the block (single writer), return the new seq."""
+        if self.shm is None or self.packer is None: return None
+        seq = HEADER.unpack_from(self.buf)[0] | 1
+        HEADER.pack_into(self.buf, 0, seq, 0)
+        self.packer.pack_into(self.buf, HEADER.size, *values)
+        HEADER.pack_into(self.buf, 0, seq + 1, self.size)
+        return seq + 1
+
+    #-----------------------------------------------------------------------------
+    def read(self):
+        """ Read a consistent copy of the bytes payload.
+            Returns: (payload bytes, seq), None if the writer keeps changing it.
+        """
+        if self.shm is None: return None
+        buf, headerSz = self.buf, HEADER.size
+        for _ in range(READ_RETRY):
+            seq, size = HEADER.unpack_from(buf)
+            if seq & 1: continue
+            data = bytes(buf[headerSz:headerSz + size])
+            if HEADER.unpack_from(buf)[0] == seq: return (data, seq)
+        return None
+
+    def readValues(self):
+        """ Read a consistent copy of the typed values.
+            Returns: (values tuple, seq), None if failed.
+        """
+        if self.shm is None or self.packer is None: return None
+        buf, unpack = self.buf, self.packer.unpack_from
+        for _ in range(READ_RETRY):
+            seq = HEADER.unpack_from(buf)[0]
+            if seq & 1: continue
+            values = unpack(buf, HEADER.size)
+            if HEADER.unpack_from(buf)[0] == seq: return (values, seq)
+        return None
+
+    def readWith(self, readFun):
+        """ Call readFun(buf, offset, size) on the payload in the shared memory (no copy,
+            such as a struct unpack_from/decode function), the result is returned only if
+            the payload was not changed during the call.
+            Returns: (readFun result, seq), None if failed.
+        """
+        if self.shm is None: return None
+        buf, headerSz = self.buf, HEADER.size
+        for _ in range(READ_RETRY):
+            seq, size = HEADER.unpack_from(buf)
+            if seq & 1: continue
+            try:
+                result = readFun(buf, headerSz, size)
+            except Exception:
+                # a half written payload may not be decodable, retry if it changed.
+                if HEADER.unpack_from(buf)[0] == seq: raise
+                continue
+            if HEADER.unpack_from(buf)[0] == seq: return (result, seq)
+        return None
+
+    #-----------------------------------------------------------------------------
+    def getSeq(self):
+        """ Return the current seq (state version) of the block."""
+        return HEADER.unpack_from(self.buf)[0] if self.shm else None
+
+    def waitChange(self, lastSeq, timeout=None):
+        """ Poll until the block seq is not lastSeq (the sleep time backs off from 50us
+            to 2ms), return the new seq or None if time out.
+        """
+        if self.shm is None: return None
+        endT = None if timeout is None else time.monotonic() + timeout
+        sleepT = WAIT_MIN
+        while True:
+            seq = HEADER.unpack_from(self.buf)[0]
+            if seq != lastSeq and not seq & 1: return seq
+            if endT is not None and time.monotonic() >= endT: return None
+            time.sleep(sleepT)
+            sleepT = min(WAIT_MAX, sleepT * 2)
+
+    #-----------------------------------------------------------------------------
+    def getName(self):
+        return self.shm.name if self.shm else None
+
+    def isReady(self):
+        return self.shm is not None
+
+    def close(self):
+        """ Close the block, the creator also removes the segment."""
+        if self.shm is None: return
+        self.buf = None
+        self.shm.close()
+        if self.creator: self.shm.unlink()
+        self.shm = None
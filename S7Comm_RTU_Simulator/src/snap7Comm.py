@@ -21,7 +21,7 @@
     to read the data from a real PLC/RTU or simulate the PLC/RTU S7Comm data handling 
     process (handle S7Comm request from other program).
 
-    Three components will be provided in this module:
+    Four components will be provided in this module:
     
     - ladder logic interface: An interface class hold the ladder logic calculation algorithm.
         The ladder logic obj class will inherit this interface class by overwritten the init() 
@@ -32,20 +32,80 @@
         2. Overwrite the runLadderLogic() to do the value check and memory update.
         3. Use or pass the ladder logic object in a handlerS7request() function.
 
+    - dslRtuLadderLogic: A ladder logic whose control is written in the ladderDsl text
+        program (such as "OUT[0] := REG[0] > 50"), compiled once to a python scan function.
+
     - S7CommClient: S7Comm client module to read src memory val or write target val 
         from/to the target PLC/RTU. 
         
     - S7CommServer: S7Comm  server module will be used by RTU/PLC module to handle the S7Comm
         data read/set request.
+
+    The memory data block (DB) is declared by a layout (value name => byte offset, bit,
+    type such as DINT/LREAL/STRING, see s7DbLayout.py) compiled once to the struct
+    codecs, so one DB can hold any number of values (such as a whole line's telemetry)
+    and be read by the client in one db_read. The legacy 8 bytes DB init with the data
+    index and BOOL/INT/REAL type lists is converted to a layout whose value names are 
+    the data index, the values can be read/set by the name or the byte offset.
+    The server keeps a descriptor index (memory index int/str => DB memoryview, layout)
+    so one value get/set is 2 dict lookups and one struct pack_into/unpack_from on the 
+    DB buffer, setMemoryBlock() packs all the values of a DB with one struct call.
+
+    The client readMany()/writeMany() read/write the values of many DBs with the snap7
+    multi-vars requests, the DB read/value write items are split to the requests which
+    fit the negotiated PDU size (a DB bigger than one PDU is read in chunks) and max 20
+    vars, so polling 10 trains DBs costs one round trip instead of 10. The values are 
+    flat tags: 'DB<number>.<value name>', such as 'DB1.speed'.
+
+    The server handles the client DB write events in 2 modes:
+    - callback (default): the snap7 server event callback puts the DB write info to a
+        queue as soon as the write is executed, the service thread consumes the queue
+        and calls the event handler function (no polling delay).
+    - poll: the service thread picks the event from the snap7 event queue every clock
+        interval (0.05 sec), it is used if the snap7 lib doesn't support the callback.
+
+    - s7WriteDispatcher: the DB write events dispatch table, the handlers are registered 
+        per DB number and byte range. The writes of one tick (0.01 sec) are coalesced to
+        one handler call with all the merged dirty ranges [(address, dataIdx, writeLen)],
+        the handlers run in a small worker pool (the calls of one handler are serialized),
+        so a slow handler doesn't delay the other DBs handling.
 """
+import sys
 import time
+import queue
 import ctypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import snap7
 from snap7.common import load_library
+from snap7.types import Areas, WordLen, S7DataItem
+
+import ladderDsl
+import s7DbLayout
 
 BOOL_TYPE = 0   # bool type 2 bytes data.
 INT_TYPE = 1    # integer type 2 bytes number. 
 REAL_TYPE = 2   # float type 4 bytes number. 
+LEGACY_TYPES = {BOOL_TYPE: 'BOOL', INT_TYPE: 'INT', REAL_TYPE: 'REAL'} # data type => S7 type
+LEGACY_DB_SIZE = 8  # legacy memory address DB bytes size.
+
+TAG_FMT = 'DB%d.%s'     # flat tag of the readMany()/writeMany() values.
+MULTI_VAR_MAX = 20  # max vars of one snap7 multi-vars request.
+PDU_DEF_SIZE = 240  # PDU size used if the negotiated size is not available.
+REQ_HEAD_SZ = 12    # S7 request header + function code + items count.
+RSP_HEAD_SZ = 14    # S7 response header (with error code) + function code + items count.
+ITEM_REQ_SZ = 12    # request item (var address spec) size.
+ITEM_DATA_SZ = 4    # data item header (return code, transport size, length) size.
+
+EVT_CALLBACK_MODE = 'callback'  # handle the server events from the snap7 callback.
+EVT_POLL_MODE = 'poll'          # poll the server events every clock interval.
+EVT_DATA_READ = 0x00020000      # snap7 evcDataRead event code.
+EVT_DATA_WRITE = 0x00040000     # snap7 evcDataWrite event code (262144).
+EVT_AREA_DB = 132               # snap7 DB area code (event param1).
+EVT_QUEUE_TO = 0.5  # callback mode event queue get time out (sec) to check terminate.
+
+WRITE_TICK = 0.01   # write dispatcher writes coalescing tick (sec).
+WRITE_WORKERS = 4   # write dispatcher handlers worker pool size.
 
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
@@ -67,6 +127,21 @@ def parseS7bytes(databytes, dataIdx, dataType):
     else:
         return 
 
+def buildLegacyLayout(dataIdxList, dataTypeList):
+    """ Build the legacy 8 bytes DB layout from the data index list and the data type 
+        (BOOL_TYPE/INT_TYPE/REAL_TYPE) list, the value names are the data index str.
+        Returns:
+            s7DbLayout: the compiled layout, None if the index/type invalid.
+    """
+    try:
+        layout = [{'name': str(dataIdx), 'offset': int(dataIdx), 'type': LEGACY_TYPES[dataType]}
+                  for dataIdx, dataType in zip(dataIdxList, dataTypeList)]
+    except Exception as err:
+        print("Error: buildLegacyLayout()> invalid data index/type: %s" %str(err))
+        return None
+    layout = s7DbLayout.s7DbLayout(layout, size=LEGACY_DB_SIZE)
+    return layout if layout.isValid() else None
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class rtuLadderLogic(object):
@@ -109,6 +184,50 @@ class rtuLadderLogic(object):
         """
         return []
 
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class dslRtuLadderLogic(rtuLadderLogic):
+    """ RTU ladder logic written in the ladderDsl text program. The src address list 
+        [(memoryIdx, dataIdx), ...] is mapped to the DSL REG[n] (value) and IN[n] (bool),
+        the dest address list is mapped to OUT[n]. Example:
+            ladder = dslRtuLadderLogic(server, "OUT[0] := REG[0] > 50",
+                                       srcAddrList=[(1, 0)], destAddrList=[(1, 2)])
+    """
+    def __init__(self, parent, program, ladderName=None, srcAddrList=None, destAddrList=None) -> None:
+        """ Args:
+                parent (s7commServer): the parent s7commServer object.
+                program (str/ladderProgram): DSL program text or a compiled ladderProgram.
+                ladderName (str, optional): logic name string. Defaults to None.
+                srcAddrList (list, optional): src [(memoryIdx, dataIdx), ...]. Defaults to None.
+                destAddrList (list, optional): dest [(memoryIdx, dataIdx), ...]. Defaults to None.
+        """
+        if isinstance(program, str): program = ladderDsl.compileLadder(program, name=str(ladderName))
+        self.program = program
+        self.srcAddrList = list(srcAddrList or [])
+        self.destAddrList = list(destAddrList or [])
+        super().__init__(parent, ladderName=ladderName)
+
+    def initLadderInfo(self):
+        self.srcAddrValInfo = {'addressIdx': [addr[0] for addr in self.srcAddrList],
+                               'dataIdx': [addr[1] for addr in self.srcAddrList]}
+        self.destAddrValInfo = {'addressIdx': [addr[0] for addr in self.destAddrList],
+                                'dataIdx': [addr[1] for addr in self.destAddrList]}
+
+    def runLadderLogic(self, inputData=None):
+        """ Run one scan of the compiled program. If the inputData (src values list) is 
+            None, the src values will be read from the parent server memory. The result 
+            will be written to the parent server dest memory, return the OUT values list.
+        """
+        if self.program is None: return []
+        if inputData is None:
+            if self.parent is None: return []
+            inputData = [self.parent.getMemoryVal(memIdx, dataIdx) for memIdx, dataIdx in self.srcAddrList]
+        outList = list(self.program.scan(inputData, inputData))
+        if self.parent is not None:
+            for (memIdx, dataIdx), val in zip(self.destAddrList, outList):
+                self.parent.setMemoryVal(memIdx, dataIdx, val)
+        return outList
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class s7CommClient(object):
@@ -130,6 +249,8 @@ class s7CommClient(object):
         self._libPath = snapLibPath
         self.client = snap7.client.Client() if snapLibPath is None else snap7.client.Client(lib_location=snapLibPath)
         self.connected = False
+        self.pduSize = None     # negotiated PDU size.
+        self._dbLayouts = {}    # DB number -> s7DbLayout used by readMany()/writeMany().
         try:
             self.client.connect(self._rtuIp, 0, 0, self._rtuPort)
             self.connected = self.client.get_connected()
@@ -168,6 +289,178 @@ class s7CommClient(object):
          for dataIdx, dataType in zip(dataIdxList, dataTypeList)]
         return dataList
 
+    #-----------------------------------------------------------------------------
+    def readDataBlock(self, addressIdx, layout):
+        """ Read the whole DB with one db_read and decode all the values.
+            Args:
+                addressIdx (int): memory address (DB number) index.
+                layout (s7DbLayout/dict/list/str): the DB layout or the layout config.
+            Returns:
+                dict: {value name: value}, None if read failed.
+        """
+        if not isinstance(layout, s7DbLayout.s7DbLayout): layout = s7DbLayout.s7DbLayout(layout)
+        if not layout.isValid(): return None
+        try:
+            data = self.client.db_read(addressIdx, 0, layout.getSize())
+            self.connected = True
+        except Exception as err:
+            print("Error: readDataBlock()> read RTU data error: %s" %str(err))
+            self.connected = False
+            return None
+        return layout.unpack(data)
+
+    #-----------------------------------------------------------------------------
+    def addDbLayout(self, addressIdx, layout):
+        """ Add (compile) the DB layout used by readMany()/writeMany().
+            Args:
+                addressIdx (int): memory address (DB number) index.
+                layout (s7DbLayout/dict/list/str): the DB layout or the layout config.
+            Returns:
+                s7DbLayout: the compiled layout, None if the layout is invalid.
+        """
+        if not isinstance(layout, s7DbLayout.s7DbLayout): layout = s7DbLayout.s7DbLayout(layout)
+        if not layout.isValid():
+            print("Error: addDbLayout()> DB%s layout invalid" %str(addressIdx))
+            return None
+        self._dbLayouts[int(addressIdx)] = layout
+        return layout
+
+    def getPduSize(self):
+        """ Return the negotiated PDU size (the default size if not connected)."""
+        if self.pduSize is None:
+            try:
+                self.pduSize = int(self.client.get_pdu_length()) or None
+            except Exception as err:
+                print("Warning: getPduSize()> use the default PDU size: %s" %str(err))
+        return self.pduSize or PDU_DEF_SIZE
+
+    def _splitItems(self, items, write=False):
+        """ Split the (DB number, start, size, data, word length) items to the item 
+            batches, each batch (one multi-vars request) fits the PDU size.
+        """
+        pduSize = self.getPduSize()
+        maxData = pduSize - ITEM_DATA_SZ - (REQ_HEAD_SZ + ITEM_REQ_SZ if write else RSP_HEAD_SZ)
+        maxData -= maxData % 2
+        batches, batch, reqSz, rspSz = [], [], REQ_HEAD_SZ, RSP_HEAD_SZ
+        for dbNum, start, size, data, wordLen in items:
+            for pos in range(0, size, maxData):
+                chunkSz = min(maxData, size - pos)
+                dataSz = ITEM_DATA_SZ + chunkSz + chunkSz % 2
+                itemReq, itemRsp = (ITEM_REQ_SZ + dataSz, 1) if write else (ITEM_REQ_SZ, dataSz)
+                if batch and (len(batch) >= MULTI_VAR_MAX or reqSz + itemReq > pduSize 
+                              or rspSz + itemRsp > pduSize):
+                    batches.append(batch)
+                    batch, reqSz, rspSz = [], REQ_HEAD_SZ, RSP_HEAD_SZ
+                chunk = None if data is None else data[pos:pos + chunkSz]
+                batch.append((dbNum, start + pos, chunkSz, chunk, wordLen))
+                reqSz += itemReq
+                rspSz += itemRsp
+        if batch: batches.append(batch)
+        return batches
+
+    def _runMultiVars(self, batch, write=False):
+        """ Run one multi-vars read/write request of the item batch, return the read
+            items data list (None if the item read failed). Raise the snap7 error if the
+            request failed.
+        """
+        items, bufs = (S7DataItem * len(batch))(), []
+        for item, (dbNum, start, size, data, wordLen) in zip(items, batch):
+            buf = (ctypes.c_ubyte * size)() if data is None else (ctypes.c_ubyte * size).from_buffer_copy(data)
+            item.Area, item.WordLen, item.DBNumber = Areas.DB.value, wordLen, dbNum
+            item.Start, item.Amount = start, size
+            item.pData = ctypes.cast(buf, ctypes.POINTER(ctypes.c_ubyte))
+            bufs.append(buf)
+        if write:
+            self.client.write_multi_vars(items)
+            return None
+        self.client.read_multi_vars(items)
+        return [bytes(buf) if item.Result == 0 else None for item, buf in zip(items, bufs)]
+
+    def readMany(self, dbLayouts=None):
+        """ Read the DBs with the multi-vars requests and decode the values with the
+            precompiled layouts.
+            Args:
+                dbLayouts (dict/list, optional): {DB number: layout} (the layouts are 
+                    added by addDbLayout()) or the DB numbers list of the added layouts.
+                    Defaults to None read all the added DBs.
+            Returns:
+                dict: flat {tag: value} such as {'DB1.speed': 1.5}, the values of a not
+                    readable DB are not in the dict. None if the read request failed.
+        """
+        if dbLayouts is None: dbLayouts = list(self._dbLayouts.keys())
+        layouts = {}
+        if isinstance(dbLayouts, dict):
+            for dbNum, layout in dbLayouts.items():
+                if self._dbLayouts.get(int(dbNum)) is not layout: layout = self.addDbLayout(dbNum, layout)
+                if layout: layouts[int(dbNum)] = layout
+        else:
+            for dbNum in dbLayouts:
+                if int(dbNum) in self._dbLayouts: 
+                    layouts[int(dbNum)] = self._dbLayouts[int(dbNum)]
+                else:
+                    print("Error: readMany()> DB%s layout not added" %str(dbNum))
+        dbData = {dbNum: bytearray(layout.getSize()) for dbNum, layout in layouts.items()}
+        items = [(dbNum, 0, len(data), None, WordLen.Byte.value) for dbNum, data in dbData.items()]
+        failedDbs = set()
+        try:
+            for batch in self._splitItems(items):
+                for (dbNum, start, size, _, _), data in zip(batch, self._runMultiVars(batch)):
+                    if data is None:
+                        failedDbs.add(dbNum)
+                    else:
+                        dbData[dbNum][start:start + size] = data
+            self.connected = True
+        except Exception as err:
+            print("Error: readMany()> read RTU data error: %s" %str(err))
+            self.connected = False
+            return None
+        result = {}
+        for dbNum, layout in layouts.items():
+            if dbNum in failedDbs:
+                print("Error: readMany()> read DB%d failed" %dbNum)
+                continue
+            for name, val in layout.unpack(dbData[dbNum]).items():
+                result[TAG_FMT %(dbNum, name)] = val
+        return result
+
+    def writeMany(self, tagValDict):
+        """ Write the values with the multi-vars requests, the BOOL value is written as
+            a bit so the other bits in the byte are not changed.
+            Args:
+                tagValDict (dict): {tag: value}, the tag is 'DB<number>.<value name>' or
+                    a (DB number, value name/byte offset) tuple, the DB layout needs to 
+                    be added by addDbLayout() or readMany().
+            Returns:
+                bool: True if written, False if a tag/value is invalid (nothing written)
+                    or the write request failed.
+        """
+        items = []
+        for tag, val in tagValDict.items():
+            if isinstance(tag, str):
+                dbStr, _, key = tag.partition('.')
+                dbNum = int(dbStr[2:]) if dbStr[:2].upper() == 'DB' and dbStr[2:].isdigit() else None
+            else:
+                dbNum, key = tag
+            layout = self._dbLayouts.get(dbNum)
+            info = layout.getValueInfo(key) if layout else None
+            data = layout.encodeValue(key, val) if info else None
+            if data is None:
+                print("Error: writeMany()> tag %s not in the DB layouts or value invalid" %str(tag))
+                return False
+            if info['type'] == 'BOOL':
+                items.append((dbNum, info['offset'] * 8 + info['bit'], 1, data, WordLen.Bit.value))
+            else:
+                items.append((dbNum, info['offset'], len(data), data, WordLen.Byte.value))
+        try:
+            for batch in self._splitItems(items, write=True):
+                self._runMultiVars(batch, write=True)
+            self.connected = True
+        except Exception as err:
+            print("Error: writeMany()> set RTU data error: %s" %str(err))
+            self.connected = False
+            return False
+        return True
+
     #-----------------------------------------------------------------------------
     def setAddressVal(self, addressIdx, dataIdx, data, dataType=REAL_TYPE):
         """ Set the data Idx value in the address
@@ -221,12 +514,14 @@ class s7commServer(object):
         self._hostPort = hostPort
         self._server = None
         self._dbDict = {}  # data base dictionary
+        self._dbIdx = {}   # memory index (int and str) -> (DB buffer memoryview, layout)
         # Example of data base with one address save one bool, one int and one float number:
         # self._dbDict = {
         #     '1': {    # address index as the key.
         #         'dbData':(ctypes.c_ubyte*8)(), # 8 byte data
         #         'dataIdx':[0, 2, 4], # parameter start index of bytes.
         #         'dataType':[BOOL_TYPE, INT_TYPE, REAL_TYPE], # parameter type
+        #         'layout': s7DbLayout obj, # compiled layout of the DB.
         #     }
         # }
         self.runingFlg = False
@@ -235,6 +530,8 @@ class s7commServer(object):
             print("s7commServer > Load the Snap7 Win-OS lib-dll file : %s" %str(snapLibPath))
             load_library(snapLibPath)
         self.clockInterval = 0.05 # the interval of the event handling clock 
+        self.eventMode = None
+        self._eventQueue = queue.Queue()    # callback mode DB write info queue.
         self.terminate = False
         print("s7commServerInit > Host IP: %s, Port: %d" %(self._hostIp, self._hostPort))
 
@@ -249,20 +546,42 @@ class s7commServer(object):
             Returns:
                 Bool: True if added success, else False.
         """
-        if isinstance(memoryIdx, int) and memoryIdx >= 0:
-            if str(memoryIdx) in self._dbDict.keys():
-                print("Warning: initNewMemoryAddr()> memory address %s already exist" %str(memoryIdx))
-                return False 
-            else:
-                self._dbDict[str(memoryIdx)] = {
-                    'dbData': (ctypes.c_ubyte*8)(),
-                    'dataIdx': dataIdxList,
-                    'dataType': dataTypeList
-                }
-                return True
-        else:
-            print("Error: initNewMemoryAddr()> input memory index need to be a >=0 int type")
+        layout = buildLegacyLayout(dataIdxList, dataTypeList)
+        if layout is None or not self.initDataBlock(memoryIdx, layout): return False
+        self._dbDict[str(memoryIdx)].update({'dataIdx': dataIdxList, 'dataType': dataTypeList})
+        return True
+
+    def initDataBlock(self, memoryIdx, layout, size=None):
+        """ Init a new memory DB of any size with the values layout. All the init must be
+            called before the server start.
+            Args:
+                memoryIdx (int): the memory index (DB number).
+                layout (s7DbLayout/dict/list/str): the DB layout or the layout config, 
+                    example: {'speed': {'offset': 0, 'type': 'LREAL'}, 
+                              'name': {'offset': 8, 'type': 'STRING', 'length': 16}}
+                size (int, optional): DB bytes size. Defaults to None use the layout size.
+            Returns:
+                Bool: True if added success, else False.
+        """
+        if not (isinstance(memoryIdx, int) and memoryIdx >= 0):
+            print("Error: initDataBlock()> input memory index need to be a >=0 int type")
             return False
+        if str(memoryIdx) in self._dbDict.keys():
+            print("Warning: initDataBlock()> memory address %s already exist" %str(memoryIdx))
+            return False
+        if not isinstance(layout, s7DbLayout.s7DbLayout): layout = s7DbLayout.s7DbLayout(layout, size=size)
+        if not layout.isValid():
+            print("Error: initDataBlock()> memory address %s layout invalid" %str(memoryIdx))
+            return False
+        self._dbDict[str(memoryIdx)] = {
+            'dbData': (ctypes.c_ubyte*max(layout.getSize(), int(size or 0)))(),
+            'dataIdx': [info['offset'] for info in layout.values.values()],
+            'dataType': [info['type'] for info in layout.values.values()],
+            'layout': layout
+        }
+        dbDesc = (memoryview(self._dbDict[str(memoryIdx)]['dbData']).cast('B'), layout)
+        self._dbIdx[memoryIdx] = self._dbIdx[str(memoryIdx)] = dbDesc
+        return True
 
     #-----------------------------------------------------------------------------
     def initRegisterArea(self):
@@ -287,25 +606,61 @@ class s7commServer(object):
         """ Get the value saved in the memory address under byte index.
             Args:
                 memoryIdx (int/str): memory address index.
-                dataIdx (int): data index in the memory.
-            return: Value saved in the memory, None if the memory is not set.
+                dataIdx (int/str): data byte index or the value name in the memory.
+            return: Value saved in the memory, None if the memory/value is not set.
         """
-        if str(memoryIdx) in self._dbDict.keys():
-            byteData = self._dbDict[str(memoryIdx)]['dbData']
-            typeIdx = self._dbDict[str(memoryIdx)]['dataIdx'].index(dataIdx)
-            dataType = self._dbDict[str(memoryIdx)]['dataType'][int(typeIdx)]
-            return parseS7bytes(byteData, dataIdx, dataType)
+        dbDesc = self._dbIdx.get(memoryIdx)
+        if dbDesc: return dbDesc[1].getValue(dbDesc[0], dataIdx)
         return None 
 
+    def getMemoryBlock(self, memoryIdx):
+        """ Decode all the values of the memory DB to a {value name: value} dict, None
+            if the memory is not set.
+        """
+        dbDesc = self._dbIdx.get(memoryIdx)
+        if dbDesc: return dbDesc[1].unpack(dbDesc[0])
+        return None
+
+    def setMemoryBlock(self, memoryIdx, values):
+        """ Set the values of the memory DB.
+            Args:
+                memoryIdx (int/str): memory index.
+                values (dict/list): {value name/byte index: value} dict or all the values 
+                    list in the layout offset order (such as [bool, int, int, int] of the 
+                    legacy DB [0, 2, 4, 6]), all the values are packed with one struct call.
+            Returns:
+                bool: True if all set, False if the value is invalid, None if the memory
+                    is not set.
+        """
+        dbDesc = self._dbIdx.get(memoryIdx)
+        if dbDesc: return dbDesc[1].pack(dbDesc[0], values)
+        print("Error: setMemoryBlock()> invalid memory index: %s" %str(memoryIdx))
+        return None
+
     #-----------------------------------------------------------------------------
-    def startService(self, eventHandlerFun=None, printEvt=True):
+    def startService(self, eventHandlerFun=None, printEvt=True, eventMode=EVT_CALLBACK_MODE, 
+                     readHandlerFun=None):
         """ Start the S7comm service
             Args:
                 eventHandlerFun ( function reference, optional): reference of the 
                     function used to handle the event. Defaults to None.
                 printEvt (bool, optional): flag to identify whether print the event. Defaults to True.
+                eventMode (str, optional): EVT_CALLBACK_MODE or EVT_POLL_MODE, the callback
+                    mode falls back to poll if the callback can not be set.
+                readHandlerFun (function reference, optional): callback mode function 
+                    called with (address, dataIdx, readLen) before the DB data is sent 
+                    to the client (in the snap7 thread, need to be fast). Defaults to None.
         """
         print("Start the S7comm event handling loop.")
+        self.eventMode = EVT_POLL_MODE
+        if eventMode == EVT_CALLBACK_MODE:
+            try:
+                self._server.set_events_callback(lambda event: self._onEvent(event, printEvt))
+                if readHandlerFun:
+                    self._server.set_read_events_callback(lambda event: self._onReadEvent(event, readHandlerFun))
+                self.eventMode = EVT_CALLBACK_MODE
+            except Exception as err:
+                print("Warning: startService() event callback not supported, use polling: %s" %str(err))
         try:
             self.initRegisterArea()
             self._server.start(self._hostPort)
@@ -314,17 +669,45 @@ class s7commServer(object):
              print("Error: startService() Error to start s7snap server: %s" %str(err))
              self.runingFlg = False 
              return None
+        if self.eventMode == EVT_CALLBACK_MODE:
+            while not self.terminate:
+                try:
+                    writeInfo = self._eventQueue.get(timeout=EVT_QUEUE_TO)
+                except queue.Empty:
+                    continue
+                if writeInfo and eventHandlerFun: eventHandlerFun(writeInfo)
+            return None
         # Added the loop to print the event and handle the DB change request.
         while not self.terminate:
             event = self._server.pick_event()
             if event:
                 if printEvt: print(" - Event: %s" % str(event))
-                if eventHandlerFun and event.EvtCode == 262144 and event.EvtRetCode == 0:  # write command executed
-                    if event.EvtParam1 == 132:  # DB write
+                if eventHandlerFun and event.EvtCode == EVT_DATA_WRITE and event.EvtRetCode == 0:  # write command executed
+                    if event.EvtParam1 == EVT_AREA_DB:  # DB write
                         address, dataIdx, writeLen = event.EvtParam2, event.EvtParam3, event.EvtParam4
                         eventHandlerFun((address, dataIdx, writeLen))
             time.sleep(self.clockInterval)
 
+    def _onEvent(self, event, printEvt):
+        """ snap7 server event callback (called in the snap7 server thread), queue the
+            executed DB write info (address, dataIdx, writeLen).
+        """
+        if printEvt: print(" - Event: %s" % str(event))
+        if event.EvtCode == EVT_DATA_WRITE and event.EvtRetCode == 0 and event.EvtParam1 == EVT_AREA_DB:
+            self._eventQueue.put((event.EvtParam2, event.EvtParam3, event.EvtParam4))
+
+    def _onReadEvent(self, event, readHandlerFun):
+        """ snap7 server read event callback, called before the data is read."""
+        if event.EvtCode == EVT_DATA_READ and event.EvtParam1 == EVT_AREA_DB:
+            try:
+                readHandlerFun((event.EvtParam2, event.EvtParam3, event.EvtParam4))
+            except Exception as err:
+                print("Error: _onReadEvent() read handler error: %s" %str(err))
+
+    #-----------------------------------------------------------------------------
+    def getEventMode(self):
+        return self.eventMode
+
     #-----------------------------------------------------------------------------
     def setClockInterval(self, interval):
         self.clockInterval = interval
@@ -334,26 +717,15 @@ class s7commServer(object):
         """ Set the memory index byte index value.
             Args:
                 memoryIdx (int): memory index.
-                dataIdx (int): byte index.
+                dataIdx (int/str): byte index or the value name.
                 dataVal (_type_): data value
         """
-        if str(memoryIdx) in self._dbDict.keys():
-            if dataIdx in self._dbDict[str(memoryIdx)]['dataIdx']:
-                typeIdx = self._dbDict[str(memoryIdx)]['dataIdx'].index(dataIdx)
-                dataType = self._dbDict[str(memoryIdx)]['dataType'][int(typeIdx)]
-                if dataType == BOOL_TYPE:
-                    snap7.util.set_bool(self._dbDict[str(memoryIdx)]['dbData'], int(dataIdx), 0, bool(dataVal))
-                elif dataType == INT_TYPE:
-                    snap7.util.set_int(self._dbDict[str(memoryIdx)]['dbData'], int(dataIdx), int(dataVal))
-                elif dataType == REAL_TYPE:
-                    snap7.util.set_real(self._dbDict[str(memoryIdx)]['dbData'], int(dataIdx), float(dataVal))
-                else:
-                    print("Error: setMemoryVal()> invalid data type: %s" %str(dataType))
-                    return False 
-                return True
-            else:
+        dbDesc = self._dbIdx.get(memoryIdx)
+        if dbDesc:
+            if dbDesc[1].setValue(dbDesc[0], dataIdx, dataVal): return True
+            if dbDesc[1].getValueInfo(dataIdx) is None:
                 print("Error: setMemoryVal()> invalid data index: %s" %str(dataIdx))
-                return False
+            return False
         print("Error: setMemoryVal()> invalid memory index: %s" %str(memoryIdx))
         return None 
 
@@ -361,6 +733,141 @@ class s7commServer(object):
     def stopServer(self):
         self.runingFlg = False
         self.terminate = True
+        self._eventQueue.put(None)  # wake up the callback mode handling loop.
         self._server.stop()
         self._server.destroy()
     
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class s7WriteDispatcher(object):
+    """ Route the DB write events (address, dataIdx, writeLen) to the handlers registered
+        per DB number and byte range, details refer to the < Program Design > part.
+        Usage:
+            dispatcher = s7WriteDispatcher()
+            dispatcher.addHandler(trainCtrlHandler, dbNumber=1)
+            dispatcher.addHandler(powerCtrlHandler, dbNumber=2, byteRange=(0, 16))
+            dispatcher.start()
+            server.startService(eventHandlerFun=dispatcher.dispatch)
+    """
+    def __init__(self, tickInterval=WRITE_TICK, workers=WRITE_WORKERS) -> None:
+        """ Init example: dispatcher = s7WriteDispatcher(tickInterval=0.01, workers=4)
+            Args:
+                tickInterval (float, optional): the writes in one tick are coalesced to 
+                    one handler call. Defaults to WRITE_TICK.
+                workers (int, optional): handlers worker pool size. Defaults to WRITE_WORKERS.
+        """
+        self.tickInterval = tickInterval
+        self.workers = max(1, int(workers))
+        self._routes = []       # [handlerFun, DB number (None: all DBs), (start, end) bytes]
+        self._allRoutes = []    # route indexes of the all DBs routes.
+        self._dbRoutes = {}     # DB number -> route indexes of the DB (with the all DBs routes).
+        self._pending = {}      # route index -> not handled write info list.
+        self._running = set()   # route indexes of the handlers running in the pool.
+        self._lock = threading.Lock()
+        self._dirtyEvt = threading.Event()
+        self._pool = None
+        self._thread = None
+        self.terminate = False
+        self.stats = {'writes': 0, 'unrouted': 0, 'calls': 0, 'errors': 0}
+
+    #-----------------------------------------------------------------------------
+    def addHandler(self, handlerFun, dbNumber=None, byteRange=None):
+        """ Register the handler of the DB writes.
+            Args:
+                handlerFun (function): called with the merged dirty ranges list 
+                    [(address, dataIdx, writeLen), ...] of the writes in one tick.
+                dbNumber (int, optional): DB number, Defaults to None all the DBs.
+                byteRange (tuple, optional): (start, end) bytes range [start, end) of the
+                    DB, Defaults to None the whole DB.
+            Returns:
+                int: the route index.
+        """
+        start, end = byteRange if byteRange else (0, sys.maxsize)
+        with self._lock:
+            self._routes.append((handlerFun, None if dbNumber is None else int(dbNumber), (int(start), int(end))))
+            self._allRoutes = [idx for idx, route in enumerate(self._routes) if route[1] is None]
+            self._dbRoutes = {}
+            for idx, route in enumerate(self._routes):
+                if route[1] is not None: self._dbRoutes.setdefault(route[1], list(self._allRoutes)).append(idx)
+            return len(self._routes) - 1
+
+    #-----------------------------------------------------------------------------
+    def dispatch(self, writeInfo):
+        """ Add the DB write info (address, dataIdx, writeLen) to the matched routes, used
+            as the s7commServer event handler function.
+        """
+        address, dataIdx, writeLen = writeInfo
+        writeEnd = dataIdx + writeLen
+        with self._lock:
+            self.stats['writes'] += 1
+            routed = False
+            for idx in self._dbRoutes.get(address, self._allRoutes):
+                start, end = self._routes[idx][2]
+                if dataIdx < end and writeEnd > start:
+                    self._pending.setdefault(idx, []).append(writeInfo)
+                    routed = True
+            if not routed: self.stats['unrouted'] += 1
+        if routed: self._dirtyEvt.set()
+
+    def _mergeRanges(self, writeList):
+        """ Merge the overlapped/adjacent write ranges of each DB."""
+        merged = []
+        for address, dataIdx, writeLen in sorted(writeList):
+            if merged and merged[-1][0] == address and dataIdx <= merged[-1][1] + merged[-1][2]:
+                lastEnd = max(merged[-1][1] + merged[-1][2], dataIdx + writeLen)
+                merged[-1] = (address, merged[-1][1], lastEnd - merged[-1][1])
+            else:
+                merged.append((address, dataIdx, writeLen))
+        return merged
+
+    #-----------------------------------------------------------------------------
+    def _run(self):
+        """ Dispatcher thread: wait for the writes, coalesce the writes of one tick and
+            submit the handler calls to the worker pool.
+        """
+        while not self.terminate:
+            if not self._dirtyEvt.wait(EVT_QUEUE_TO): continue
+            time.sleep(self.tickInterval)
+            self._dirtyEvt.clear()
+            with self._lock:
+                # the route whose handler is running keeps its writes for the next tick.
+                batches = [(idx, self._pending.pop(idx)) for idx in list(self._pending.keys())
+                           if idx not in self._running]
+                self._running.update(idx for idx, _ in batches)
+            for idx, writeList in batches:
+                self._pool.submit(self._runHandler, idx, self._mergeRanges(writeList))
+
+    def _runHandler(self, idx, dirtyRanges):
+        """ Worker pool task to call the route handler."""
+        try:
+            self._routes[idx][0](dirtyRanges)
+        except Exception as err:
+            print("Error: _runHandler() DB write handler error: %s" %str(err))
+            self.stats['errors'] += 1
+        finally:
+            with self._lock:
+                self.stats['calls'] += 1
+                self._running.discard(idx)
+                if idx in self._pending: self._dirtyEvt.set()
+
+    #-----------------------------------------------------------------------------
+    def start(self):
+        """ Start the dispatcher thread and the worker pool."""
+        if self._thread: return
+        self.terminate = False
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='s7Write')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def getStats(self):
+        """ Return the writes/unrouted writes/handler calls/handler errors count."""
+        with self._lock:
+            return dict(self.stats)
+
+    def stop(self):
+        self.terminate = True
+        self._dirtyEvt.set()
+        if self._thread: self._thread.join(EVT_QUEUE_TO + self.tickInterval)
+        if self._pool: self._pool.shutdown(wait=False)
+        self._thread = self._pool = None
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+#-----------------------------------------------------------------------------
+# Name:        snap7CommBench.py
+#
+# Purpose:     Benchmark program used to compare the lib module <snap7Comm.py>
+#              s7commServer DB write event handling modes (snap7 event callback
+#              and pick_event polling): the client write to handler latency and
+#              the handled write events per second.
+#
+# Author:      Yuancheng Liu
+#
+# Created:     2024/07/12
+# Version:     v_0.1.4
+# Copyright:   Copyright (c) 2024 LiuYuancheng
+# License:     MIT License
+#-----------------------------------------------------------------------------
+""" Program Design:
+    The s7commServer runs in a thread of the benchmark process with one 8 bytes DB,
+    the event handler records the time when it gets the DB write info. The client
+    writes one INT value and waits for the handler (the write to handler latency
+    p50/p99 of <n> writes), then sends a burst of <b> writes back to back and counts
+    the write events handled per second (the not handled writes in 2 sec are lost).
+
+    Usage:
+        python snap7CommBench.py [-n 200] [-b 500] [-p 10102] [-m callback poll]
+"""
+
+import time
+import argparse
+import threading
+
+import snap7Comm
+
+BENCH_HOST = '127.0.0.1'
+BENCH_PORT = 10102  # not the 102 port, so the benchmark doesn't need the root.
+BENCH_DB = 1
+HANDLE_TO = 2.0     # max wait time (sec) of the handler to get a write.
+
+#-----------------------------------------------------------------------------
+class benchHandler(object):
+    """ DB write event handler records the handled writes number and time."""
+    def __init__(self) -> None:
+        self.count = 0
+        self.lastT = 0.0
+        self.handledEvt = threading.Event()
+
+    def __call__(self, writeInfo):
+        self.lastT = time.perf_counter()
+        self.count += 1
+        self.handledEvt.set()
+
+#-----------------------------------------------------------------------------
+def benchMode(mode, writes, burst, port):
+    """ Start the server with the event mode and run the latency and burst test,
+        return the result dict.
+    """
+    server = snap7Comm.s7commServer(hostIp=BENCH_HOST, hostPort=port)
+    server.initNewMemoryAddr(BENCH_DB, [0, 2, 4], [snap7Comm.BOOL_TYPE, snap7Comm.INT_TYPE, snap7Comm.REAL_TYPE])
+    handler = benchHandler()
+    svcThread = threading.Thread(target=server.startService, daemon=True,
+                                 kwargs={'eventHandlerFun': handler, 'printEvt': False, 'eventMode': mode})
+    svcThread.start()
+    time.sleep(1)   # wait the server ready.
+    client = snap7Comm.s7CommClient(BENCH_HOST, rtuPort=port)
+    latencyList, lost = [], 0
+    try:
+        for i in range(writes):
+            handler.handledEvt.clear()
+            startT = time.perf_counter()
+            client.setAddressVal(BENCH_DB, 2, i % 1000, dataType=snap7Comm.INT_TYPE)
+            if handler.handledEvt.wait(HANDLE_TO):
+                latencyList.append(handler.lastT - startT)
+            else:
+                lost += 1
+        time.sleep(0.2)     # let the poll mode handle the late events.
+        handler.count = 0
+        startT = time.perf_counter()
+        for i in range(burst):
+            client.setAddressVal(BENCH_DB, 2, i % 1000, dataType=snap7Comm.INT_TYPE)
+        endT = time.perf_counter() + HANDLE_TO
+        while handler.count < burst and time.perf_counter() < endT: time.sleep(0.01)
+        handled = handler.count
+        usedT = max(handler.lastT - startT, 1e-6)
+    finally:
+        client.close()
+        server.stopServer()
+        svcThread.join(5)
+    latencyList.sort()
+    count = len(latencyList)
+    percentile = lambda p: latencyList[min(count-1, int(count*p))]*1000 if count else 0.0
+    return {'mode': server.getEventMode(), 'writes': writes, 'p50': percentile(0.5),
+            'p99': percentile(0.99), 'lost': lost, 'burst': burst, 'handled': handled,
+            'eps': handled/usedT}
+
+#-----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='S7Comm server event handling benchmark')
+    parser.add_argument('-n', '--writes', type=int, default=200, help='latency test writes number')
+    parser.add_argument('-b', '--burst', type=int, default=500, help='burst test writes number')
+    parser.add_argument('-p', '--port', type=int, default=BENCH_PORT)
+    parser.add_argument('-m', '--modes', nargs='+', default=[snap7Comm.EVT_CALLBACK_MODE, snap7Comm.EVT_POLL_MODE],
+                        choices=[snap7Comm.EVT_CALLBACK_MODE, snap7Comm.EVT_POLL_MODE])
+    args = parser.parse_args()
+    results = []
+    for idx, mode in enumerate(args.modes):
+        results.append(benchMode(mode, args.writes, args.burst, args.port + idx))
+    print("%-9s %7s %9s %9s %6s %7s %8s %9s" %('mode', 'writes', 'p50(ms)', 'p99(ms)', 'lost',
+                                                'burst', 'handled', 'events/s'))
+    for rst in results:
+        print("%-9s %7d %9.3f %9.3f %6d %7d %8d %9.0f" %(rst['mode'], rst['writes'], rst['p50'],
+              rst['p99'], rst['lost'], rst['burst'], rst['handled'], rst['eps']))
+
+#-----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -21,14 +21,43 @@
     - server: allow the user to pass in their message handler in the server, if the handler
             function return value, the value will be send back to the client side.
 
+    - pipeClient: pipelined client, tags every request with a '#<seq>;' sequence ID 
+            prefix, keeps several requests in flight on one non-blocking socket and 
+            matches the replies out of order (selector driven), each request has a 
+            deadline and is resent with the backoff time out if the reply is lost.
+            The server echoes the prefix in the reply, the replies without prefix 
+            (old server) are matched to the oldest request in flight.
+
     If the message/data size is bigger than the MAX/pre-configured UDP socket buffer 
-    size, it will be split to several chunks, each chunk will be buffer size - 1 bytes.
-    Then the chunk will be send to destination under splitted sequence. The data transfer 
-    will follow below steps:
-        1. Send b'BM;Send;<messageSize>' to the server side.
-        2. Send every thunk in a loop.
-        3. Send b'BM;Sent;Finish' to identify finished and trigger the response.
-    The server's reply Big message will follow step 1 & 2.
+    size, it will be split to several chunks, each chunk will be buffer size - 8 bytes.
+    The reliable chunk transfer (chunkTransfer) will follow below steps:
+        1. Send b'BM;Send;<messageSize>;<chunkSize>;<transferID>' to the receiver.
+        2. Send a window of chunks, every chunk starts with the 8 bytes header (magic 
+            b'\\xff\\xbc', transfer ID, chunk sequence), then send the window checkpoint
+            b'BM;Chk;<transferID>;<windowEnd>'.
+        3. The receiver copies the chunk payload (received by recvfrom_into()) to its 
+            offset of the preallocated message bytearray, so the reordered chunks are put 
+            in place and the duplicated ones are dropped. It replies the checkpoint with
+            b'BM;Ack;<transferID>;<windowEnd>' or the missing chunks before the window end
+            b'BM;Nack;<transferID>;<windowEnd>;<seq>,<seq>,...'.
+        4. The sender resends the NACKed chunks (or only the checkpoint if time out) until 
+            the window is ACKed then sends the next window, so the window size paces the 
+            sending. The server calls the handler when the last window is ACKed.
+    Both transfers are accepted by the receiver, but the big messages are sent with the
+    legacy transfer (b'BM;Send;<messageSize>' => chunks without header => the client sends
+    b'BM;Sent;Finish') by default, as the peer running the old udpCom lib can not parse 
+    the reliable transfer header. Call setReliable(True) after the peer agreed (such as
+    the "reliable" offer in the Real-world emulator login), the udpServer can enable it 
+    for one client with setReliable(True, address).
+
+    - mpServer: multi-core server, starts N worker processes, every worker runs one
+            udpServer whose socket is bound to the same port with SO_REUSEPORT, the 
+            kernel hashes the client address to select the worker so the messages of 
+            one client are always handled in sequence by the same worker. The state
+            shared with the handlers is handed off by a shmCom.sharedStateBlock passed
+            in the worker init args (no pickling per message). If the SO_REUSEPORT is 
+            not supported, one receive thread feeds a worker thread pool (the client 
+            address selects the worker thread).
 
     Usage: 
     - server: the server side will have a loop to keep fetching data from the buffer,
@@ -37,15 +66,236 @@
     - client: client = udpClient((<ip address>, <port>))
 """
 
+import os
+import re
 import time
+import queue
+import signal
+import struct
 import socket
+import selectors
+import threading
+import multiprocessing
 from math import ceil
+from collections import OrderedDict
 
 BUFFER_SZ = 4096        # Default socket buffer size. Set to value smaller than MTU will increase small message transfer throughput.
 BUFFER_SZ_MAX = 65507   # UDP maximum buffer size.
 RESP_TIME = 0.01
 BIG_MSG_FLG = 'BM'      # Flag to identify big size message.      
 CODE_FMT = 'utf-8'      # default str <-> bytes encode/decode format.
+SEQ_PATTERN = re.compile(rb'#(\d{1,10});')  # pipelined request sequence ID prefix '#<seq>;'
+PIPE_TIMEOUT = 0.5      # default pipelined request first try time out (sec).
+PIPE_RETRY = 2          # default pipelined request retry times.
+PIPE_BACKOFF = 2        # time out multiplier of every retry.
+CHUNK_HEADER = struct.Struct('>2sHI')   # reliable transfer chunk header: magic, transfer ID, chunk sequence.
+CHUNK_MAGIC = b'\xff\xbc'  # not valid utf-8, a text message can not start with it.
+CHUNK_WINDOW = 32       # default chunks number sent before waiting the checkpoint ACK.
+CHUNK_TIMEOUT = 0.5     # default checkpoint reply time out (sec).
+CHUNK_RETRY = 5         # default window resend times.
+NACK_MAX = 256          # max missing chunks sequence number in one NACK.
+CTRL_SZ = 2048          # min receive buffer size for the control (NACK) message.
+DONE_CACHE_SZ = 64      # finished transfers kept to re-ACK the resent last checkpoint.
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+gTransferID = 0
+gDoneTransfers = OrderedDict()  # (peer address, transfer ID) -> last window end.
+
+#-----------------------------------------------------------------------------
+def splitSeqPrefix(data):
+    """ Split the '#<seq>;' sequence ID prefix of a pipelined message.
+        Returns: (seq int or None if no prefix, message bytes without prefix)
+    """
+    match = SEQ_PATTERN.match(data)
+    if match is None: return (None, data)
+    return (int(match.group(1)), data[match.end():])
+
+#-----------------------------------------------------------------------------
+def isChunkHeader(data):
+    """ Check whether the data is the reliable chunk transfer header (5 fields)."""
+    return data.startswith(b'BM;Send;') and data.count(b';') == 4
+
+def handleStaleMsg(sock, data, peer):
+    """ Handle the late/duplicated message of a finished (or failed) transfer: re-ACK 
+        the resent last checkpoint (the ACK was lost), drop the late chunk and the 
+        resent header (a message starts with the CHUNK_MAGIC is always a chunk).
+        Returns: True if the data is a stale transfer message (handled here), else False.
+    """
+    if len(data) >= CHUNK_HEADER.size and data[:2] == CHUNK_MAGIC: return True
+    if data.startswith(b'BM;Chk;'):
+        try:
+            _, _, transferID, end = data.split(b';')
+            if gDoneTransfers.get((peer, int(transferID))) == int(end):
+                sock.sendto(b'BM;Ack;%s;%s' % (transferID, end), peer)
+        except (ValueError, OSError):
+            pass
+        return True
+    if isChunkHeader(data):
+        try:
+            return (peer, int(data.rsplit(b';', 1)[1])) in gDoneTransfers
+        except ValueError:
+            return True
+    return False
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class chunkTransfer(object):
+    """ Reliable ordered transfer of one big message over a UDP socket, details refer 
+        to the < Program Design > part. The datagrams which are not part of the transfer
+        are kept in the backlog list (if it is not None) for the caller to handle after 
+        the transfer.
+    """
+    def __init__(self, sock, bufferSize, window=CHUNK_WINDOW, timeout=CHUNK_TIMEOUT,
+                 retry=CHUNK_RETRY, backlog=None):
+        self.sock = sock
+        self.chunkSize = max(1, bufferSize - CHUNK_HEADER.size)
+        self.window = max(1, int(window))
+        self.timeout = timeout
+        self.retry = max(0, int(retry))
+        self.backlog = backlog
+        self._recvBuf = bytearray(max(bufferSize, CTRL_SZ))
+        self._recvView = memoryview(self._recvBuf)
+
+    #--chunkTransfer---------------------------------------------------------------
+    def _recvFrom(self, peer, waitT):
+        """ Receive one datagram from the peer into the receive buffer in waitT sec.
+            Returns: the datagram size, None if time out.
+        """
+        endT = time.monotonic() + waitT
+        oldTimeout = self.sock.gettimeout()
+        try:
+            while True:
+                remainT = endT - time.monotonic()
+                if remainT <= 0: return None
+                self.sock.settimeout(remainT)
+                try:
+                    nbytes, address = self.sock.recvfrom_into(self._recvBuf)
+                except socket.timeout:
+                    return None
+                if address == peer: return nbytes
+                self._keep(nbytes, address)
+        finally:
+            self.sock.settimeout(oldTimeout)
+
+    def _keep(self, nbytes, address):
+        if self.backlog is not None: self.backlog.append((bytes(self._recvView[:nbytes]), address))
+
+    #--chunkTransfer---------------------------------------------------------------
+    def send(self, message, peer):
+        """ Send the message to the peer window by window.
+            Returns: True if all the chunks are ACKed, else False.
+        """
+        global gTransferID
+        if not isinstance(message, (bytes, bytearray)): message = str(message).encode(CODE_FMT)
+        peer = (socket.gethostbyname(peer[0]), peer[1])  # match the recvfrom() address.
+        view, chunkSize = memoryview(message), self.chunkSize
+        gTransferID = gTransferID % 0xFFFF + 1
+        transferID, count = gTransferID, ceil(len(view)/chunkSize)
+        header0 = b'BM;Send;%d;%d;%d' % (len(view), chunkSize, transferID)
+        self.sock.sendto(header0, peer)
+        for start in range(0, count, self.window):
+            end = min(count, start + self.window)
+            seqList, timeoutCount = range(start, end), 0
+            while seqList is not None:
+                for seq in seqList:
+                    header = CHUNK_HEADER.pack(CHUNK_MAGIC, transferID, seq)
+                    payload = view[seq*chunkSize:(seq+1)*chunkSize]
+                    if HAS_SENDMSG:
+                        self.sock.sendmsg((header, payload), (), 0, peer)  # scatter/gather, no copy.
+                    else:
+                        self.sock.sendto(header + payload, peer)
+                self.sock.sendto(b'BM;Chk;%d;%d' % (transferID, end), peer)
+                seqList = self._waitCheckReply(transferID, end, peer)
+                if seqList is None:
+                    # time out: resend the checkpoint (and the header in the first window).
+                    timeoutCount += 1
+                    if timeoutCount > self.retry:
+                        print("chunkTransfer;send(): transfer %d to %s failed." % (transferID, str(peer)))
+                        return False
+                    if start == 0: self.sock.sendto(header0, peer)
+                    seqList = ()
+                elif not seqList:
+                    seqList = None  # window ACKed.
+                else:
+                    timeoutCount = 0
+        return True
+
+    def _waitCheckReply(self, transferID, end, peer):
+        """ Wait for the checkpoint reply.
+            Returns: [] if ACKed, the NACKed chunks sequence list or None if time out.
+        """
+        endT = time.monotonic() + self.timeout
+        while True:
+            nbytes = self._recvFrom(peer, endT - time.monotonic())
+            if nbytes is None: return None
+            data = bytes(self._recvView[:nbytes])
+            fields = data.split(b';')
+            if len(fields) < 4 or fields[0] != b'BM' or fields[1] not in (b'Ack', b'Nack'):
+                if not handleStaleMsg(self.sock, data, peer): self._keep(nbytes, peer)
+                continue
+            try:
+                if int(fields[2]) != transferID or int(fields[3]) != end: continue  # stale reply.
+                if fields[1] == b'Ack': return []
+                return [int(seq) for seq in fields[4].split(b',')]
+            except (IndexError, ValueError):
+                continue
+
+    #--chunkTransfer---------------------------------------------------------------
+    def receive(self, header, peer):
+        """ Receive the message after the b'BM;Send;<size>;<chunkSize>;<transferID>' 
+            header from the peer, the chunk payload is copied from the receive buffer
+            to its offset of the preallocated message bytearray.
+            Returns: the message bytearray, None if failed.
+        """
+        try:
+            _, _, size, chunkSize, transferID = header.split(b';')
+            size, chunkSize, transferID = int(size), int(chunkSize), int(transferID)
+            count = ceil(size/chunkSize)
+        except (ValueError, ZeroDivisionError):
+            print("chunkTransfer;receive(): invalid header: %s" % str(header))
+            return None
+        data, received = bytearray(size), bytearray(count)
+        dataView, view, headerSz = memoryview(data), self._recvView, CHUNK_HEADER.size
+        lowSeq = 0  # all the chunks before lowSeq are received.
+        waitT = self.timeout * (self.retry + 1)
+        endT = time.monotonic() + waitT    # reset when the transfer message arrives.
+        while True:
+            nbytes = self._recvFrom(peer, endT - time.monotonic())
+            if nbytes is None:
+                print("chunkTransfer;receive(): transfer %d from %s time out." % (transferID, str(peer)))
+                return None
+            if nbytes >= headerSz and view[:2] == CHUNK_MAGIC:
+                _, tid, seq = CHUNK_HEADER.unpack_from(self._recvBuf)
+                if tid == transferID and seq < count:
+                    endT = time.monotonic() + waitT
+                    if received[seq]: continue
+                    offset = seq * chunkSize
+                    dataView[offset:offset + nbytes - headerSz] = view[headerSz:nbytes]
+                    received[seq] = 1
+                continue
+            msg = bytes(view[:nbytes])
+            fields = msg.split(b';')
+            if fields[:2] == [b'BM', b'Send'] and len(fields) == 5:
+                if fields[4] == b'%d' % transferID: continue  # resent header.
+                # the peer gave up this transfer and starts a new one.
+                print("chunkTransfer;receive(): transfer %d from %s aborted." % (transferID, str(peer)))
+                self._keep(nbytes, peer)
+                return None
+            if len(fields) != 4 or fields[:2] != [b'BM', b'Chk'] or fields[2] != b'%d' % transferID:
+                if not handleStaleMsg(self.sock, msg, peer): self._keep(nbytes, peer)
+                continue
+            endT = time.monotonic() + waitT
+            end = min(count, int(fields[3]))
+            while lowSeq < count and received[lowSeq]: lowSeq += 1
+            missing = [b'%d' % seq for seq in range(lowSeq, end) if not received[seq]]
+            if missing:
+                self.sock.sendto(b'BM;Nack;%d;%s;%s' % (transferID, fields[3], b','.join(missing[:NACK_MAX])), peer)
+                continue
+            self.sock.sendto(b'BM;Ack;%d;%s' % (transferID, fields[3]), peer)
+            if end == count:
+                gDoneTransfers[(peer, transferID)] = end
+                if len(gDoneTransfers) > DONE_CACHE_SZ: gDoneTransfers.popitem(last=False)
+                return data
 
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
@@ -60,6 +310,8 @@ class udpClient(object):
         self.ipAddr = ipAddr
         self.bufferSize = BUFFER_SZ
         self.chunkSize = max(1, self.bufferSize - 8) # make the chunk size 1 byte smaller than the bugger to send big message.
+        self.window = CHUNK_WINDOW
+        self.reliable = False   # use the reliable chunk transfer to send big message.
         self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.setTimeOut()
 
@@ -71,16 +323,16 @@ class udpClient(object):
             Returns:
                 bytes: the whole data chunks.
         """
-        receiveCount = ceil(messageSZ*1.0/self.chunkSize) # after python3 no need to *1.0
-        data = b''
+        receiveCount = ceil(messageSZ/self.chunkSize)
+        chunks = []
         try:
             for _ in range(receiveCount):
                 subData, _ = self.client.recvfrom(self.bufferSize)
-                data += subData
+                chunks.append(subData)
         except Exception as err:
             print("udpClient;receiveChunk(): Data transfer error, some data missing.")
             print("Error: %s" %str(err))
-        return data
+        return b''.join(chunks)
 
     #--udpClient-------------------------------------------------------------------
     def sendMsg(self, msg, resp=False, ipAddr=None):
@@ -93,19 +345,31 @@ class udpClient(object):
         if self.client is None: return None             # Check whether disconnected.
         if not isinstance(msg, bytes): msg = str(msg).encode(CODE_FMT)
         self.client.sendto(msg, self.ipAddr)
-        if resp:
-            try:
-                data, _ = self.client.recvfrom(self.bufferSize)
-                if b'BM;Send' in data:
-                    _, _, messageSZ = data.decode(CODE_FMT).split(';') 
-                    data = self.receiveChunk(int(messageSZ))
-                return data
-            except Exception as error:
-                print("udpClient;sendMsg(): Can not connect to the server!")
-                print(error)
-                # self.disconnect() no need to disconnect if we want to do reconnect.
-                return None
-        return None
+        return self.receiveMsg() if resp else None
+
+    #--udpClient-------------------------------------------------------------------
+    def receiveMsg(self):
+        """ Receive the server's response (the big message chunks will be reassembled).
+            Returns: bytes format response, None if failed.
+        """
+        try:
+            data, address = self.client.recvfrom(self.bufferSize)
+            # skip the late messages of the previous transfer.
+            while handleStaleMsg(self.client, data, address):
+                data, address = self.client.recvfrom(self.bufferSize)
+            if isChunkHeader(data):
+                transfer = chunkTransfer(self.client, self.bufferSize, window=self.window)
+                data = transfer.receive(data, address)
+                if data is not None: data = bytes(data)
+            elif data.startswith(b'BM;Send'):
+                _, _, messageSZ = data.decode(CODE_FMT).split(';') 
+                data = self.receiveChunk(int(messageSZ))
+            return data
+        except Exception as error:
+            print("udpClient;receiveMsg(): Can not connect to the server!")
+            print(error)
+            # self.disconnect() no need to disconnect if we want to do reconnect.
+            return None
 
     #--udpClient-------------------------------------------------------------------
     def sendChunk(self, message, resp=False):
@@ -116,8 +380,13 @@ class udpClient(object):
             Returns:
                 _type_: server's response.
         """
+        if self.client is None: return None
+        if not isinstance(message, bytes): message = str(message).encode(CODE_FMT)
+        if self.reliable:
+            transfer = chunkTransfer(self.client, self.bufferSize, window=self.window)
+            if not transfer.send(message, self.ipAddr): return None
+            return self.receiveMsg() if resp else None
         messageSZ = len(message)
-        sendCount = ceil(messageSZ/self.chunkSize)
         # Step 1: tell server side the whole message size: BM;Send;<dataSize>
         msg = ';'.join((BIG_MSG_FLG, 'Send', str(messageSZ))) 
         reply = self.sendMsg(msg, resp=False)
@@ -148,6 +417,21 @@ class udpClient(object):
         print("Error: the timeoutT must be a int x > 0 ")
         return False
 
+    #--udpClient-------------------------------------------------------------------
+    def setChunkWindow(self, window=CHUNK_WINDOW):
+        """ Set the chunks number sent before waiting the reliable transfer checkpoint ACK."""
+        if isinstance(window, int) and window > 0:
+            self.window = window
+            return True
+        print("Error: the chunk window must be a int x > 0 ")
+        return False
+
+    def setReliable(self, flag):
+        """ Use the reliable chunk transfer (True) or the legacy transfer (False) to send 
+            the big message.
+        """
+        self.reliable = bool(flag)
+
     #--udpClient-------------------------------------------------------------------
     def disconnect(self):
         """ Send a empty logout message and close the socket."""
@@ -161,18 +445,238 @@ class udpClient(object):
         self.client.close()
         self.client = None
 
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class pipeClient(object):
+    """ Pipelined UDP client module, details refer to the < Program Design > part."""
+
+    def __init__(self, ipAddr, timeout=PIPE_TIMEOUT, retry=PIPE_RETRY, backoff=PIPE_BACKOFF):
+        """ Init example: client = pipeClient(('127.0.0.1', 3001), timeout=0.2)
+            Args:
+                ipAddr (tuple(str(), int())): IP address tuple ip + port.
+                timeout (float, optional): first try reply time out (sec). Defaults to 0.5.
+                retry (int, optional): resend times after time out. Defaults to 2.
+                backoff (float, optional): time out multiplier of every retry. Defaults to 2.
+        """
+        self.ipAddr = ipAddr
+        self.bufferSize = BUFFER_SZ
+        self.timeout = timeout
+        self.retry = max(0, int(retry))
+        self.backoff = max(1, backoff)
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.client, selectors.EVENT_READ)
+        self._seq = 0
+        self._inflight = OrderedDict()  # seq -> [msg, deadline, tries, callback], send sequence.
+        self._backlog = []  # (data, address) received during a chunk transfer.
+        self.window = CHUNK_WINDOW
+        self.reliable = False   # use the reliable chunk transfer to send big message.
+        self.stats = {'sent': 0, 'resent': 0, 'replied': 0, 'failed': 0, 'unmatched': 0}
+
+    #--pipeClient------------------------------------------------------------------
+    def submit(self, msg, callback=None):
+        """ Send one request without waiting the reply. 
+            Args:
+                msg (str/bytes): request message smaller than the buffer size.
+                callback (function, optional): called as callback(seq, reply) when the 
+                    reply arrived or callback(seq, None) when all the tries time out.
+            Returns:
+                int: the request sequence ID, None if disconnected.
+        """
+        if self.client is None: return None
+        if not isinstance(msg, bytes): msg = str(msg).encode(CODE_FMT)
+        self._seq = self._seq % 0xFFFFFFFF + 1
+        data = b'#%d;' % self._seq + msg
+        self._inflight[self._seq] = [data, time.monotonic() + self.timeout, 0, callback]
+        self._send(data)
+        self.stats['sent'] += 1
+        return self._seq
+
+    def _send(self, data):
+        try:
+            self.client.sendto(data, self.ipAddr)
+        except OSError as err:
+            print("pipeClient;_send(): send error: %s" % str(err))
+
+    #--pipeClient------------------------------------------------------------------
+    def poll(self, timeout=0):
+        """ Handle the arrived replies and the request deadlines (resend with the 
+            backoff time out or fail), wait up to <timeout> sec for the replies.
+            Returns: number of the requests still in flight.
+        """
+        if self.client is None: return 0
+        while self._backlog: self._handleReply(*self._backlog.pop(0))
+        if self.selector.select(timeout):
+            while True:
+                try:
+                    data, address = self.client.recvfrom(self.bufferSize)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as err:
+                    print("pipeClient;poll(): receive error: %s" % str(err))
+                    break
+                self._handleReply(data, address)
+                while self._backlog: self._handleReply(*self._backlog.pop(0))
+        self._checkDeadlines()
+        return len(self._inflight)
+
+    def _handleReply(self, data, address):
+        if handleStaleMsg(self.client, data, address): return
+        if isChunkHeader(data):
+            transfer = chunkTransfer(self.client, self.bufferSize, window=self.window, 
+                                     timeout=self.timeout, backlog=self._backlog)
+            data = transfer.receive(data, address)
+            if data is None: return
+            data = bytes(data)
+        elif data.startswith(b'BM;Send'):
+            data = self._receiveChunk(data)
+            if data is None: return
+        seq, reply = splitSeqPrefix(data)
+        if seq is None and self._inflight: seq = next(iter(self._inflight)) # old server: FIFO.
+        request = self._inflight.pop(seq, None)
+        if request is None:
+            self.stats['unmatched'] += 1    # late reply of a resent/failed request.
+            return
+        self.stats['replied'] += 1
+        if request[3]: request[3](seq, reply)
+
+    def _receiveChunk(self, header):
+        """ Receive the legacy big message chunks (sent back to back after the header)."""
+        messageSZ = int(header.decode(CODE_FMT).split(';')[2])
+        chunkSize = max(1, self.bufferSize - 8)
+        chunks = []
+        self.client.settimeout(self.timeout)
+        try:
+            for _ in range(ceil(messageSZ/chunkSize)):
+                subData, _ = self.client.recvfrom(self.bufferSize)
+                chunks.append(subData)
+        except OSError as err:
+            print("pipeClient;_receiveChunk(): Data transfer error: %s" % str(err))
+            return None
+        finally:
+            self.client.setblocking(False)
+        return b''.join(chunks)
+
+    def _checkDeadlines(self):
+        now = time.monotonic()
+        for seq, request in list(self._inflight.items()):
+            if request[1] > now: continue
+            if request[2] < self.retry:
+                request[2] += 1
+                request[1] = now + self.timeout * self.backoff ** request[2]
+                self._send(request[0])
+                self.stats['resent'] += 1
+            else:
+                self._inflight.pop(seq)
+                self.stats['failed'] += 1
+                if request[3]: request[3](seq, None)
+
+    #--pipeClient------------------------------------------------------------------
+    def request(self, msgList):
+        """ Send all the requests in the list in flight together and wait until all 
+            of them replied or failed. 
+            Returns: the replies bytes list in the request sequence (None if failed).
+        """
+        results = [None] * len(msgList)
+        seqIdx = {}
+        def onReply(seq, reply): results[seqIdx[seq]] = reply
+        for idx, msg in enumerate(msgList):
+            seq = self.submit(msg, callback=onReply)
+            if seq is not None: seqIdx[seq] = idx
+        self._wait(seqIdx)
+        return results
+
+    def _wait(self, seqList):
+        """ Poll until all the requests in the list replied or failed."""
+        while any(seq in self._inflight for seq in seqList):
+            nextDeadline = min(request[1] for request in self._inflight.values())
+            self.poll(max(0, nextDeadline - time.monotonic()))
+
+    def sendMsg(self, msg, resp=False):
+        """ udpClient compatible function: send one message and wait for the reply."""
+        if not resp: 
+            self.submit(msg)
+            return None
+        return self.request([msg])[0]
+
+    def sendChunk(self, message, resp=False):
+        """ udpClient compatible function: send the message bigger than the buffer size
+            (reliable chunk transfer or the legacy BM;Send => chunks => BM;Sent;Finish) 
+            and wait for the reply, the chunked request is not resent.
+        """
+        if self.client is None: return None
+        if not isinstance(message, bytes): message = str(message).encode(CODE_FMT)
+        self._seq = self._seq % 0xFFFFFFFF + 1
+        seq, data = self._seq, b'#%d;' % self._seq + message
+        result = []
+        if self.reliable:
+            transfer = chunkTransfer(self.client, self.bufferSize, window=self.window,
+                                     timeout=self.timeout, backlog=self._backlog)
+            if not transfer.send(data, self.ipAddr):
+                self.stats['failed'] += 1
+                return None
+            # the server replies after the last window ACK, no finish message needed.
+            if resp: self._inflight[seq] = [None, time.monotonic() + self.timeout, self.retry, 
+                                            lambda _, reply: result.append(reply)]
+        else:
+            chunkSize = max(1, self.bufferSize - 8)
+            self._send(';'.join((BIG_MSG_FLG, 'Send', str(len(data)))).encode(CODE_FMT))
+            for idx in range(0, len(data), chunkSize):
+                self._send(data[idx:idx + chunkSize])
+            if resp: self._inflight[seq] = [None, time.monotonic() + self.timeout, self.retry, 
+                                            lambda _, reply: result.append(reply)]
+            self._send(';'.join((BIG_MSG_FLG, 'Sent', 'Finish')).encode(CODE_FMT))
+        self.stats['sent'] += 1
+        if not resp: return None
+        self._wait([seq])
+        return result[0] if result else None
+
+    #--pipeClient------------------------------------------------------------------
+    def getInflightNum(self):
+        return len(self._inflight)
+
+    def setChunkWindow(self, window=CHUNK_WINDOW):
+        if isinstance(window, int) and window > 0:
+            self.window = window
+            return True
+        print("Error: the chunk window must be a int x > 0 ")
+        return False
+
+    def setReliable(self, flag):
+        self.reliable = bool(flag)
+
+    def getStats(self):
+        return dict(self.stats)
+
+    def disconnect(self):
+        """ Drop the requests in flight and close the socket."""
+        if self.client is None: return
+        self._inflight.clear()
+        self.selector.unregister(self.client)
+        self.selector.close()
+        self.client.close()
+        self.client = None
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 class udpServer(object):
     """ UDP server module."""
-    def __init__(self, parent, port):
+    def __init__(self, parent, port, reusePort=False):
         """ Create an ipv4 (AF_INET) socket object using the tcp protocol (SOCK_STREAM)
             init example: server = udpServer(None, 5005)
+            - reusePort: set SO_REUSEPORT so several worker servers can bind the port.
         """
         self.bufferSize = BUFFER_SZ
         self.chunkSize = max(1, self.bufferSize-8)
         self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if reusePort: self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.server.bind(('0.0.0.0', port))
+        self.verbose = True     # print every accepted message.
+        self.window = CHUNK_WINDOW
+        self.reliable = False   # use the reliable chunk transfer to reply big message.
+        self._reliablePeers = set() # client addresses agreed to the reliable transfer.
+        self._backlog = []      # (data, address) from the other clients during a chunk transfer.
         self.terminate = False  # Server terminate flag.
 
     #--udpServer-------------------------------------------------------------------
@@ -184,38 +688,69 @@ class udpServer(object):
                 bytes: the whole data Chunks.
         """
         receiveCount = ceil(messageSZ/self.chunkSize)
-        data = b''
+        chunks = []
         try:
             for _ in range(receiveCount):
                 subData, _ = self.server.recvfrom(self.bufferSize)
-                data += subData
+                chunks.append(subData)
         except Exception as err:
             print("udpServer;receiveChunk(): Data transfer error, some data missing.")
             print("Error: %s" %str(err))
-        return data
+        return b''.join(chunks)
 
     #--udpServer-------------------------------------------------------------------
-    def serverStart(self, handler=None):
-        """ Start the UDP server to handle the incoming message."""
+    def serverStart(self, handler=None, seqEcho=True):
+        """ Start the UDP server to handle the incoming message.
+            Args:
+                handler (function, optional): message handler function. Defaults to None.
+                seqEcho (bool, optional): strip the pipelined request '#<seq>;' prefix 
+                    before calling the handler and add it in the reply. Defaults to True.
+        """
         while not self.terminate:
-            data, address = self.server.recvfrom(self.bufferSize)
-            # Check whether the message is a big message
-            if b'BM;Send' in data:
-                bmMsg = data.decode(CODE_FMT)
-                _, _, size = bmMsg.split(';')
-                data = self.receiveChunk(int(size))
-                subData, _ = self.server.recvfrom(self.bufferSize)
-            print("Accepted connection from %s" % str(address))
+            data, address = self.receiveMsg()
+            if data is None: continue
+            seq = None
+            if seqEcho: seq, data = splitSeqPrefix(data)
             msg = handler(data) if not handler is None else data
-            if not msg is None:  # don't response client if the handler feed back is None
-                if not isinstance(msg, bytes): msg = str(msg).encode(CODE_FMT)
-                if len(msg) < self.bufferSize:
-                    self.server.sendto(msg, address)
-                else:
-                    self.sendChunk(msg, address)
+            self.replyMsg(msg, address, seq)
         # close the server.
         self.server.close()
 
+    #--udpServer-------------------------------------------------------------------
+    def receiveMsg(self):
+        """ Receive one message (the big message chunks will be reassembled).
+            Returns: (message bytes or None if it is not a complete message, address)
+        """
+        if self._backlog:
+            data, address = self._backlog.pop(0)
+        else:
+            data, address = self.server.recvfrom(self.bufferSize)
+        if handleStaleMsg(self.server, data, address): return (None, address)
+        # Check whether the message is a big message
+        if isChunkHeader(data):
+            transfer = chunkTransfer(self.server, self.bufferSize, window=self.window, 
+                                     backlog=self._backlog)
+            data = transfer.receive(data, address)
+            if data is None: return (None, address)
+            data = bytes(data)
+        elif data.startswith(b'BM;Send'):
+            bmMsg = data.decode(CODE_FMT)
+            _, _, size = bmMsg.split(';')
+            data = self.receiveChunk(int(size))
+            subData, _ = self.server.recvfrom(self.bufferSize)
+        if self.verbose: print("Accepted connection from %s" % str(address))
+        return (data, address)
+
+    def replyMsg(self, msg, address, seq=None):
+        """ Reply the handler's feed back message (add the '#<seq>;' prefix if seq is set)."""
+        if msg is None: return  # don't response client if the handler feed back is None
+        if not isinstance(msg, bytes): msg = str(msg).encode(CODE_FMT)
+        if seq is not None: msg = b'#%d;' % seq + msg
+        if len(msg) < self.bufferSize:
+            self.server.sendto(msg, address)
+        else:
+            self.sendChunk(msg, address)
+
     #--udpClient-------------------------------------------------------------------
     def setBufferSize(self, bufferSize=BUFFER_SZ):
         if isinstance(bufferSize, int) and 1 < bufferSize < BUFFER_SZ_MAX:
@@ -225,6 +760,24 @@ class udpServer(object):
         print("Error: the input buffer size must be a int 1 < x < 65507.")
         return False
 
+    def setChunkWindow(self, window=CHUNK_WINDOW):
+        if isinstance(window, int) and window > 0:
+            self.window = window
+            return True
+        print("Error: the chunk window must be a int x > 0 ")
+        return False
+
+    def setReliable(self, flag, address=None):
+        """ Use the reliable chunk transfer to reply the big messages to all the clients
+            or only to the client address (such as after the client's login offer).
+        """
+        if address is None:
+            self.reliable = bool(flag)
+        elif flag:
+            self._reliablePeers.add(address)
+        else:
+            self._reliablePeers.discard(address)
+
     #--udpClient-------------------------------------------------------------------
     def sendChunk(self, message, address):
         """ reply the message bigger than the buffer size to the client side.
@@ -234,8 +787,11 @@ class udpServer(object):
             Returns:
                 _type_: server's response.
         """
+        if self.reliable or address in self._reliablePeers:
+            transfer = chunkTransfer(self.server, self.bufferSize, window=self.window, 
+                                     backlog=self._backlog)
+            return transfer.send(message, address)
         messageSZ = len(message)
-        sendCount = ceil(messageSZ/self.chunkSize) if messageSZ > self.bufferSize else 1
         # Step 1: tell server side the whole message size: BM;Send;<dataSize>
         msg = ';'.join((BIG_MSG_FLG, 'Send', str(messageSZ)))
         self.server.sendto(msg.encode(CODE_FMT), address)
@@ -243,11 +799,140 @@ class udpServer(object):
         messageChunks = [ message[i:i+self.chunkSize] for i in range(0, messageSZ, self.chunkSize) ]
         for data in messageChunks:
             self.server.sendto(data, address)
+        return True
 
     #--udpServer-------------------------------------------------------------------
     def serverStop(self):
         self.terminate = True
 
+#-----------------------------------------------------------------------------
+def runMpWorker(port, workerIdx, handler, seqEcho, bufferSize, workerInit, initArgs):
+    """ udpMpServer worker process function: run one udpServer on the SO_REUSEPORT port.
+        The workerInit(workerIdx, *initArgs) is called before serving (such as attach 
+        the shared state block used by the handler).
+    """
+    # the forked worker inherits the parent signal handlers (such as a SIGTERM handler 
+    # calling serverStop() of the parent server copy), reset them so the parent can stop 
+    # the worker with terminate(), the Ctrl+C is handled by the parent.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if workerInit: workerInit(workerIdx, *initArgs)
+    server = udpServer(None, port, reusePort=True)
+    server.setBufferSize(bufferSize)
+    server.verbose = False
+    try:
+        server.serverStart(handler=handler, seqEcho=seqEcho)
+    except KeyboardInterrupt:
+        pass
+
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+class udpMpServer(object):
+    """ Multi-core UDP server module, details refer to the < Program Design > part."""
+    def __init__(self, parent, port, workerNum=None, workerInit=None, initArgs=()):
+        """ Init example: server = udpMpServer(None, 3001, workerNum=4)
+            Args:
+                port (int): UDP port.
+                workerNum (int, optional): worker number. Defaults to None (cpu count).
+                workerInit (function, optional): called as workerInit(workerIdx, *initArgs) 
+                    in every worker before serving. Defaults to None.
+                initArgs (tuple, optional): workerInit args, such as the sharedStateBlock.
+        """
+        self.port = port
+        self.workerNum = max(1, int(workerNum or os.cpu_count() or 1))
+        self.workerInit = workerInit
+        self.initArgs = tuple(initArgs)
+        self.bufferSize = BUFFER_SZ
+        self.reusePort = hasattr(socket, 'SO_REUSEPORT')
+        self.workers = []
+        self.terminate = False
+
+    #--udpMpServer-----------------------------------------------------------------
+    def serverStart(self, handler=None, seqEcho=True):
+        """ Start the workers and block until serverStop() is called."""
+        if self.reusePort:
+            for idx in range(self.workerNum):
+                worker = multiprocessing.Process(target=runMpWorker, daemon=True,
+                                                 args=(self.port, idx, handler, seqEcho, self.bufferSize, 
+                                                       self.workerInit, self.initArgs))
+                worker.start()
+                self.workers.append(worker)
+            try:
+                while not self.terminate: time.sleep(RESP_TIME*10)
+            finally:    # stop the workers also when the Ctrl+C interrupts the parent.
+                self._stopWorkers()
+        else:
+            self._poolServe(handler, seqEcho)
+
+    def _stopWorkers(self, timeout=1):
+        """ Terminate the worker processes, kill the workers not stopped in the timeout."""
+        for worker in self.workers: worker.terminate()
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.kill()
+                worker.join(timeout)
+        self.workers = []
+
+    def _poolServe(self, handler, seqEcho):
+        """ No SO_REUSEPORT: the receive thread feeds the worker threads, the replies 
+            are sent back by the receive thread (only one thread uses the socket).
+        """
+        server = udpServer(None, self.port)
+        server.setBufferSize(self.bufferSize)
+        server.verbose = False
+        if self.workerInit: self.workerInit(0, *self.initArgs)
+        replyQueue = queue.Queue()
+        wakeR, wakeW = socket.socketpair()  # wake up the receive thread to send the reply.
+        wakeR.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(server.server, selectors.EVENT_READ)
+        selector.register(wakeR, selectors.EVENT_READ)
+        def workerLoop(taskQueue):
+            while True:
+                task = taskQueue.get()
+                if task is None: return
+                data, address = task
+                seq = None
+                if seqEcho: seq, data = splitSeqPrefix(data)
+                replyQueue.put((handler(data) if handler else data, address, seq))
+                wakeW.send(b'\0')
+        taskQueues = [queue.Queue() for _ in range(self.workerNum)]
+        self.workers = [threading.Thread(target=workerLoop, args=(taskQueue,), daemon=True) 
+                        for taskQueue in taskQueues]
+        for worker in self.workers: worker.start()
+        while not self.terminate:
+            for key, _ in selector.select(RESP_TIME*10):
+                if key.fileobj is wakeR:
+                    try:
+                        wakeR.recv(BUFFER_SZ)
+                    except BlockingIOError:
+                        pass
+                    continue
+                while True:
+                    data, address = server.receiveMsg()
+                    if data is not None: taskQueues[hash(address) % self.workerNum].put((data, address))
+                    if not server._backlog: break
+            while not replyQueue.empty(): server.replyMsg(*replyQueue.get())
+        for taskQueue in taskQueues: taskQueue.put(None)
+        self.workers = []
+        selector.close()
+        for sock in (wakeR, wakeW, server.server): sock.close()
+
+    #--udpMpServer-----------------------------------------------------------------
+    def setBufferSize(self, bufferSize=BUFFER_SZ):
+        if isinstance(bufferSize, int) and 1 < bufferSize < BUFFER_SZ_MAX:
+            self.bufferSize = bufferSize
+            return True
+        print("Error: the input buffer size must be a int 1 < x < 65507.")
+        return False
+
+    def getWorkerNum(self):
+        return self.workerNum
+
+    def serverStop(self):
+        self.terminate = True
+
 #-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 # Use case program: udpComTest.py